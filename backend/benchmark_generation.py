@@ -0,0 +1,333 @@
+"""
+End-to-end benchmark of documentation generation.
+
+Builds a synthetic project, runs the full hierarchy pipeline (planning, scheduler,
+request gate, rate budget, batched writer) against the simulated LLM backend and
+reports wall time, throughput, peak threads and memory, database write latency
+and the critical path. Results are saved as JSON so runs from different versions
+can be compared:
+
+    python benchmark_generation.py --depth 3 --fanout 3 --files-per-folder 8 --output before.json
+    python benchmark_generation.py --depth 3 --fanout 3 --files-per-folder 8 --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:  # optional dependency, fall back to /proc and getrusage
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Seconds between thread count and memory samples
+SAMPLE_INTERVAL = 0.02
+
+# Metrics compared with --compare, and whether a higher value is better
+COMPARED_METRICS = {
+    "wall_seconds": False,
+    "requests_per_second": True,
+    "peak_threads": False,
+    "peak_rss_mb": False,
+    "mean_db_batch_ms": False
+}
+
+LANGUAGE_TEMPLATES = {
+    "py": (
+        "",
+        "def func_{i}(value):\n    \"\"\"Helper number {i}.\"\"\"\n    result = value * {i}\n    return result + {j}\n\n",
+        ""
+    ),
+    "js": (
+        "",
+        "function func{i}(value) {{\n  const result = value * {i};\n  return result + {j};\n}}\n\n",
+        ""
+    ),
+    "ts": (
+        "",
+        "export function func{i}(value: number): number {{\n  const result = value * {i};\n  return result + {j};\n}}\n\n",
+        ""
+    ),
+    "go": (
+        "package synthetic\n\n",
+        "func Func{i}(value int) int {{\n\tresult := value * {i}\n\treturn result + {j}\n}}\n\n",
+        ""
+    ),
+    "java": (
+        "public class Synthetic {{\n\n",
+        "    public static int func{i}(int value) {{\n        return value * {i} + {j};\n    }}\n\n",
+        "}}\n"
+    )
+}
+
+
+def make_synthetic_project(root_path, depth, fanout, files_per_folder, file_lines, languages, seed=0):
+    """
+    Create a project tree: every folder down to ``depth`` holds ``files_per_folder``
+    source files and ``fanout`` subfolders. File lengths vary between half and one
+    and a half times ``file_lines``.
+
+    Returns:
+        dict: {"selected_items", "folders", "files", "bytes"}
+    """
+    rng = random.Random(seed)
+    selected_items = []
+    totals = {"folders": 0, "files": 0, "bytes": 0}
+
+    def build(folder_path, level):
+        os.makedirs(folder_path, exist_ok=True)
+        selected_items.append(folder_path)
+        totals["folders"] += 1
+        for index in range(files_per_folder):
+            language = languages[(index + level) % len(languages)]
+            header, function, footer = LANGUAGE_TEMPLATES[language]
+            functions = max(1, int(file_lines * rng.uniform(0.5, 1.5)) // 5)
+            body = "".join(function.format(i=i, j=rng.randint(0, 999)) for i in range(functions))
+            content = header.format() + body + footer.format()
+            file_path = os.path.join(folder_path, f"module_{level}_{index}.{language}")
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write(content)
+            selected_items.append(file_path)
+            totals["files"] += 1
+            totals["bytes"] += len(content)
+        if level < depth:
+            for index in range(fanout):
+                build(os.path.join(folder_path, f"package_{level + 1}_{index}"), level + 1)
+
+    build(root_path, 0)
+    return {"selected_items": selected_items, **totals}
+
+
+def _current_rss_bytes():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ResourceSampler:
+    """Samples the thread count and resident memory in the background while a run executes."""
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_rss = _current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="benchmark-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # The sampler itself is not part of the pipeline
+            self.peak_threads = max(self.peak_threads, threading.active_count() - 1)
+            rss = _current_rss_bytes()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def plan_depth(node):
+    """Number of nodes on the longest file -> folder -> project chain of the plan."""
+    return 1 + max((plan_depth(child) for child in node.children), default=0)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    """
+    Run one benchmark in a throwaway workspace (its own app.db, settings.db and
+    cache) with the simulated LLM backend.
+
+    Returns:
+        dict: Configuration, tree size and measured results
+    """
+    workspace = tempfile.mkdtemp(prefix="codeinsight-benchmark-")
+    original_cwd = os.getcwd()
+    settings_db = os.path.abspath(args.settings_db) if args.settings_db else None
+    os.chdir(workspace)
+    try:
+        # Imported here so every database the pipeline opens lands in the workspace
+        import sqlite3
+        from adminDb import initialize_db
+        from doc_writer import init_documentation_tables, get_documentation_writer
+        from hierarchy_manager import generate_documentation, build_generation_plan
+        from generation_estimator import estimate_generation
+        from llm_providers import FakeProvider, set_provider
+        from progress_tracker import ProgressTracker
+
+        if settings_db:
+            shutil.copy(settings_db, "settings.db")
+        else:
+            initialize_db()
+        with sqlite3.connect("app.db") as conn:
+            init_documentation_tables(conn)
+
+        tree = make_synthetic_project(
+            os.path.join(workspace, "project"), args.depth, args.fanout, args.files_per_folder,
+            args.file_lines, args.languages.split(","), args.seed
+        )
+        root_path = os.path.join(workspace, "project")
+        selected_items = tree.pop("selected_items")
+
+        provider = FakeProvider(
+            latency=args.latency,
+            distribution=args.latency_distribution,
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            error_rate=args.error_rate,
+            output_tokens=args.output_tokens,
+            seed=args.seed
+        )
+        set_provider(provider)
+
+        plan = build_generation_plan(root_path, selected_items)
+        estimate = estimate_generation(
+            "benchmark", root_path, selected_items, args.file_model, args.folder_model, args.project_model,
+            force_regenerate=True, single_call_sections=args.single_call_sections
+        )
+
+        tracker = ProgressTracker("benchmark")
+        started = time.perf_counter()
+        with ResourceSampler() as sampler:
+            generate_documentation(
+                "benchmark",
+                root_path,
+                "benchmark",
+                selected_items,
+                args.file_model,
+                args.folder_model,
+                args.project_model,
+                max_threads=args.max_threads,
+                bypass_cache=True,
+                force_regenerate=True,
+                single_call_sections=args.single_call_sections,
+                progress_tracker=tracker
+            )
+        wall_seconds = time.perf_counter() - started
+
+        writer_stats = get_documentation_writer().stats()
+        get_documentation_writer().close()
+        completed_requests = provider.requests - provider.rate_limited
+        peak_rss = max(filter(None, [sampler.peak_rss, _peak_rss_bytes()]), default=None)
+
+        return {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(),
+            "config": vars(args),
+            "tree": tree,
+            "results": {
+                "wall_seconds": round(wall_seconds, 3),
+                "requests": completed_requests,
+                "rate_limited_requests": provider.rate_limited,
+                "requests_per_second": round(completed_requests / wall_seconds, 2) if wall_seconds else None,
+                "llm_tokens": tracker.llm_tokens,
+                "predicted_requests": estimate["requests"] if estimate else None,
+                "peak_threads": sampler.peak_threads,
+                "peak_rss_mb": round(peak_rss / (1024 * 1024), 1) if peak_rss else None,
+                "db_batches": writer_stats["batches"],
+                "db_rows": writer_stats["items"],
+                "mean_db_batch_ms": round(writer_stats["mean_batch_seconds"] * 1000, 2)
+                if writer_stats["mean_batch_seconds"] is not None else None,
+                "max_db_batch_ms": round(writer_stats["max_batch_seconds"] * 1000, 2),
+                "critical_path_nodes": plan_depth(plan) if plan else 0,
+                "critical_path_calls": estimate["critical_path_calls"] if estimate else None,
+                # The run can't beat its longest chain of sequential calls
+                "critical_path_seconds": round(estimate["critical_path_calls"] * args.latency, 2) if estimate else None
+            }
+        }
+    finally:
+        os.chdir(original_cwd)
+        if args.keep_workspace:
+            print(f"Benchmark workspace kept at {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+def compare_results(current, baseline):
+    """Print the change of every compared metric against an earlier result file."""
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp')}):")
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        before = baseline.get("results", {}).get(metric)
+        after = current["results"].get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        better = change > 0 if higher_is_better else change < 0
+        verdict = "better" if better else "worse" if change else "same"
+        print(f"  {metric}: {before} -> {after} ({change:+.1f}%, {verdict})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark documentation generation on a synthetic project")
+    parser.add_argument("--depth", type=int, default=2, help="Folder levels below the project root")
+    parser.add_argument("--fanout", type=int, default=3, help="Subfolders per folder")
+    parser.add_argument("--files-per-folder", type=int, default=5, help="Source files per folder")
+    parser.add_argument("--file-lines", type=int, default=120, help="Average lines per source file")
+    parser.add_argument("--languages", default="py,js,ts,go,java", help="Comma-separated file types to generate")
+    parser.add_argument("--max-threads", type=int, default=3, help="Scheduler workers (as in generate_documentation)")
+    parser.add_argument("--single-call-sections", action="store_true", help="Request all sections in one call per folder")
+    parser.add_argument("--latency", type=float, default=0.2, help="Typical simulated seconds per request")
+    parser.add_argument("--latency-distribution", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="Simulated per-model request limit")
+    parser.add_argument("--tokens-per-minute", type=int, default=None, help="Simulated per-model token limit")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with a 429")
+    parser.add_argument("--output-tokens", type=int, default=400, help="Simulated completion size")
+    parser.add_argument("--file-model", default="bench-small")
+    parser.add_argument("--folder-model", default="bench-large")
+    parser.add_argument("--project-model", default="bench-large")
+    parser.add_argument("--settings-db", default=None, help="settings.db to copy, for the real prompts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--keep-workspace", action="store_true", help="Keep the synthetic project and databases")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            compare_results(result, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import os
+import re
+import ast
+from token_counter import count_tokens
+
+# Target size of a single chunk sent for chunk-level documentation
+CHUNK_TOKEN_BUDGET = int(os.getenv("FILE_CHUNK_TOKEN_BUDGET", "6000"))
+
+BRACE_LANGUAGE_EXTENSIONS = {
+    '.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx', '.java', '.kt', '.c', '.h', '.cpp', '.hpp',
+    '.cs', '.go', '.rs', '.swift', '.php', '.css', '.scss', '.less', '.dart', '.scala'
+}
+
+# Lines that continue the previous statement and must stay attached to it
+CONTINUATION_PREFIXES = ('}', ')', ']', '.', '?', ':', '&&', '||', 'else', 'catch', 'finally')
+
+NO_BOUNDARY = float('inf')
+
+# A '/' after one of these (or at the start of a statement) starts a regex literal, not a division
+REGEX_PRECEDING_CHARS = set('(,=:[!&|?{};+-*%~^')
+REGEX_PRECEDING_KEYWORDS = {'return', 'typeof', 'case', 'in', 'of', 'delete', 'void', 'throw', 'new', 'else', 'do', 'yield', 'await'}
+
+
+def _python_boundary_depths(code_content, lines):
+    """
+    Nesting level of every statement start, keyed by the boundary just before it.
+    ``depths[i]`` describes the boundary between line ``i`` and line ``i + 1``.
+    """
+    tree = ast.parse(code_content)
+    depths = [NO_BOUNDARY] * len(lines)
+
+    def mark(stmt, level):
+        start = min([stmt.lineno] + [decorator.lineno for decorator in getattr(stmt, 'decorator_list', [])])
+        # Keep comments directly above a statement with it
+        while start >= 2 and lines[start - 2].strip().startswith('#'):
+            start -= 1
+        if start >= 2:
+            depths[start - 2] = min(depths[start - 2], level)
+
+    def visit(body, level):
+        for stmt in body:
+            mark(stmt, level)
+            for _, value in ast.iter_fields(stmt):
+                if not isinstance(value, list) or not value:
+                    continue
+                if isinstance(value[0], ast.stmt):
+                    visit(value, level + 1)
+                else:
+                    for item in value:
+                        # except handlers and match cases carry their own bodies
+                        if isinstance(getattr(item, 'body', None), list):
+                            visit(item.body, level + 1)
+
+    visit(tree.body, 0)
+    return depths
+
+
+def _regex_literal_end(line, start):
+    """Index just past the regex literal starting with the '/' at ``start``, or None if it isn't closed on the line."""
+    i = start + 1
+    in_class = False
+    while i < len(line):
+        char = line[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '/':
+            i += 1
+            while i < len(line) and line[i].isalpha():
+                i += 1
+            return i
+        i += 1
+    return None
+
+
+def _starts_regex(line, i, previous):
+    """Whether the '/' at ``line[i]`` sits where an operand is expected."""
+    if previous is None or previous in REGEX_PRECEDING_CHARS:
+        return True
+    if previous.isalnum() or previous in '_$':
+        word = re.search(r'[\w$]+$', line[:i].rstrip())
+        return word is not None and word.group() in REGEX_PRECEDING_KEYWORDS
+    return False
+
+
+def _starts_string(line, i):
+    """
+    Whether the quote at ``line[i]`` opens a string. A quote right after a letter
+    ("Don't", "users' list") or with no closing quote on its line is text, such as
+    an apostrophe in JSX, since a string literal can't do either.
+    """
+    char = line[i]
+    if char == "'" and i > 0 and (line[i - 1].isalnum() or line[i - 1] == '_'):
+        return False
+    return line.find(char, i + 1) != -1
+
+
+def _brace_boundary_depths(lines):
+    """
+    Bracket depth at the end of every line for brace languages (JS/TS/TSX and friends).
+
+    Strings, template literals, regex literals and comments are skipped, while
+    apostrophes in JSX text ("Don't") are not taken for string quotes. Comments
+    and JSDoc directly above a declaration stay attached to it.
+    """
+    depths = []
+    comment_only = []
+    depth = 0
+    in_block_comment = False
+    in_template = False
+    # Last significant code character, to tell regex literals from divisions
+    previous = None
+
+    for line in lines:
+        quote = None
+        has_code = False
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if in_block_comment:
+                if line.startswith('*/', i):
+                    in_block_comment = False
+                    i += 2
+                    continue
+            elif in_template:
+                has_code = True
+                if char == '\\':
+                    i += 1
+                elif char == '`':
+                    in_template = False
+            elif quote:
+                if char == '\\':
+                    i += 1
+                elif char == quote:
+                    quote = None
+            elif line.startswith('//', i):
+                break
+            elif line.startswith('/*', i):
+                in_block_comment = True
+                i += 2
+                continue
+            else:
+                has_code = has_code or not char.isspace()
+                if char == '/' and _starts_regex(line, i, previous):
+                    end = _regex_literal_end(line, i)
+                    if end is not None:
+                        i = end
+                        previous = '/'
+                        continue
+                if char in '\'"' and _starts_string(line, i):
+                    quote = char
+                elif char == '`':
+                    in_template = True
+                elif char in '{([':
+                    depth += 1
+                elif char in '})]':
+                    depth = max(0, depth - 1)
+                if not char.isspace():
+                    previous = char
+            i += 1
+
+        depths.append(NO_BOUNDARY if in_block_comment or in_template else depth)
+        comment_only.append(bool(line.strip()) and not has_code)
+
+    # Never split after a comment line, so the cut moves above the whole comment block
+    for i, is_comment in enumerate(comment_only):
+        if is_comment:
+            depths[i] = NO_BOUNDARY
+
+    # Never split right before a line that continues the previous statement
+    for i in range(len(lines) - 1):
+        if lines[i + 1].lstrip().startswith(CONTINUATION_PREFIXES):
+            depths[i] = NO_BOUNDARY
+    return depths
+
+
+def _blank_line_boundary_depths(lines):
+    return [0 if not line.strip() else NO_BOUNDARY for line in lines]
+
+
+def boundary_depths(code_content, lines, file_path=None):
+    """Syntactic split points for a file, chosen by its extension."""
+    extension = os.path.splitext(file_path or '')[1].lower()
+    if extension == '.py':
+        try:
+            return _python_boundary_depths(code_content, lines)
+        except (SyntaxError, ValueError):
+            return _blank_line_boundary_depths(lines)
+    if extension in BRACE_LANGUAGE_EXTENSIONS:
+        return _brace_boundary_depths(lines)
+    return _blank_line_boundary_depths(lines)
+
+
+def _hard_split(start, end, prefix, token_budget):
+    pieces = []
+    piece_start = start
+    for i in range(start + 1, end):
+        if prefix[i + 1] - prefix[piece_start] > token_budget:
+            pieces.append((piece_start, i))
+            piece_start = i
+    pieces.append((piece_start, end))
+    return pieces
+
+
+def _split_range(start, end, depths, prefix, token_budget):
+    """Split lines [start, end) at the shallowest boundaries until every piece fits."""
+    if prefix[end] - prefix[start] <= token_budget or end - start <= 1:
+        return [(start, end)]
+
+    target = min(depths[start:end - 1])
+    if target == NO_BOUNDARY:
+        return _hard_split(start, end, prefix, token_budget)
+
+    cuts = [i + 1 for i in range(start, end - 1) if depths[i] == target]
+    bounds = [start] + cuts + [end]
+    pieces = []
+    for piece_start, piece_end in zip(bounds, bounds[1:]):
+        pieces.extend(_split_range(piece_start, piece_end, depths, prefix, token_budget))
+    return pieces
+
+
+def chunk_code(code_content, file_path=None, token_budget=CHUNK_TOKEN_BUDGET):
+    """
+    Split source code into chunks of at most ``token_budget`` tokens.
+
+    Files are cut at syntactic boundaries (``ast`` statements for Python, bracket
+    depth for JS/TS/TSX and other brace languages, blank lines otherwise), preferring
+    the shallowest ones, so functions and components stay whole whenever they fit.
+    Adjacent pieces are then packed together to fill the budget.
+
+    Args:
+        code_content (str): Source code
+        file_path (str, optional): Used to pick the language from the extension
+        token_budget (int): Maximum tokens per chunk
+
+    Yields:
+        str: Code chunks in file order
+    """
+    lines = code_content.splitlines()
+    if not lines:
+        return
+
+    prefix = [0]
+    for line in lines:
+        prefix.append(prefix[-1] + count_tokens(line + '\n'))
+
+    depths = boundary_depths(code_content, lines, file_path)
+    pieces = _split_range(0, len(lines), depths, prefix, token_budget)
+
+    chunk_start = pieces[0][0]
+    for piece_start, piece_end in pieces:
+        if piece_start > chunk_start and prefix[piece_end] - prefix[chunk_start] > token_budget:
+            yield '\n'.join(lines[chunk_start:piece_start])
+            chunk_start = piece_start
+    yield '\n'.join(lines[chunk_start:])
+
+
+# (file name, source, expected brace_boundary depths) for __main__
+BOUNDARY_REGRESSION_CASES = [
+    (
+        "apostrophe_in_jsx.tsx",
+        "export function List({ items }) {\n"
+        "  return (\n"
+        "    <div>\n"
+        "      {items.length > 0 && <p>Don't forget: {items.map((item) => (\n"
+        "        <b key={item}>{item}</b>\n"
+        "      ))}</p>}\n"
+        "    </div>\n"
+        "  );\n"
+        "}\n"
+        "export const after = 1;",
+        [1, 2, 2, 6, NO_BOUNDARY, 2, NO_BOUNDARY, NO_BOUNDARY, 0, 0]
+    ),
+    (
+        "regex_literal.ts",
+        "export function isOpening(char) {\n"
+        "  const pattern = /[{(]/;\n"
+        "  return /[)}]/.test(char) || pattern.test(char) ? 1 / 2 : 0;\n"
+        "}",
+        [1, 1, NO_BOUNDARY, 0]
+    ),
+]
+
+
+if __name__ == "__main__":
+    # Regression check of the brace-language boundaries: python code_chunker.py
+    failures = 0
+    for file_path, source, expected in BOUNDARY_REGRESSION_CASES:
+        depths = boundary_depths(source, source.splitlines(), file_path)
+        status = "ok" if depths == expected else "FAILED"
+        failures += depths != expected
+        print(f"{file_path}: {status} {depths}")
+    raise SystemExit(1 if failures else 0)
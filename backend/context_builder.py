@@ -0,0 +1,146 @@
+import os
+import re
+from token_counter import count_tokens
+
+# Tokens of child documentation allowed in one section prompt
+SECTION_CONTEXT_TOKEN_BUDGET = int(os.getenv("SECTION_CONTEXT_TOKEN_BUDGET", "8000"))
+# Tokens of child documentation allowed when every section is requested in one prompt
+COMBINED_CONTEXT_TOKEN_BUDGET = int(os.getenv("COMBINED_CONTEXT_TOKEN_BUDGET", "16000"))
+# Children that would get less than this are dropped instead of truncated to a stub
+MIN_CHILD_TOKENS = 80
+
+TRUNCATION_MARKER = "\n[... truncated to fit the context window]"
+
+
+def _normalized_ranks(values):
+    """Map each key to its rank position in [0, 1] (1 = highest value)."""
+    ordered = sorted(values, key=lambda key: values[key])
+    if len(ordered) == 1:
+        return {ordered[0]: 1.0}
+    return {key: index / (len(ordered) - 1) for index, key in enumerate(ordered)}
+
+
+def _reference_counts(docs):
+    """How many other children mention each child's module name."""
+    counts = {}
+    for path in docs:
+        name = os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+        if len(name) < 3:
+            counts[path] = 0
+            continue
+        pattern = re.compile(rf"\b{re.escape(name)}\b")
+        counts[path] = sum(1 for other, text in docs.items() if other != path and pattern.search(text))
+    return counts
+
+
+def _modified_time(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def rank_children(docs, sizes):
+    """
+    Order children by importance: size of their documentation, how often other
+    children reference them, and how recently their source changed.
+
+    Args:
+        docs (dict): {path: documentation text}
+        sizes (dict): {path: token count}
+
+    Returns:
+        list: Paths, most important first
+    """
+    size_rank = _normalized_ranks(sizes)
+    reference_rank = _normalized_ranks(_reference_counts(docs))
+    recency_rank = _normalized_ranks({path: _modified_time(path) for path in docs})
+    return sorted(
+        docs,
+        key=lambda path: size_rank[path] + reference_rank[path] + recency_rank[path],
+        reverse=True
+    )
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut ``text`` at a line boundary so it fits ``max_tokens`` including the truncation marker."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens - count_tokens(TRUNCATION_MARKER))
+    cut = int(len(text) * limit / max(count_tokens(text), 1))
+    while cut > 0:
+        candidate = text[:cut]
+        newline = candidate.rfind("\n")
+        if newline > cut // 2:
+            candidate = candidate[:newline]
+        if count_tokens(candidate) <= limit:
+            return candidate.rstrip() + TRUNCATION_MARKER
+        cut = int(cut * 0.9)
+    return TRUNCATION_MARKER.strip()
+
+
+def fit_documents_to_budget(docs, token_budget):
+    """
+    Select and shorten child documentation so the total fits ``token_budget``.
+
+    Children that fit their share are kept whole and their unused share is
+    redistributed; the rest share what is left in proportion to their rank, so
+    lower-ranked children are truncated first and dropped when their share falls
+    below MIN_CHILD_TOKENS.
+
+    Args:
+        docs (dict): {path: documentation text}
+        token_budget (int): Maximum total tokens
+
+    Returns:
+        tuple: (kept, omitted) where ``kept`` is a list of (path, text) in the input
+        order and ``omitted`` a list of {"path", "reason", "tokens"} for every child
+        that was truncated or dropped
+    """
+    sizes = {path: count_tokens(text) for path, text in docs.items()}
+    if sum(sizes.values()) <= token_budget:
+        return list(docs.items()), []
+
+    ranked = rank_children(docs, sizes)
+    weights = {path: len(ranked) - index for index, path in enumerate(ranked)}
+    allocation = {}
+    remaining = list(ranked)
+    remaining_budget = token_budget
+
+    while remaining and remaining_budget > 0:
+        total_weight = sum(weights[path] for path in remaining)
+        grants = {path: remaining_budget * weights[path] / total_weight for path in remaining}
+        whole = [path for path in remaining if sizes[path] <= grants[path]]
+        if not whole:
+            for path in remaining:
+                allocation[path] = int(grants[path])
+            break
+        for path in whole:
+            allocation[path] = sizes[path]
+            remaining_budget -= sizes[path]
+        remaining = [path for path in remaining if path not in allocation]
+
+    kept = []
+    omitted = []
+    for path, text in docs.items():
+        share = allocation.get(path, 0)
+        if share >= sizes[path]:
+            kept.append((path, text))
+        elif share >= MIN_CHILD_TOKENS:
+            kept.append((path, truncate_to_tokens(text, share)))
+            omitted.append({"path": path, "reason": "truncated", "tokens": sizes[path]})
+        else:
+            omitted.append({"path": path, "reason": "dropped", "tokens": sizes[path]})
+    return kept, omitted
+
+
+def describe_omissions(omitted, doc_type="File"):
+    """Prompt note listing children that were shortened or left out, or "" if none were."""
+    if not omitted:
+        return ""
+    entries = ", ".join(f"{item['path']} ({item['reason']})" for item in omitted)
+    return (
+        f"Note: documentation for the following {doc_type.lower()}s was shortened or omitted to fit "
+        f"the context window: {entries}. State that their documentation was not fully available "
+        f"rather than guessing about them."
+    )
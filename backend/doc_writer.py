@@ -0,0 +1,269 @@
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+APP_DB_PATH = 'app.db'
+# A batch is committed once it holds this many rows or its oldest row is this old
+WRITE_BATCH_SIZE = 100
+WRITE_FLUSH_INTERVAL = 0.5
+
+
+def init_documentation_tables(conn):
+    """Create the documentation and section tables on an open app.db connection."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS documentation (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            path TEXT NOT NULL,
+            doc TEXT NOT NULL,
+            project_name TEXT NOT NULL,
+            level TEXT NOT NULL,
+            root_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'completed',
+            content_hash TEXT, -- hash of the source (files) or of child hashes (folders/projects)
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Added updated_at
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+    # Add columns introduced after the table was first created
+    documentation_columns = {row[1] for row in conn.execute("PRAGMA table_info(documentation)")}
+    if 'content_hash' not in documentation_columns:
+        conn.execute("ALTER TABLE documentation ADD COLUMN content_hash TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_documentation_user_root ON documentation (user_id, root_path)")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS documentation_sections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            documentation_id INTEGER NOT NULL,
+            section_name TEXT NOT NULL,
+            section_content TEXT NOT NULL,
+            prompt_used TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Added updated_at
+            FOREIGN KEY (documentation_id) REFERENCES documentation(id)
+        )
+    """)
+
+
+class DocumentationWriteError(Exception):
+    """Documentation generated by a job could not be committed."""
+
+
+class _DocumentationRow:
+    def __init__(self, values, sections, job_id, future):
+        self.values = values
+        self.sections = sections
+        self.job_id = job_id
+        self.future = future
+
+
+class _EventRow:
+    def __init__(self, job_id, event_type, payload, future):
+        self.job_id = job_id
+        self.event_type = event_type
+        self.payload = payload
+        self.future = future
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class DocumentationWriter:
+    """
+    Single background writer for generated documentation and sections.
+
+    Rows from every generation thread are queued and committed together in one
+    transaction per batch, so threads never contend for the SQLite write lock and
+    a batch costs one commit instead of one per row.
+    """
+    def __init__(self, db_path=APP_DB_PATH, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL):
+        """
+        Args:
+            db_path (str): Path to the application database
+            batch_size (int): Rows per transaction before a forced commit
+            flush_interval (float): Maximum seconds a row waits before being committed
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self.batches_written = 0
+        self.items_written = 0
+        self.write_seconds = 0.0
+        self.max_write_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="documentation-writer", daemon=True)
+        self._thread.start()
+
+    def submit_documentation(self, user_id, path, doc, project_name, level, root_path, content_hash=None, sections=None, job_id=None):
+        """
+        Queue a documentation row, optionally with its sections.
+
+        Args:
+            sections (list, optional): (section_name, section_content, prompt_used) tuples
+                stored against the new row's id in the same transaction
+            job_id (str, optional): Generation job to record a checkpoint and a
+                node_completed event for, committed together with the row so a resumed
+                job never sees a half-written node
+
+        Returns:
+            Future: Resolves to the new documentation id once committed
+        """
+        future = Future()
+        values = (user_id, path, doc, project_name, level, root_path, content_hash)
+        self._put(_DocumentationRow(values, sections or [], job_id, future))
+        return future
+
+    def submit_event(self, job_id, event_type, payload):
+        """
+        Queue a generation event row.
+
+        Returns:
+            Future: Resolves to None once committed
+        """
+        future = Future()
+        self._put(_EventRow(job_id, event_type, payload, future))
+        return future
+
+    def flush(self, timeout=None):
+        """Block until everything queued before this call has been committed."""
+        request = _FlushRequest()
+        self._put(request)
+        return request.done.wait(timeout)
+
+    def close(self):
+        """Flush pending rows and stop the writer thread."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _put(self, item):
+        if self._closed:
+            raise RuntimeError("Documentation writer is closed")
+        self._queue.put(item)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            stopping = False
+            while not stopping:
+                batch = []
+                flushes = []
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while item is not None:
+                    if isinstance(item, _FlushRequest):
+                        flushes.append(item)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                if item is None:
+                    stopping = True
+
+                if batch:
+                    started = time.monotonic()
+                    self._write_batch(conn, batch)
+                    self._record_write(len(batch), time.monotonic() - started)
+                for request in flushes:
+                    request.done.set()
+        finally:
+            conn.close()
+
+    def _record_write(self, items, seconds):
+        with self._stats_lock:
+            self.batches_written += 1
+            self.items_written += items
+            self.write_seconds += seconds
+            self.max_write_seconds = max(self.max_write_seconds, seconds)
+
+    def stats(self):
+        """Batches committed so far and how long their transactions took."""
+        with self._stats_lock:
+            return {
+                "batches": self.batches_written,
+                "items": self.items_written,
+                "mean_batch_seconds": self.write_seconds / self.batches_written if self.batches_written else None,
+                "max_batch_seconds": self.max_write_seconds
+            }
+
+    def _write_batch(self, conn, batch):
+        results = []
+        try:
+            cursor = conn.cursor()
+            for item in batch:
+                if isinstance(item, _DocumentationRow):
+                    cursor.execute('''
+                    INSERT OR REPLACE INTO documentation (user_id, path, doc, project_name, level, root_path, content_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', item.values)
+                    documentation_id = cursor.lastrowid
+                    self._insert_sections(cursor, documentation_id, item.sections)
+                    if item.job_id is not None:
+                        cursor.execute('''
+                        INSERT OR REPLACE INTO generation_checkpoints (job_id, path, level, content_hash, documentation_id)
+                        VALUES (?, ?, ?, ?, ?)
+                        ''', (item.job_id, item.values[1], item.values[4], item.values[6], documentation_id))
+                        self._insert_event(cursor, item.job_id, 'node_completed', {
+                            "path": item.values[1],
+                            "level": item.values[4],
+                            "documentation_id": documentation_id
+                        })
+                    results.append(documentation_id)
+                else:
+                    self._insert_event(cursor, item.job_id, item.event_type, item.payload)
+                    results.append(None)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"ERROR writing batch of {len(batch)} documentation rows: {e}")
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+
+    @staticmethod
+    def _insert_event(cursor, job_id, event_type, payload):
+        cursor.execute('''
+        INSERT INTO generation_events (job_id, event_type, payload, created_at)
+        VALUES (?, ?, ?, ?)
+        ''', (job_id, event_type, json.dumps(payload), time.time()))
+
+    @staticmethod
+    def _insert_sections(cursor, documentation_id, sections):
+        cursor.executemany('''
+        INSERT INTO documentation_sections (documentation_id, section_name, section_content, prompt_used)
+        VALUES (?, ?, ?, ?)
+        ''', [(documentation_id, name, content, prompt) for name, content, prompt in sections])
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_documentation_writer():
+    """Return the process-wide writer, starting it on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DocumentationWriter()
+            atexit.register(_writer.close)
+        return _writer
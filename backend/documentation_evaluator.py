@@ -2,7 +2,7 @@ import os
 import json
 import re
 from typing import Dict, Any, List, Optional
-from groq import Groq
+from llm_client import chat_completion
 from dotenv import load_dotenv
 from database_manager import get_documentation_db, get_evaluation_db
 
@@ -14,9 +14,8 @@ class DocumentationEvaluator:
         Initialize the Documentation Evaluator
         
         Args:
-            model (str): Groq model to use for evaluation
+            model (str): Model to use for evaluation
         """
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = model
         self.doc_db = get_documentation_db()
         self.eval_db = get_evaluation_db()
@@ -264,14 +263,12 @@ class DocumentationEvaluator:
         
         # Generate evaluation
         try:
-            response = self.client.chat.completions.create(
+            evaluation_content = chat_completion(
                 model=evaluation_model,
                 messages=messages,
                 max_tokens=4000
             )
             
-            evaluation_content = response.choices[0].message.content
-            
             # Calculate detailed scores
             score_breakdown = self._calculate_overall_score(evaluation_content)
             
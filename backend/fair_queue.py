@@ -0,0 +1,197 @@
+import os
+import heapq
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Requests allowed in flight at once across every job in this process
+MAX_CONCURRENT_REQUESTS = int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", "8"))
+# Estimated prompt + completion tokens allowed in flight at once across every job
+MAX_INFLIGHT_TOKENS = int(os.getenv("LLM_MAX_INFLIGHT_TOKENS", "120000"))
+
+# Requests held back from batch work so an interactive request never waits for a full pool
+INTERACTIVE_RESERVED_REQUESTS = int(os.getenv("LLM_INTERACTIVE_RESERVED_REQUESTS", "1"))
+
+DEFAULT_TENANT = "_default"
+
+# Lanes, in dispatch order: a waiting interactive request is admitted before any batch request
+INTERACTIVE_LANE = 0
+BATCH_LANE = 1
+
+# (tenant, job, weight, lane) of the work running in the current context
+_current_scope = contextvars.ContextVar("request_scope", default=(DEFAULT_TENANT, None, 1.0, BATCH_LANE))
+
+
+@contextmanager
+def request_scope(tenant, job=None, weight=1.0, lane=BATCH_LANE):
+    """
+    Attribute LLM requests made in this context to ``tenant`` (a user) and ``job``
+    for fair scheduling.
+
+    Args:
+        tenant (str): User the work is done for
+        job (str, optional): Job within the tenant
+        weight (float): Relative share of the tenant
+        lane (int): INTERACTIVE_LANE for requests a user is waiting on, BATCH_LANE otherwise
+    """
+    token = _current_scope.set((tenant, job, weight, lane))
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def current_flow():
+    """
+    Returns:
+        tuple: (tenant, job, lane) of the work running in the current context
+    """
+    tenant, job, _, lane = _current_scope.get()
+    return tenant, job, lane
+
+
+def iterate_in_scope(make_iterator, tenant, job=None, weight=1.0, lane=BATCH_LANE):
+    """
+    Drive the iterator returned by ``make_iterator`` inside a request scope.
+
+    Streaming responses are advanced one item at a time, possibly from different
+    threads, so a ``with request_scope(...)`` inside them would not hold; every
+    step runs in one dedicated context instead.
+    """
+    context = contextvars.copy_context()
+    context.run(_current_scope.set, (tenant, job, weight, lane))
+    iterator = context.run(make_iterator)
+    try:
+        while True:
+            try:
+                item = context.run(next, iterator)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            context.run(close)
+
+
+class _Waiter:
+    def __init__(self, flow, cost, lane):
+        self.flow = flow
+        self.cost = cost
+        self.lane = lane
+        self.granted = threading.Event()
+
+
+class FairRequestGate:
+    """
+    Process-wide admission control for LLM requests.
+
+    At most ``max_requests`` requests and ``max_tokens`` estimated tokens are in
+    flight at once. Waiting requests are admitted by start-time fair queuing over
+    flows, one flow per (tenant, job): every tenant gets an equal share of the
+    token throughput (scaled by its weight), split evenly between its active jobs.
+    A request is charged its estimated tokens, so a job sending a steady stream of
+    large prompts can't starve a small job that only needs a few calls.
+
+    Interactive requests form a separate lane that is always dispatched first, and
+    ``reserved_requests`` slots are kept free of batch work for them.
+    """
+    def __init__(self, max_requests=MAX_CONCURRENT_REQUESTS, max_tokens=MAX_INFLIGHT_TOKENS,
+                 reserved_requests=INTERACTIVE_RESERVED_REQUESTS):
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        # Batch work always keeps at least one slot
+        self.batch_requests = max(1, max_requests - reserved_requests)
+        self._lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._active = {}
+        self.in_flight_requests = 0
+        self.in_flight_tokens = 0
+
+    def _flow_weight(self, tenant, weight):
+        jobs = sum(1 for (flow_tenant, _), count in self._active.items() if flow_tenant == tenant and count > 0)
+        return weight / max(1, jobs)
+
+    def _fits(self, cost, lane):
+        limit = self.max_requests if lane == INTERACTIVE_LANE else self.batch_requests
+        if self.in_flight_requests >= limit:
+            return False
+        # A request larger than the whole token budget still runs, alone
+        return self.in_flight_tokens == 0 or self.in_flight_tokens + cost <= self.max_tokens
+
+    def _dispatch(self):
+        while self._queue:
+            _, start, _, waiter = self._queue[0]
+            if not self._fits(waiter.cost, waiter.lane):
+                return
+            heapq.heappop(self._queue)
+            self._virtual_time = max(self._virtual_time, start)
+            self.in_flight_requests += 1
+            self.in_flight_tokens += waiter.cost
+            waiter.granted.set()
+
+    def acquire(self, cost):
+        """
+        Wait for this context's turn to send a request.
+
+        Args:
+            cost (int): Estimated tokens of the request
+
+        Returns:
+            tuple: Grant to pass back to ``release``
+        """
+        tenant, job, weight, lane = _current_scope.get()
+        flow = (tenant, job)
+        with self._lock:
+            self._active[flow] = self._active.get(flow, 0) + 1
+            start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+            self._last_finish[flow] = start + cost / self._flow_weight(tenant, weight)
+            waiter = _Waiter(flow, cost, lane)
+            heapq.heappush(self._queue, (lane, start, next(self._sequence), waiter))
+            self._dispatch()
+        waiter.granted.wait()
+        return flow, cost
+
+    def release(self, grant):
+        flow, cost = grant
+        with self._lock:
+            self.in_flight_requests -= 1
+            self.in_flight_tokens -= cost
+            self._active[flow] -= 1
+            if self._active[flow] == 0:
+                del self._active[flow]
+                # Once virtual time has passed an idle flow's tag it no longer matters
+                if self._last_finish.get(flow, 0.0) <= self._virtual_time:
+                    self._last_finish.pop(flow, None)
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, cost):
+        """Hold an admission slot for the duration of the block."""
+        grant = self.acquire(cost)
+        try:
+            yield
+        finally:
+            self.release(grant)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight_requests": self.in_flight_requests,
+                "in_flight_tokens": self.in_flight_tokens,
+                "waiting_requests": len(self._queue),
+                "waiting_interactive_requests": sum(1 for entry in self._queue if entry[0] == INTERACTIVE_LANE),
+                "active_flows": len(self._active)
+            }
+
+
+_gate = FairRequestGate()
+
+
+def get_request_gate():
+    """Return the process-wide request gate."""
+    return _gate
@@ -0,0 +1,151 @@
+import os
+import math
+import fnmatch
+from collections import Counter
+
+# Files above this size are never sent to the model
+MAX_DOCUMENTED_FILE_BYTES = int(os.getenv("MAX_DOCUMENTED_FILE_BYTES", str(1024 * 1024)))
+# Bytes read from the head of a file to classify it
+SNIFF_BYTES = 64 * 1024
+
+# Share of control bytes above which a file without NUL bytes is still treated as binary
+BINARY_CONTROL_RATIO = 0.1
+# Average or longest line length (in the sniffed head) that marks minified code
+MINIFIED_AVERAGE_LINE = 300
+MINIFIED_LONGEST_LINE = 5000
+# Bits per character above which long-lined text is packed data rather than code
+DATA_ENTROPY_BITS = 5.5
+
+DOCUMENT = 'document'
+SUMMARIZE = 'summarize'
+SKIP = 'skip'
+
+GENERATED_FILE_PATTERNS = (
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml', 'bun.lockb',
+    'poetry.lock', 'Pipfile.lock', 'Cargo.lock', 'composer.lock', 'Gemfile.lock', 'go.sum',
+    '*.min.js', '*.min.css', '*.map', '*.bundle.js', '*.chunk.js',
+    '*_pb2.py', '*_pb2_grpc.py', '*.pb.go', '*.pb.cc', '*.pb.h', '*.g.dart', '*.designer.cs'
+)
+
+# Markers code generators put in the first lines of their output
+GENERATED_MARKERS = (
+    b'@generated', b'do not edit', b'code generated', b'auto-generated', b'autogenerated',
+    b'this file is generated', b'this file was generated'
+)
+
+BINARY_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.pdf', '.zip', '.gz', '.tgz', '.tar',
+    '.7z', '.rar', '.jar', '.war', '.class', '.pyc', '.pyo', '.so', '.dll', '.dylib', '.exe', '.o',
+    '.a', '.woff', '.woff2', '.ttf', '.otf', '.eot', '.mp3', '.mp4', '.wav', '.mov', '.avi', '.sqlite',
+    '.db', '.pkl', '.npy', '.parquet'
+}
+
+_TEXT_CONTROL_BYTES = {9, 10, 12, 13, 27}
+
+
+class FileClassification:
+    """Outcome of classifying one selected file before generation."""
+    def __init__(self, action, reason=None, size=0, lines=None):
+        """
+        Args:
+            action (str): DOCUMENT, SUMMARIZE (documented locally from metadata) or SKIP
+            reason (str, optional): Why the file is not sent to the model
+            size (int): File size in bytes
+            lines (int, optional): Line count, when known
+        """
+        self.action = action
+        self.reason = reason
+        self.size = size
+        self.lines = lines
+
+    def to_dict(self):
+        return {"action": self.action, "reason": self.reason, "size": self.size}
+
+
+def _entropy(data):
+    counts = Counter(data)
+    total = len(data)
+    return -sum(count / total * math.log2(count / total) for count in counts.values())
+
+
+def _is_binary(head):
+    if b'\0' in head:
+        return True
+    if not head:
+        return False
+    control = sum(1 for byte in head if byte < 32 and byte not in _TEXT_CONTROL_BYTES)
+    return control / len(head) > BINARY_CONTROL_RATIO
+
+
+def classify_file(path):
+    """
+    Decide whether a selected file is worth sending to the model, reading at most
+    SNIFF_BYTES of it.
+
+    Binary files are skipped. Lockfiles, generated code, minified bundles, packed
+    data and files over MAX_DOCUMENTED_FILE_BYTES are summarized locally from their
+    metadata instead of being documented by the model.
+
+    Returns:
+        FileClassification
+    """
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as file:
+            head = file.read(SNIFF_BYTES)
+    except OSError as e:
+        return FileClassification(SKIP, f"unreadable: {e}")
+
+    name = os.path.basename(path)
+    if os.path.splitext(name)[1].lower() in BINARY_EXTENSIONS or _is_binary(head):
+        return FileClassification(SKIP, "binary file", size)
+
+    lines = head.count(b'\n') + (1 if head and not head.endswith(b'\n') else 0)
+    # The line count is only known when the whole file fit in the sniffed head
+    total_lines = lines if size <= len(head) else None
+
+    if any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_FILE_PATTERNS):
+        return FileClassification(SUMMARIZE, "lockfile or generated file", size, total_lines)
+
+    first_lines = b'\n'.join(head.split(b'\n', 5)[:5]).lower()
+    if any(marker in first_lines for marker in GENERATED_MARKERS):
+        return FileClassification(SUMMARIZE, "marked as generated", size, total_lines)
+
+    if size > MAX_DOCUMENTED_FILE_BYTES:
+        return FileClassification(
+            SUMMARIZE, f"larger than {MAX_DOCUMENTED_FILE_BYTES // 1024} KB", size, total_lines
+        )
+
+    if head:
+        line_lengths = [len(line) for line in head.split(b'\n')]
+        average = len(head) / max(1, lines)
+        if average > MINIFIED_AVERAGE_LINE or max(line_lengths) > MINIFIED_LONGEST_LINE:
+            if _entropy(head) > DATA_ENTROPY_BITS:
+                return FileClassification(SUMMARIZE, "encoded or packed data", size, total_lines)
+            return FileClassification(SUMMARIZE, "minified code", size, total_lines)
+
+    return FileClassification(DOCUMENT, size=size, lines=total_lines)
+
+
+def summarize_file_locally(path, classification):
+    """
+    Documentation for a file that is not sent to the model, built from its metadata.
+
+    Returns:
+        str: Markdown documentation
+    """
+    name = os.path.basename(path)
+    extension = os.path.splitext(name)[1] or "none"
+    details = [
+        f"- **Path:** {path}",
+        f"- **Type:** {extension}",
+        f"- **Size:** {classification.size:,} bytes"
+    ]
+    if classification.lines is not None:
+        details.append(f"- **Lines:** {classification.lines:,}")
+    return (
+        f"# {name}\n\n"
+        f"This file was not documented by the model ({classification.reason}).\n\n"
+        + "\n".join(details)
+        + "\n"
+    )
@@ -1,33 +1,22 @@
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from groq import Groq
+from llm_client import chat_completion, stream_chat_completion, fan_out, estimate_tokens
+from code_chunker import chunk_code, CHUNK_TOKEN_BUDGET
+from prompt_settings import get_prompt_snapshot, register_renderer
 from dotenv import load_dotenv
-import sqlite3
 
 load_dotenv()
 
-DB_PATH = "settings.db"
+# Largest amount of chunk documentation (in tokens) sent to a single consolidation call
+CONSOLIDATION_TOKEN_BUDGET = 6000
+CHUNK_DOC_SEPARATOR = "\n\n---\n\n"
 
-client = Groq(
-    api_key=os.getenv("GROQ_API_KEY"),
-)
+def _render_file_prompts(settings):
+    return {key: value for key, value in settings.items() if key.startswith('file_')}
 
-def get_prompts_from_db():
-    """Fetch all prompts from the database with keys starting with 'file_'."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT key, value FROM settings WHERE key LIKE 'file_%'")
-    rows = cursor.fetchall()
-    prompts = {row['key']: row['value'] for row in rows}
-    conn.close()
-    return prompts
-
-def chunk_code(code_content, chunk_size=300):
-    lines = code_content.splitlines()
-    for i in range(0, len(lines), chunk_size):
-        yield '\n'.join(lines[i:i + chunk_size])
+register_renderer('file_prompts', _render_file_prompts)
 
+def get_prompts_from_db():
+    """Fetch all prompts with keys starting with 'file_' from the cached settings snapshot."""
+    return get_prompt_snapshot().rendered('file_prompts')
 
 def generate_chunk_sections(chunk, file_path, small_model):
 
@@ -50,11 +39,10 @@ def generate_chunk_sections(chunk, file_path, small_model):
     {"role": "user", "content": "Maintain a precise, factual tone. Provide documentation for this chunk of code in a professional format, strictly based on the provided code."}
 ]
 
-    chunk_prompt_response = client.chat.completions.create(
+    documentation = chat_completion(
         model=small_model,
         messages=chunk_prompt,
     )
-    documentation = chunk_prompt_response.choices[0].message.content
 
 
     # Return combined sections
@@ -62,44 +50,86 @@ def generate_chunk_sections(chunk, file_path, small_model):
 
 
 
-def generate_high_level_sections(chunks_sections, file_path, small_model):
-
+def build_consolidation_messages(chunks_sections, file_path):
     prompts = get_prompts_from_db()
     
     system_prompt = prompts.get('file_consolidate_prompt', '')
 
-    consolidate_prompt = [
+    return [
     {"role": "system", "content": f"""
     {system_prompt}
 
     Below are the chunk-level documentations to be consolidated into file-level documentation:
     File Path: {file_path}
 
-    {chunks_sections}
+    {CHUNK_DOC_SEPARATOR.join(chunks_sections)}
     """},
 
     {"role": "user", "content": "Using the provided chunk-level documentations, consolidate the information into a single, detailed file-level documentation. Maintain clarity and consistency, and make sure to follow the structure provided."}
 ]
 
-    consolidated_doc_response = client.chat.completions.create(
+
+def generate_high_level_sections(chunks_sections, file_path, small_model):
+
+    documentation = chat_completion(
         model=small_model,
-        messages=consolidate_prompt,
+        messages=build_consolidation_messages(chunks_sections, file_path),
     )
 
-    documentation = consolidated_doc_response.choices[0].message.content
-
     # Return combined sections
     return documentation
 
 
-# Updated documentation generation function for larger files
-def generate_documentation_for_file(file_path, small_model):
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-        code_content = file.read()
+def group_chunk_docs(chunk_docs, token_budget):
+    """
+    Greedily pack consecutive chunk docs into groups that fit ``token_budget``.
+    Every group holds at least two docs (when available) so each reduce round shrinks the list.
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    for doc in chunk_docs:
+        doc_tokens = estimate_tokens(doc)
+        if len(current) >= 2 and current_tokens + doc_tokens > token_budget:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(doc)
+        current_tokens += doc_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def reduce_chunk_docs(chunk_docs, file_path, small_model, token_budget=CONSOLIDATION_TOKEN_BUDGET):
+    """
+    Tree-reduce chunk documentation until it fits a single consolidation call.
 
-    # Define a threshold for chunking based on the number of lines in the file
-    chunk_threshold = 300
+    While the chunk docs together exceed ``token_budget``, groups of them are
+    consolidated concurrently and the partial results consolidated again, so no
+    single consolidation call overflows the model's context window.
+
+    Returns:
+        list: Chunk docs that fit ``token_budget`` together
+    """
+    while len(chunk_docs) > 1 and estimate_tokens(CHUNK_DOC_SEPARATOR.join(chunk_docs)) > token_budget:
+        groups = group_chunk_docs(chunk_docs, token_budget)
+        print(f"Reducing {len(chunk_docs)} chunk docs for {file_path} in {len(groups)} groups")
+        chunk_docs = fan_out(
+            lambda group: group[0] if len(group) == 1 else generate_high_level_sections(group, file_path, small_model),
+            groups
+        )
+    return chunk_docs
 
+
+def consolidate_chunk_docs(chunk_docs, file_path, small_model, token_budget=CONSOLIDATION_TOKEN_BUDGET):
+    """Tree-reduce chunk documentation into a single file-level documentation."""
+    return generate_high_level_sections(
+        reduce_chunk_docs(chunk_docs, file_path, small_model, token_budget), file_path, small_model
+    )
+
+
+def build_file_messages(file_path, code_content):
     prompts = get_prompts_from_db()
     system_prompt = prompts.get('file_prompt', '')
 
@@ -111,22 +141,63 @@ def generate_documentation_for_file(file_path, small_model):
     Code:
     {code_content}
     """
+    return [
+        {"role": "system", "content": file_prompt},
+        {"role": "user", "content": "Maintain a precise and factual tone. Avoid assumptions and speculation. Provide the documentation for the target file in a professional format."}
+    ]
+
 
-    # Check if chunking is necessary
-    if chunk_threshold < len(code_content.splitlines()) and len(code_content.splitlines()) - chunk_threshold > 50:
-        chunks = chunk_code(code_content)
-        chunk_docs = [generate_chunk_sections(chunk, file_path, small_model) for chunk in chunks]
-        documentation = generate_high_level_sections(chunk_docs, file_path, small_model)
+def _read_source(file_path):
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+        return file.read()
+
+
+def _chunk_docs_for(code_content, file_path, small_model):
+    chunks = list(chunk_code(code_content, file_path))
+    return fan_out(lambda chunk: generate_chunk_sections(chunk, file_path, small_model), chunks)
+
+
+# Updated documentation generation function for larger files
+def generate_documentation_for_file(file_path, small_model):
+    code_content = _read_source(file_path)
+
+    # Chunk only files that don't fit a single request's token budget
+    if estimate_tokens(code_content) > CHUNK_TOKEN_BUDGET:
+        chunk_docs = _chunk_docs_for(code_content, file_path, small_model)
+        documentation = consolidate_chunk_docs(chunk_docs, file_path, small_model)
     else:
-        file_prompt_response = client.chat.completions.create(
+        documentation = chat_completion(
             model=small_model,
-            messages=[
-                {"role": "system", "content": file_prompt},
-                {"role": "user", "content": "Maintain a precise and factual tone. Avoid assumptions and speculation. Provide the documentation for the target file in a professional format."}
-            ],
+            messages=build_file_messages(file_path, code_content),
             temperature=0.5,
             max_tokens=8000,
         )
-        documentation = file_prompt_response.choices[0].message.content
 
     return documentation
+
+
+def stream_documentation_for_file(file_path, small_model):
+    """
+    Generate a file's documentation, yielding the text as the model produces it.
+
+    Large files still document their chunks up front; only the final
+    consolidation is streamed.
+
+    Yields:
+        str: Content deltas of the final documentation
+    """
+    code_content = _read_source(file_path)
+
+    if estimate_tokens(code_content) > CHUNK_TOKEN_BUDGET:
+        chunk_docs = reduce_chunk_docs(_chunk_docs_for(code_content, file_path, small_model), file_path, small_model)
+        yield from stream_chat_completion(
+            model=small_model,
+            messages=build_consolidation_messages(chunk_docs, file_path),
+        )
+    else:
+        yield from stream_chat_completion(
+            model=small_model,
+            messages=build_file_messages(file_path, code_content),
+            temperature=0.5,
+            max_tokens=8000,
+        )
@@ -1,17 +1,12 @@
-import os
-import sqlite3
-from groq import Groq
+from prompt_settings import get_prompt_snapshot, register_renderer
+from llm_client import chat_completion, fan_out
+from job_control import JobCancelled
 from dotenv import load_dotenv
-from sections_extractor import extract_all_sections_for_files
+from sections_extractor import extract_all_sections_for_files, split_combined_sections, format_child_context, SECTION_MARKER, SECTION_ERROR_PREFIX
+from context_builder import fit_documents_to_budget, describe_omissions, SECTION_CONTEXT_TOKEN_BUDGET, COMBINED_CONTEXT_TOKEN_BUDGET
 
 load_dotenv()
 
-client = Groq(
-    api_key=os.getenv("GROQ_API_KEY"),
-)
-
-# Path to your DB file (update as needed)
-DB_PATH = "settings.db"
 # Default prompt templates (fallback if no DB prompt is found)
 default_section_formats = {
     "folder_overview": """### 1. Overview and Purpose
@@ -120,20 +115,17 @@ sections_mappings = {"folder_overview":"Overview and Purpose",
                      "folder_examples": "Code Snippets and Examples"}
 
 def get_prompts_from_db():
-    """Fetch all prompts from the database with keys matching those in default_section_formats."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Fetch prompts for keys that match the default_section_formats keys
-    cursor.execute("SELECT key, value FROM settings WHERE key IN ({})".format(
-        ', '.join(['?'] * len(default_section_formats))
-    ), list(default_section_formats.keys()))
-    
-    rows = cursor.fetchall()
-    prompts = {row['key']: row['value'] for row in rows}
-    conn.close()
-    return prompts
+    """Fetch all prompts with keys matching those in default_section_formats from the cached settings snapshot."""
+    return get_prompt_snapshot().with_keys(default_section_formats.keys())
+
+def _render_section_formats(settings):
+    """Section formats from the settings table, falling back to the defaults."""
+    return {
+        section: settings.get(section, default_prompt)
+        for section, default_prompt in default_section_formats.items()
+    }
+
+register_renderer('folder_section_formats', _render_section_formats)
 
 # Function to combine subfolder documentation sections into a single string
 def combine_folder_documentation(subfolder_docs):
@@ -142,7 +134,32 @@ def combine_folder_documentation(subfolder_docs):
         combined_doc += f"\n{content}\n\n"  # Add section heading and content
     return combined_doc
 
-def generate_folder_level_documentation(folder_path, file_documentation, subfolder_documentation, folder_level_model):
+# Instructions shared by the per-section and single-call folder prompts
+FOLDER_PROMPT_REQUIREMENTS = """You are a technical documentation expert creating comprehensive folder-level documentation. Your task is to synthesize information from multiple files and subfolders into cohesive, accurate documentation.
+
+Key Requirements:
+- Focus on factual information derived directly from the provided documentation
+- Maintain consistent terminology across sections
+- Highlight relationships and dependencies between components
+- Use clear, precise language without speculation
+- Include only information that is explicitly present in the source documentation"""
+
+FOLDER_PROMPT_GUIDELINES = """Guidelines:
+1. Synthesize information across all files and subfolders to create a unified narrative
+2. Preserve technical accuracy and specificity from source documentation
+3. Highlight common patterns and relationships
+4. Use consistent terminology throughout
+5. Format code examples with proper syntax highlighting
+6. Include cross-references between related components"""
+
+def generate_folder_level_documentation(folder_path, file_documentation, subfolder_documentation, folder_level_model, single_call=False):
+    """
+    Generate the folder-level documentation sections from file and subfolder documentation.
+
+    With ``single_call`` the child documentation is sent once and every section is
+    requested in one delimited response; sections that can't be parsed out of it
+    are generated with the regular per-section prompts.
+    """
     # Extract sections from files and subfolders (if provided)
     if file_documentation is not None:
         file_documentation = extract_all_sections_for_files(file_documentation)
@@ -151,32 +168,30 @@ def generate_folder_level_documentation(folder_path, file_documentation, subfold
         subfolder_documentation = extract_all_sections_for_files(subfolder_documentation)
         print(f"Subfolder Found!: {folder_path}")
 
-    # Fetch prompts from the DB. These are expected to have keys like "folder_overview", etc.
-    db_prompts = get_prompts_from_db()
+    # Section formats (DB prompts over defaults) are rendered once per settings snapshot
+    section_formats = get_prompt_snapshot().rendered('folder_section_formats')
 
-    # Build the final section formats by checking if a prompt exists in the DB.
-    section_formats = {}
-    for section, default_prompt in default_section_formats.items():
-        section_formats[section] = db_prompts.get(section, default_prompt)
+    # Files and subfolders share each prompt's context budget
+    has_subfolders = bool(subfolder_documentation) and any(subfolder_documentation.values())
+    context_shares = 2 if has_subfolders else 1
 
     # Helper function to format documentation summaries from the extracted sections
     def format_summaries(documentation_dict, section_name, doc_type="File"):
         if not documentation_dict:
             return f"No {doc_type.lower()} documentation available."
-        return "\n".join([
+        kept, omitted = fit_documents_to_budget(
+            documentation_dict[sections_mappings[section_name]],
+            SECTION_CONTEXT_TOKEN_BUDGET // context_shares
+        )
+        summaries = "\n".join([
             f"{doc_type}: {path}\n{sections_mappings[section_name]}: {content}"
-            for path, content in documentation_dict[sections_mappings[section_name]].items()
+            for path, content in kept
         ])
+        note = describe_omissions(omitted, doc_type)
+        return f"{summaries}\n{note}" if note else summaries
 
     def create_base_prompt(folder_path, section_name, section_format, file_summaries, subfolder_summaries):
-        return f"""You are a technical documentation expert creating comprehensive folder-level documentation. Your task is to synthesize information from multiple files and subfolders into cohesive, accurate documentation.
-
-Key Requirements:
-- Focus on factual information derived directly from the provided documentation
-- Maintain consistent terminology across sections
-- Highlight relationships and dependencies between components
-- Use clear, precise language without speculation
-- Include only information that is explicitly present in the source documentation
+        return f"""{FOLDER_PROMPT_REQUIREMENTS}
 
 Context:
 Folder Path: {folder_path}
@@ -190,13 +205,29 @@ Files Documentation:
 Output Format:
 {section_format}
 
-Guidelines:
-1. Synthesize information across all files and subfolders to create a unified narrative
-2. Preserve technical accuracy and specificity from source documentation
-3. Highlight common patterns and relationships
-4. Use consistent terminology throughout
-5. Format code examples with proper syntax highlighting
-6. Include cross-references between related components"""
+{FOLDER_PROMPT_GUIDELINES}"""
+
+    def create_combined_prompt(folder_path, section_formats, file_context, subfolder_context):
+        section_instructions = "\n\n".join(
+            f"{SECTION_MARKER.format(section_name)}\n{section_format}"
+            for section_name, section_format in section_formats.items()
+        )
+        return f"""{FOLDER_PROMPT_REQUIREMENTS}
+
+Context:
+Folder Path: {folder_path}
+
+Files Documentation:
+{file_context}
+{"Subfolders Documentation:" if subfolder_context else ""}
+{subfolder_context}
+
+Output Format:
+Write every section below, in order. Start each section with its marker line exactly as shown (for example {SECTION_MARKER.format(next(iter(section_formats)))}) and then follow that section's format.
+
+{section_instructions}
+
+{FOLDER_PROMPT_GUIDELINES}"""
 
     try:
         # Generate prompt messages for each section
@@ -218,29 +249,59 @@ Guidelines:
                 {"role": "user", "content": f"Generate the {section_name} section for {folder_path}, focusing on accuracy and clarity. Include only information that is explicitly present in the source documentation."}
             ]
 
-        # Generate documentation for each section using the Groq client
-        responses = {}
-        for section in section_formats.keys():
+        # Generate all sections concurrently; a failing section doesn't affect the others
+        def generate_section(section):
             try:
-                response = client.chat.completions.create(
-                    model=folder_level_model, 
+                return chat_completion(
+                    model=folder_level_model,
                     messages=prompts[section]
                 )
-                responses[section] = response
+            except JobCancelled:
+                raise
             except Exception as e:
                 print(f"Error generating documentation for section {section}: {str(e)}")
-                responses[section] = None
+                return None
+
+        section_keys = list(section_formats.keys())
+        responses = {}
+        if single_call:
+            combined_prompt = [
+                {"role": "system", "content": create_combined_prompt(
+                    folder_path=folder_path,
+                    section_formats=section_formats,
+                    file_context=format_child_context(file_documentation, token_budget=COMBINED_CONTEXT_TOKEN_BUDGET // context_shares),
+                    subfolder_context=format_child_context(subfolder_documentation, "Subfolder", token_budget=COMBINED_CONTEXT_TOKEN_BUDGET // context_shares) if subfolder_documentation else ""
+                )},
+                {"role": "user", "content": f"Generate all sections for {folder_path}, each starting with its marker line, focusing on accuracy and clarity. Include only information that is explicitly present in the source documentation."}
+            ]
+            try:
+                combined_response = chat_completion(model=folder_level_model, messages=combined_prompt)
+                responses = split_combined_sections(combined_response, section_keys)
+            except JobCancelled:
+                raise
+            except Exception as e:
+                print(f"Error generating combined documentation for {folder_path}: {str(e)}")
+            for section in responses:
+                prompts[section] = combined_prompt
+
+        missing_sections = [section for section in section_keys if section not in responses]
+        if single_call and missing_sections:
+            print(f"Falling back to per-section generation for {folder_path}: {missing_sections}")
+        responses.update(zip(missing_sections, fan_out(generate_section, missing_sections)))
 
         # Compile the responses into a single documentation string
         folder_documentation = {}
-        for section, response in responses.items():
+        for section in section_keys:
+            response = responses.get(section)
             if response is not None:
-                folder_documentation[section] = response.choices[0].message.content
+                folder_documentation[section] = response
             else:
-                folder_documentation[section] = f"Error generating documentation for {section}"
+                folder_documentation[section] = f"{SECTION_ERROR_PREFIX}{section}"
 
         return combine_folder_documentation(folder_documentation),prompts,folder_documentation
 
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"Error processing folder {folder_path}: {str(e)}")
         return f"Error generating documentation: {str(e)}"
\ No newline at end of file
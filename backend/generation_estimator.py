@@ -0,0 +1,229 @@
+import os
+from collections import Counter
+from code_chunker import chunk_code, CHUNK_TOKEN_BUDGET
+from context_builder import SECTION_CONTEXT_TOKEN_BUDGET, COMBINED_CONTEXT_TOKEN_BUDGET
+from file_level_documentation import CONSOLIDATION_TOKEN_BUDGET, get_prompts_from_db as get_file_prompts
+from hierarchy_manager import (
+    build_generation_plan, compute_content_hashes, generation_fingerprints, mark_dirty_nodes, load_stored_documentation,
+    CHILD_DOC_TOKEN_ESTIMATE
+)
+from generation_scheduler import iter_nodes
+from selection_index import make_selection
+from prompt_settings import get_prompt_snapshot
+from rate_limiter import get_budget
+from fair_queue import MAX_CONCURRENT_REQUESTS
+from token_counter import count_tokens
+
+# Rate limits assumed per model when the provider hasn't reported any yet
+ESTIMATE_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+ESTIMATE_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))
+# Typical latency of one completion, for the concurrency and critical-path bounds
+ESTIMATE_CALL_SECONDS = float(os.getenv("LLM_ESTIMATED_CALL_SECONDS", "4"))
+
+# Typical completion sizes of each kind of call
+FILE_DOC_OUTPUT_TOKENS = 1500
+CHUNK_DOC_OUTPUT_TOKENS = 800
+SECTION_OUTPUT_TOKENS = 600
+
+# Instructions wrapped around the code or child docs in every prompt, beyond the configured prompt text
+PROMPT_FRAME_TOKENS = 300
+
+
+class _ModelUsage:
+    def __init__(self):
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, input_tokens, output_tokens, requests=1):
+        self.requests += requests
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+
+
+def _reduce_rounds(doc_sizes, token_budget):
+    """
+    Replay reduce_chunk_docs on doc sizes alone.
+
+    Returns:
+        tuple: (calls, rounds, input_tokens, sizes) - reduce calls made, sequential
+        rounds, chunk doc tokens they read, and the sizes left for the final
+        consolidation
+    """
+    calls = 0
+    rounds = 0
+    input_tokens = 0
+    while len(doc_sizes) > 1 and sum(doc_sizes) > token_budget:
+        groups = []
+        current = []
+        for size in doc_sizes:
+            if len(current) >= 2 and sum(current) + size > token_budget:
+                groups.append(current)
+                current = []
+            current.append(size)
+        if current:
+            groups.append(current)
+        calls += len(groups)
+        rounds += 1
+        input_tokens += sum(doc_sizes)
+        doc_sizes = [CHUNK_DOC_OUTPUT_TOKENS] * len(groups)
+    return calls, rounds, input_tokens, doc_sizes
+
+
+def estimate_file(path, usage, file_prompts):
+    """
+    Add the calls needed to document one file to ``usage``.
+
+    Returns:
+        int: Sequential calls on the file's critical path
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as file:
+            code_content = file.read()
+    except OSError as e:
+        print(f"Could not read {path} for the estimate: {e}")
+        return 0
+
+    source_tokens = count_tokens(code_content)
+    if source_tokens <= CHUNK_TOKEN_BUDGET:
+        usage.add(source_tokens + file_prompts['file'] + PROMPT_FRAME_TOKENS, FILE_DOC_OUTPUT_TOKENS)
+        return 1
+
+    chunk_count = 0
+    for chunk in chunk_code(code_content, path):
+        chunk_count += 1
+        usage.add(count_tokens(chunk) + file_prompts['chunk'] + PROMPT_FRAME_TOKENS, CHUNK_DOC_OUTPUT_TOKENS)
+    reduce_calls, rounds, reduce_input, remaining = _reduce_rounds(
+        [CHUNK_DOC_OUTPUT_TOKENS] * chunk_count, CONSOLIDATION_TOKEN_BUDGET
+    )
+    # Every reduce call and the final consolidation read chunk docs and write one doc
+    usage.add(
+        reduce_input + reduce_calls * PROMPT_FRAME_TOKENS, reduce_calls * CHUNK_DOC_OUTPUT_TOKENS,
+        requests=reduce_calls
+    )
+    usage.add(sum(remaining) + PROMPT_FRAME_TOKENS, FILE_DOC_OUTPUT_TOKENS)
+    return rounds + 2
+
+
+def estimate_folder(node, usage, single_call_sections):
+    """
+    Add the section calls of one folder or project node to ``usage``.
+
+    Returns:
+        int: Sequential calls for the node
+    """
+    name = 'project_section_formats' if node.level == 'project' else 'folder_section_formats'
+    section_formats = get_prompt_snapshot().rendered(name)
+    child_tokens = len(node.children) * CHILD_DOC_TOKEN_ESTIMATE
+    format_tokens = {section: count_tokens(section_format) for section, section_format in section_formats.items()}
+
+    if single_call_sections:
+        usage.add(
+            min(child_tokens, COMBINED_CONTEXT_TOKEN_BUDGET) + sum(format_tokens.values()) + PROMPT_FRAME_TOKENS,
+            SECTION_OUTPUT_TOKENS * len(section_formats)
+        )
+        return 1
+
+    for tokens in format_tokens.values():
+        usage.add(min(child_tokens, SECTION_CONTEXT_TOKEN_BUDGET) + tokens + PROMPT_FRAME_TOKENS, SECTION_OUTPUT_TOKENS)
+    return 1 if section_formats else 0
+
+
+def model_minutes(model, usage):
+    """Minutes the model's rate limits need to serve ``usage``."""
+    tokens_per_minute = get_budget(model).limit_tokens or ESTIMATE_TOKENS_PER_MINUTE
+    return max(
+        usage.requests / ESTIMATE_REQUESTS_PER_MINUTE,
+        (usage.input_tokens + usage.output_tokens) / tokens_per_minute
+    )
+
+
+def estimate_generation(
+    user_id,
+    root_path,
+    selected_items,
+    file_model,
+    folder_model,
+    project_model,
+    force_regenerate=False,
+    single_call_sections=False,
+    selection=None
+):
+    """
+    Predict the LLM requests, tokens and wall-clock time of a generation request
+    without calling the model.
+
+    The selection is planned exactly like ``generate_documentation`` (including
+    reuse of unchanged stored documentation), every file is tokenized and chunked
+    locally, and folders and the project are charged one call per section (or one
+    combined call with ``single_call_sections``).
+
+    Returns:
+        dict: Totals, per-model usage and the predicted duration, or None if nothing
+        under root_path is selected
+    """
+    filtered = []
+    plan = build_generation_plan(root_path, make_selection(root_path, selected_items, selection), filtered)
+    if plan is None:
+        return None
+    compute_content_hashes(plan, generation_fingerprints(file_model, folder_model, project_model))
+    mark_dirty_nodes(plan, load_stored_documentation(user_id, root_path), force_regenerate)
+
+    file_settings = get_file_prompts()
+    file_prompts = {
+        'file': count_tokens(file_settings.get('file_prompt', '')),
+        'chunk': count_tokens(file_settings.get('file_chunk_prompt', ''))
+    }
+    models = {'file': file_model, 'folder': folder_model, 'project': project_model}
+    usage = {model: _ModelUsage() for model in models.values()}
+    counts = {'files': 0, 'folders': 0, 'reused': 0}
+
+    def visit(node):
+        # Sequential calls from the first file up to this node finishing
+        children_path = max((visit(child) for child in node.children), default=0)
+        if node.level != 'file' and not node.generate:
+            return children_path
+        if not node.dirty:
+            counts['reused'] += 1
+            return children_path
+        model_usage = usage[models[node.level]]
+        if node.level == 'file':
+            counts['files'] += 1
+            # Files documented locally from metadata make no request
+            own_path = 0 if node.classification is not None else estimate_file(node.path, model_usage, file_prompts)
+        else:
+            counts['folders'] += 1
+            own_path = estimate_folder(node, model_usage, single_call_sections)
+        return children_path + own_path
+
+    critical_path_calls = visit(plan)
+
+    requests = sum(model_usage.requests for model_usage in usage.values())
+    bounds = {
+        'rate_limits': max((model_minutes(model, model_usage) * 60 for model, model_usage in usage.items()), default=0),
+        'concurrency': requests * ESTIMATE_CALL_SECONDS / MAX_CONCURRENT_REQUESTS,
+        'critical_path': critical_path_calls * ESTIMATE_CALL_SECONDS
+    }
+    limiting_factor = max(bounds, key=bounds.get)
+
+    return {
+        "files": counts['files'],
+        "folders": counts['folders'],
+        "reused_nodes": counts['reused'],
+        "nodes_total": sum(1 for _ in iter_nodes(plan)),
+        "requests": requests,
+        "input_tokens": sum(model_usage.input_tokens for model_usage in usage.values()),
+        "output_tokens": sum(model_usage.output_tokens for model_usage in usage.values()),
+        "by_model": {
+            model: {
+                "requests": model_usage.requests,
+                "input_tokens": model_usage.input_tokens,
+                "output_tokens": model_usage.output_tokens
+            }
+            for model, model_usage in usage.items()
+        },
+        "filtered_files": Counter(file['reason'] for file in filtered),
+        "critical_path_calls": critical_path_calls,
+        "estimated_seconds": round(bounds[limiting_factor]),
+        "limiting_factor": limiting_factor
+    }
@@ -0,0 +1,130 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class DocNode:
+    """
+    A single unit of work in a documentation plan: a file, a folder or the project root.
+
+    A node becomes runnable once every one of its children has finished, so file
+    documentation always exists before the folder summary that consumes it.
+    """
+    def __init__(self, path, level, parent=None, generate=True):
+        """
+        Args:
+            path (str): Path of the file or folder
+            level (str): 'file', 'folder' or 'project'
+            parent (DocNode, optional): Node that depends on this one
+            generate (bool): Whether documentation should be generated for this node itself.
+                Folders that only contain selected items are walked but not summarised.
+        """
+        self.path = path
+        self.level = level
+        self.parent = parent
+        self.generate = generate
+        self.children = []
+        self.pending_children = 0
+        self.content_hash = None
+        self.dirty = True
+        self.stored_doc = None
+        # FileClassification of a file documented locally instead of by the model
+        self.classification = None
+        self.result = None
+        self.error = None
+
+    @property
+    def files(self):
+        return [child for child in self.children if child.level == 'file']
+
+    @property
+    def subfolders(self):
+        return [child for child in self.children if child.level != 'file']
+
+    def __repr__(self):
+        return f"DocNode({self.level}, {self.path!r})"
+
+
+def iter_nodes(root):
+    """Yield every node of the plan rooted at ``root`` (parents before children)."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.children)
+
+
+class DocumentationScheduler:
+    """
+    Runs a documentation plan bottom-up on a single bounded worker pool.
+
+    Leaves are submitted first; every other node is submitted the moment its last
+    child completes. Graph bookkeeping happens only on the scheduling thread, so
+    workers never share mutable state.
+    """
+    def __init__(self, run_node, max_workers=3, should_stop=None):
+        """
+        Args:
+            run_node (callable): Called with a DocNode, returns the node's documentation
+            max_workers (int): Size of the worker pool shared by the whole plan
+            should_stop (callable, optional): Checked before each node is submitted; once
+                it returns True no further nodes start and the run ends when the nodes
+                already in flight finish
+        """
+        self.run_node = run_node
+        self.max_workers = max_workers
+        self.should_stop = should_stop
+        self.stopped = False
+
+    def run(self, root):
+        """
+        Execute every node of the plan.
+
+        A failing node is logged and recorded on ``node.error``; its parent still runs
+        with whatever documentation the remaining children produced.
+
+        Args:
+            root (DocNode): Root of the plan
+
+        Returns:
+            DocNode: The same root, with ``result`` filled in on every node that ran
+        """
+        nodes = list(iter_nodes(root))
+        for node in nodes:
+            node.pending_children = len(node.children)
+
+        print(f"Scheduling {len(nodes)} documentation nodes on {self.max_workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+
+            def submit(node):
+                if not self.stopped and self.should_stop is not None and self.should_stop():
+                    print("Stopping documentation scheduler; no further nodes will start")
+                    self.stopped = True
+                if self.stopped:
+                    return
+                # Run each node in a copy of the caller's context so per-job settings follow it
+                context = contextvars.copy_context()
+                futures[executor.submit(context.run, self.run_node, node)] = node
+
+            for node in nodes:
+                if node.pending_children == 0:
+                    submit(node)
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = futures.pop(future)
+                    try:
+                        node.result = future.result()
+                    except Exception as exc:
+                        node.error = exc
+                        print(f"ERROR processing {node.level} {node.path}: {exc}")
+
+                    parent = node.parent
+                    if parent is not None:
+                        parent.pending_children -= 1
+                        if parent.pending_children == 0:
+                            submit(parent)
+
+        return root
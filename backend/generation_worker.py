@@ -0,0 +1,221 @@
+import os
+import time
+import uuid
+import socket
+import argparse
+import threading
+import traceback
+import multiprocessing
+from hierarchy_manager import generate_documentation
+from progress_tracker import ProgressTracker
+from job_events import emit_event, record_event
+from job_queue import (
+    JOB_LEASE_SECONDS, ensure_job_table, claim_job, heartbeat, update_job, complete_job, fail_job,
+    finish_cancelled_job, release_job
+)
+from job_control import JobControl, JobCancelled
+
+# Seconds an idle worker waits before polling the job table again
+POLL_INTERVAL = 1.0
+# Seconds between retries of a lease renewal that failed with a database error
+HEARTBEAT_RETRY_INTERVAL = 2.0
+# Seconds inline workers get to hand their jobs back when the API shuts down
+WORKER_SHUTDOWN_TIMEOUT = float(os.getenv("GENERATION_WORKER_SHUTDOWN_TIMEOUT", "30"))
+
+
+def make_worker_id(index=0):
+    return f"{socket.gethostname()}-{os.getpid()}-{index}-{uuid.uuid4().hex[:6]}"
+
+
+def _keep_lease(job_id, worker_id, done, job_control):
+    """
+    Renew the job lease until ``done`` is set. Renewals that fail with an error are
+    retried; once the lease is lost, or can't be renewed before it expires, the
+    local run is stopped through ``job_control`` since another worker may take the
+    job over.
+    """
+    renewed_at = time.monotonic()
+    interval = JOB_LEASE_SECONDS / 3
+    while not done.wait(interval):
+        try:
+            owned = heartbeat(job_id, worker_id)
+        except Exception as e:
+            print(f"Worker {worker_id} could not renew the lease on job {job_id}: {str(e)}")
+            remaining = JOB_LEASE_SECONDS - (time.monotonic() - renewed_at)
+            owned = remaining > 0
+            if owned:
+                # Retry in time to notice the lease running out
+                interval = min(HEARTBEAT_RETRY_INTERVAL, remaining)
+                continue
+        if not owned:
+            print(f"Worker {worker_id} lost the lease on job {job_id}; stopping it")
+            job_control.lose_lease()
+            return
+        renewed_at = time.monotonic()
+        interval = JOB_LEASE_SECONDS / 3
+
+
+def run_generation_job(job, job_control):
+    """
+    Run one claimed generation job to completion.
+
+    Args:
+        job (dict): Job row returned by claim_job
+        job_control (JobControl): Control stopping the run on cancellation or a lost lease
+    """
+    params = job['params']
+    update_job(job['id'], current_step="Analyzing project structure...")
+
+    def publish(status):
+        update_job(job['id'], progress=status['progress'], current_step=status['current_step'], details=status['details'])
+        emit_event(job['id'], 'progress', {
+            "progress": status['progress'],
+            "current_step": status['current_step'],
+            "details": status['details']
+        })
+
+    def on_event(event_type, payload):
+        emit_event(job['id'], event_type, payload)
+
+    progress_tracker = ProgressTracker(job['id'], on_update=publish, on_event=on_event)
+    print("Starting documentation generation")
+    # Passing the job id checkpoints every finished node, so a re-claimed or
+    # resumed job skips the nodes it already completed
+    generate_documentation(
+        **params,
+        job_id=job['id'],
+        progress_tracker=progress_tracker,
+        job_control=job_control
+    )
+    print(f"Finished documentation generation for job {job['id']}")
+
+
+def process_next_job(worker_id, stop_event=None):
+    """
+    Claim and run a single job. If ``stop_event`` is set while it runs, the job
+    stops at its next check and goes back on the queue.
+
+    Returns:
+        bool: False if the queue had nothing to run
+    """
+    job = claim_job(worker_id)
+    if job is None:
+        return False
+
+    print(f"Worker {worker_id} claimed job {job['id']} (attempt {job['attempts']})")
+    record_event(job['id'], 'job_started', {"worker_id": worker_id, "attempt": job['attempts']})
+    job_control = JobControl(job['id'], stop_event=stop_event)
+    done = threading.Event()
+    lease_thread = threading.Thread(target=_keep_lease, args=(job['id'], worker_id, done, job_control), daemon=True)
+    lease_thread.start()
+
+    def finish(event_type, payload, finish_job, *args):
+        # A worker without the lease leaves the final status to the job's new owner
+        if job_control.lease_lost:
+            print(f"Worker {worker_id} no longer holds job {job['id']}; not recording {event_type}")
+            return
+        # The event goes first so streams never see a finished job without it
+        record_event(job['id'], event_type, payload)
+        if not finish_job(job['id'], worker_id, *args):
+            print(f"Job {job['id']} was taken over by another worker; its status was left unchanged")
+
+    try:
+        run_generation_job(job, job_control)
+        finish('job_completed', {}, complete_job)
+    except JobCancelled:
+        if job_control.stopping and not job_control.lease_lost and release_job(job['id'], worker_id):
+            print(f"Worker {worker_id} stopped; job {job['id']} goes back on the queue")
+        else:
+            print(f"Job {job['id']} cancelled; keeping the documentation generated so far")
+            finish('job_cancelled', {}, finish_cancelled_job)
+    except Exception as e:
+        print(f"Error in generate_documentation: {str(e)}")
+        traceback.print_exc()
+        finish('job_failed', {"error": str(e)}, fail_job, e)
+    finally:
+        done.set()
+        lease_thread.join()
+    return True
+
+
+def worker_loop(worker_id, stop_event, poll_interval=POLL_INTERVAL):
+    """Claim and run jobs until ``stop_event`` is set."""
+    print(f"Generation worker {worker_id} started")
+    while not stop_event.is_set():
+        try:
+            if not process_next_job(worker_id, stop_event):
+                stop_event.wait(poll_interval)
+        except Exception as e:
+            # Keep the worker alive through transient database errors
+            print(f"Worker {worker_id} error: {str(e)}")
+            stop_event.wait(poll_interval)
+    print(f"Generation worker {worker_id} stopped")
+
+
+def start_inline_workers(count):
+    """
+    Run ``count`` worker threads inside the calling process (used by the API
+    process for single-command development setups).
+
+    Returns:
+        tuple: (stop_event, threads) to pass to stop_inline_workers
+    """
+    stop_event = threading.Event()
+    threads = []
+    for index in range(count):
+        thread = threading.Thread(
+            target=worker_loop,
+            args=(make_worker_id(index), stop_event),
+            name=f"generation-worker-{index}",
+            daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+    return stop_event, threads
+
+
+def stop_inline_workers(stop_event, threads, timeout=WORKER_SHUTDOWN_TIMEOUT):
+    """
+    Stop workers started by start_inline_workers and wait for them. Running jobs
+    stop after the LLM calls in flight and go back on the queue. A job whose worker
+    doesn't stop within ``timeout`` is picked up again once its lease expires.
+    """
+    stop_event.set()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+        if thread.is_alive():
+            print(f"{thread.name} did not stop within {timeout}s")
+
+
+def _process_main(index, stop_event):
+    worker_loop(make_worker_id(index), stop_event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run documentation generation workers")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("GENERATION_WORKER_PROCESSES", "2")),
+                        help="Number of worker processes to start")
+    args = parser.parse_args()
+
+    ensure_job_table()
+
+    stop_event = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=_process_main, args=(index, stop_event), name=f"generation-worker-{index}")
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("Stopping generation workers...")
+        stop_event.set()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
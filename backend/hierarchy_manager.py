@@ -1,256 +1,419 @@
 import os
-import time
+import json
 import sqlite3
-from file_level_documentation import generate_documentation_for_file
+import hashlib
+from contextlib import nullcontext
+from file_level_documentation import generate_documentation_for_file, get_prompts_from_db as get_file_prompts
+from sections_extractor import extract_sections_from_file, has_failed_sections
 from folder_level_documentation import generate_folder_level_documentation
 from project_level_documentation import generate_project_level_documentation
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from generation_scheduler import DocNode, DocumentationScheduler, iter_nodes
+from llm_cache import bypass_cache as cache_bypassed
+from doc_writer import get_documentation_writer, DocumentationWriteError
+from job_queue import load_checkpoints, find_latest_job_params
+from prompt_settings import get_prompt_snapshot
+from progress_tracker import ProgressTracker
+from job_control import JobCancelled, check_job_control
+from fair_queue import request_scope, INTERACTIVE_LANE
+from file_filter import classify_file, summarize_file_locally, DOCUMENT, SKIP
+from selection_index import SelectionIndex, SelectionSpec, make_selection
 
+# Rough size of one child's documentation inside each of its parent's section prompts
+CHILD_DOC_TOKEN_ESTIMATE = 500
 
 
-def store_documentation(user_id, path, doc, project_name, level, root_path):
+def update_node_documentation(documentation_id, doc, content_hash, section_rows):
+    """
+    Replace a stored doc in place (keeping its id, so feedback stays attached) and
+    upsert its sections by name.
+
+    Args:
+        documentation_id (int): Row to update
+        doc (str): New documentation
+        content_hash (str): Content hash the documentation was generated from
+        section_rows (list): (section_name, section_content, prompt_used) tuples
+    """
     conn = sqlite3.connect('app.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT OR REPLACE INTO documentation (user_id, path, doc, project_name, level, root_path)
-    VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, path, doc, project_name, level, root_path))
-    doc_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return doc_id
+    try:
+        conn.execute(
+            "UPDATE documentation SET doc = ?, content_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (doc, content_hash, documentation_id)
+        )
+        for name, content, prompt_used in section_rows:
+            cursor = conn.execute(
+                """
+                UPDATE documentation_sections
+                SET section_content = ?, prompt_used = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE documentation_id = ? AND section_name = ?
+                """,
+                (content, prompt_used, documentation_id, name)
+            )
+            if cursor.rowcount == 0:
+                conn.execute(
+                    """
+                    INSERT INTO documentation_sections (documentation_id, section_name, section_content, prompt_used)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (documentation_id, name, content, prompt_used)
+                )
+        conn.commit()
+    finally:
+        conn.close()
+
+def update_file_documentation(documentation_id, file_path, doc, file_model):
+    """
+    Replace a stored file doc in place and refresh the sections extracted from it.
+
+    Returns:
+        list: Names of the sections found in ``doc``
+    """
+    sections = {name: content for name, content in extract_sections_from_file(doc).items() if content}
+    prompt_used = get_file_prompts().get('file_prompt', '')
+    update_node_documentation(
+        documentation_id, doc, hash_file(file_path, level_fingerprint('file', file_model)),
+        [(name, content, prompt_used) for name, content in sections.items()]
+    )
+    return list(sections)
+
+
+def build_generation_plan(root_path, selected_items, filtered=None, root_level='project'):
+    """
+    Build the complete file -> folder -> project dependency graph up front.
+
+    Every selected file is classified first: binary files are left out of the plan
+    and heavy files (lockfiles, generated or minified code, oversized files) are
+    marked to be documented locally from their metadata.
+
+    Args:
+        root_path: Path to the project root
+        selected_items: Paths selected for documentation, or a SelectionIndex or
+            SelectionSpec
+        filtered: Optional list that receives {"path", "action", "reason", "size"}
+            for every file the model won't document
+        root_level: Level of the root node ('folder' to plan a single folder's subtree)
+
+    Returns:
+        DocNode: Root node of the plan, or None if nothing under root_path is selected
+    """
+    if isinstance(selected_items, (SelectionIndex, SelectionSpec)):
+        selection = selected_items
+    else:
+        selection = SelectionIndex(selected_items)
+    processed_folders = set()
+
+    def plan_folder(folder_path, parent, is_project_root):
+        if not selection.has_selected(folder_path):
+            print(f"Skipping folder {folder_path} - no selected items found")
+            return None
+
+        if folder_path in processed_folders:
+            print(f"Skipping already planned folder: {folder_path}")
+            return None
+        processed_folders.add(folder_path)
+
+        node = DocNode(
+            folder_path,
+            root_level if is_project_root else 'folder',
+            parent=parent,
+            generate=folder_path in selection
+        )
+
+        selected_files, selected_subfolders = selection.selected_children(folder_path)
+        for subfolder_path in selected_subfolders:
+            subfolder_node = plan_folder(subfolder_path, node, False)
+            if subfolder_node is not None:
+                node.children.append(subfolder_node)
+        for file_path in selected_files:
+            classification = classify_file(file_path)
+            if classification.action != DOCUMENT:
+                print(f"Not sending {file_path} to the model: {classification.reason}")
+                if filtered is not None:
+                    filtered.append({"path": file_path, **classification.to_dict()})
+                if classification.action == SKIP:
+                    continue
+            file_node = DocNode(file_path, 'file', parent=node)
+            if classification.action != DOCUMENT:
+                file_node.classification = classification
+            node.children.append(file_node)
+
+        return node
+
+    return plan_folder(root_path, None, True)
+
+
+def level_fingerprint(level, model):
+    """
+    Digest of the model and prompt text documentation of ``level`` is generated
+    with, so changing either invalidates the stored docs of that level.
+    """
+    if level == 'file':
+        prompts = get_file_prompts()
+    else:
+        prompts = get_prompt_snapshot().rendered(f"{level}_section_formats")
+    return hashlib.sha256(json.dumps([model, prompts], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def generation_fingerprints(file_model, folder_model, project_model):
+    """Fingerprint of every level for compute_content_hashes."""
+    return {
+        'file': level_fingerprint('file', file_model),
+        'folder': level_fingerprint('folder', folder_model),
+        'project': level_fingerprint('project', project_model)
+    }
+
+
+def hash_file(file_path, fingerprint):
+    """SHA-256 of a file's bytes and the fingerprint of its level."""
+    digest = hashlib.sha256(f"{fingerprint}\0".encode('utf-8'))
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compute_content_hashes(node, fingerprints):
+    """
+    Fill in ``content_hash`` for every node of the plan.
 
-def store_section_documentation(documentation_id, section_name, section_content, prompt_used):
-    """Store section-wise documentation in the database."""
+    Files hash their source bytes; folders and the project hash the sorted
+    (path, hash) pairs of their children, so any change below a folder - including
+    added or removed children - changes the folder's hash too. Every hash also
+    covers the level's fingerprint, so switching models or editing prompts
+    regenerates the affected levels.
+
+    Args:
+        node (DocNode): Root of the plan
+        fingerprints (dict): {level: fingerprint} from generation_fingerprints
+    """
+    if node.level == 'file':
+        try:
+            node.content_hash = hash_file(node.path, fingerprints['file'])
+        except OSError as e:
+            print(f"Could not hash {node.path}: {e}")
+            node.content_hash = None
+        return node.content_hash
+
+    digest = hashlib.sha256(f"{fingerprints[node.level]}\0".encode('utf-8'))
+    for child in sorted(node.children, key=lambda child: child.path):
+        digest.update(f"{child.path}\0{compute_content_hashes(child, fingerprints)}\n".encode('utf-8'))
+    node.content_hash = digest.hexdigest()
+    return node.content_hash
+
+
+def get_storage_path(node):
+    """Path under which a node's documentation is stored in the documentation table."""
+    return f"{node.path}_project" if node.level == 'project' else node.path
+
+
+def load_stored_documentation(user_id, root_path):
+    """
+    Fetch the latest stored documentation and content hash per path for a project.
+
+    Returns:
+        dict: {path: (doc, content_hash)}
+    """
     conn = sqlite3.connect('app.db')
     cursor = conn.cursor()
     cursor.execute('''
-    INSERT INTO documentation_sections (documentation_id, section_name, section_content, prompt_used)
-    VALUES (?, ?, ?, ?)
-    ''', (documentation_id, section_name, section_content, prompt_used))
-    conn.commit()
+    SELECT path, doc, content_hash FROM documentation
+    WHERE user_id = ? AND root_path = ?
+    ORDER BY id
+    ''', (user_id, root_path))
+    stored = {path: (doc, content_hash) for path, doc, content_hash in cursor.fetchall()}
     conn.close()
+    return stored
+
+
+def mark_dirty_nodes(node, stored, force=False, checkpoints=None):
+    """
+    Decide which nodes need regenerating by diffing content hashes with stored docs.
+
+    A file is dirty when its source hash changed or it has no stored doc. A folder
+    or the project is dirty when its own hash changed or any child is dirty, so only
+    the ancestors of changed files are regenerated. Clean nodes keep their stored
+    documentation in ``stored_doc``.
+
+    Nodes with a checkpoint from the job being resumed are clean whenever the
+    checkpoint's hash still matches and none of their children need regenerating,
+    even with ``force``, since they were already regenerated by this job.
+
+    Returns:
+        int: Number of dirty nodes that will generate documentation
+    """
+    checkpoints = checkpoints or {}
+    dirty_count = 0
+    children_dirty = False
+    for child in node.children:
+        dirty_count += mark_dirty_nodes(child, stored, force, checkpoints)
+        children_dirty = children_dirty or child.dirty
+
+    storage_path = get_storage_path(node)
+    if node.level != 'file' and not node.generate:
+        node.dirty = children_dirty
+        return dirty_count
+
+    checkpoint_doc, checkpoint_hash = checkpoints.get(storage_path, (None, None))
+    if (
+        checkpoint_doc is not None
+        and not children_dirty
+        and node.content_hash is not None
+        and checkpoint_hash == node.content_hash
+    ):
+        node.dirty = False
+        node.stored_doc = checkpoint_doc
+        return dirty_count
+
+    stored_doc, stored_hash = stored.get(storage_path, (None, None))
 
-def safe_api_call(api_function, *args, **kwargs):
-    retries = 3
-    while retries > 0:
+    node.dirty = (
+        force
+        or children_dirty
+        or stored_doc is None
+        or node.content_hash is None
+        or stored_hash != node.content_hash
+    )
+    if node.dirty:
+        dirty_count += 1
+    else:
+        node.stored_doc = stored_doc
+    return dirty_count
+
+
+def section_count(node):
+    """Number of sections generated for a folder or project node."""
+    name = 'project_section_formats' if node.level == 'project' else 'folder_section_formats'
+    return len(get_prompt_snapshot().rendered(name))
+
+
+def estimate_node_tokens(node):
+    """
+    Estimated prompt volume of a node, used to weight progress and the ETA: the
+    source size for files, and child documentation times sections for folders.
+    """
+    if node.level == 'file':
+        if node.classification is not None:
+            return 1
         try:
-            return api_function(*args, **kwargs)
-        except Exception as e:
-            if "rate_limit_exceeded" in str(e):
-                print("Rate limit exceeded, retrying in 60 seconds...")
-                time.sleep(60)
-                retries -= 1
-            else:
-                raise e
-    raise Exception("API call failed after multiple retries.")
-
-
-def is_selected_or_has_selected_children(path, selected_items):
-    """Check if the path or any of its children are in selected_items"""
-    if path in selected_items:
-        return True
-    return any(selected.startswith(path + os.sep) for selected in selected_items)
-
-
-def get_selected_items_in_folder(folder_path, selected_items):
-    """Get only the directly selected files and subfolders in this folder"""
-    files = []
-    subfolders = []
-    
-    for item in selected_items:
-        parent_dir = os.path.dirname(item)
-        if parent_dir == folder_path:  # Only direct children
-            if os.path.isfile(item):
-                files.append(item)
-            elif os.path.isdir(item):
-                subfolders.append(item)
-    
-    return files, subfolders
-
-
-def generate_hierarchical_documentation(
-    user_id,
-    root_path,
-    folder_path, 
-    project_name,
-    file_model, 
-    folder_model, 
-    project_model,
-    selected_items, 
-    is_project_root=False,
-    max_threads=5, 
-    processed_folders=None
-):
+            return max(1, os.path.getsize(node.path) // 4)
+        except OSError:
+            return 1
+    return max(1, len(node.children)) * CHILD_DOC_TOKEN_ESTIMATE * section_count(node)
+
+
+def set_progress_totals(plan, progress_tracker):
+    """Report the plan's totals, counting clean (reused) nodes as already processed."""
+    totals = {'files': 0, 'folders': 0, 'sections': 0, 'tokens': 0}
+    reused = {'files': 0, 'folders': 0, 'sections': 0, 'tokens': 0}
+    for node in iter_nodes(plan):
+        if node.level != 'file' and not node.generate:
+            continue
+        kind = 'files' if node.level == 'file' else 'folders'
+        sections = 0 if node.level == 'file' else section_count(node)
+        tokens = estimate_node_tokens(node)
+        for counts in ([totals] if node.dirty else [totals, reused]):
+            counts[kind] += 1
+            counts['sections'] += sections
+            counts['tokens'] += tokens
+
+    progress_tracker.set_total_items(
+        totals['files'], totals['folders'], totals['sections'], totals['tokens'],
+        reused['files'], reused['folders'], reused['sections'], reused['tokens']
+    )
+
+
+def process_file_node(node, user_id, root_path, project_name, file_model, job_id=None, pending_writes=None):
     """
-    Generate documentation only for selected items in a bottom-up approach.
-    Now includes project-level documentation generation for the root folder.
-    
-    Args:
-        folder_path: Path to the current folder
-        project_name: Name of the project (used for project-level documentation)
-        file_model: Model to use for file-level documentation
-        folder_model: Model to use for folder-level documentation
-        project_model: Model to use for project-level documentation
-        selected_items: List of paths selected for documentation
-        is_project_root: Boolean indicating if this is the project root folder
-        max_threads: Maximum number of concurrent threads
-        processed_folders: Set of already processed folders
-    """
-    print(f"\n{'='*50}")
-    print(f"Starting documentation generation for: {folder_path}")
-    print(f"Is project root: {is_project_root}")
-    print(f"Number of selected items: {len(selected_items)}")
-    print(f"Max threads: {max_threads}")
-    
-    if processed_folders is None:
-        processed_folders = set()
-        print("Initialized new processed_folders set")
-
-    # Check if folder should be processed
-    if not is_selected_or_has_selected_children(folder_path, selected_items):
-        print(f"Skipping folder {folder_path} - no selected items found")
-        return None
+    Generate and store documentation for a single file node. The writer's future
+    is appended to ``pending_writes`` so the caller can check it after flushing.
+    """
+    print(f"Processing file: {node.path}")
+    if node.classification is not None:
+        file_doc = summarize_file_locally(node.path, node.classification)
+    else:
+        file_doc = generate_documentation_for_file(node.path, file_model)
+    # Queued for the batched writer; nothing downstream needs the row id
+    write = get_documentation_writer().submit_documentation(
+        user_id, node.path, file_doc, project_name, 'file', root_path, node.content_hash, job_id=job_id
+    )
+    if pending_writes is not None:
+        pending_writes.append(write)
+    print(f"Successfully processed file: {node.path}")
+    return file_doc
+
 
-    if folder_path in processed_folders:
-        print(f"Skipping already processed folder: {folder_path}")
+def process_folder_node(node, user_id, root_path, project_name, folder_model, project_model, single_call_sections=False, job_id=None, pending_writes=None):
+    """
+    Generate and store folder-level (or project-level, for the root) documentation
+    from the already completed children of ``node``. The writer's future is
+    appended to ``pending_writes``.
+    """
+    if not node.generate:
         return None
 
-    processed_folders.add(folder_path)
-    print(f"Added {folder_path} to processed folders. Total processed: {len(processed_folders)}")
+    file_docs = {child.path: child.result for child in node.files if child.result is not None}
+    subfolder_docs = {child.path: child.result for child in node.subfolders if child.result}
+
+    print(f"\nGenerating documentation for {node.level}: {node.path}")
+    print(f"- Files: {len(file_docs)}")
+    print(f"- Subfolders with summaries: {len(subfolder_docs)}")
+
+    if node.level == 'project':
+        summary, prompts, sections = generate_project_level_documentation(
+            node.path,
+            project_name,
+            file_docs,
+            subfolder_docs,
+            project_model,
+            single_call=single_call_sections
+        )
+    else:
+        summary, prompts, sections = generate_folder_level_documentation(
+            node.path,
+            file_docs,
+            subfolder_docs,
+            folder_model,
+            single_call=single_call_sections
+        )
+
+    # The sections are written with their parent row in one transaction
+    section_rows = [
+        (section_name, section_content, prompts[section_name][0]["content"])  # Get the system prompt
+        for section_name, section_content in sections.items()
+    ]
+    # Without a hash the error placeholders are regenerated on the next run instead of reused
+    content_hash = None if has_failed_sections(sections) else node.content_hash
+    write = get_documentation_writer().submit_documentation(
+        user_id, get_storage_path(node), summary, project_name, node.level, root_path, content_hash,
+        sections=section_rows, job_id=job_id
+    )
+    if pending_writes is not None:
+        pending_writes.append(write)
+    print(f"Queued {len(section_rows)} sections for storage ({node.level.upper()} LEVEL)")
+
+    print(f"Successfully generated {node.level}-level documentation for {node.path}")
+    return summary
+
 
-    folder_documentation = {
+def collect_documentation(node):
+    """Convert a completed plan back into the nested documentation dictionary."""
+    documentation = {
         'files': {},
         'subfolders': {},
         'folder_summary': None,
         'project_summary': None
     }
-
-    # Get selected items
-    selected_files, selected_subfolders = get_selected_items_in_folder(folder_path, selected_items)
-    print(f"\nFound in {folder_path}:")
-    print(f"- Selected files: {len(selected_files)}")
-    print(f"- Selected subfolders: {len(selected_subfolders)}")
-
-    # Process subfolders
-    print("\nProcessing subfolders...")
-    with ThreadPoolExecutor(max_workers=max_threads) as executor:
-        subfolder_futures = {}
-        
-        for subfolder_path in selected_subfolders:
-            print(f"Submitting subfolder for processing: {subfolder_path}")
-            future = executor.submit(
-                safe_api_call,
-                generate_hierarchical_documentation,
-                user_id,
-                root_path,
-                subfolder_path,
-                project_name,
-                file_model,
-                folder_model,
-                project_model,
-                selected_items,
-                False,
-                max_threads,
-                processed_folders
-            )
-            subfolder_futures[future] = subfolder_path
-
-        for future in as_completed(subfolder_futures):
-            subfolder_path = subfolder_futures[future]
-            try:
-                subfolder_result = future.result()
-                if subfolder_result:
-                    print(f"Successfully processed subfolder: {subfolder_path}")
-                    folder_documentation['subfolders'][subfolder_path] = subfolder_result
-                else:
-                    print(f"No documentation generated for subfolder: {subfolder_path}")
-            except Exception as exc:
-                print(f"ERROR processing subfolder {subfolder_path}: {exc}")
-
-    # Process files
-    print("\nProcessing files...")
-    with ThreadPoolExecutor(max_workers=max_threads) as executor:
-        file_futures = {}
-        
-        for file_path in selected_files:
-            print(f"Submitting file for processing: {file_path}")
-            future = executor.submit(
-                safe_api_call,
-                generate_documentation_for_file,
-                file_path,
-                file_model
-            )
-            file_futures[future] = file_path
-
-        for future in as_completed(file_futures):
-            file_path = file_futures[future]
-            try:
-                file_doc = future.result()
-                print(f"Successfully processed file: {file_path}")
-                folder_documentation['files'][file_path] = file_doc
-                store_documentation(user_id, file_path, file_doc, project_name, 'file', root_path)
-            except Exception as exc:
-                print(f"ERROR processing file {file_path}: {exc}")
-
-    if folder_path in selected_items:
-        print(f"\nGenerating documentation for folder: {folder_path}")
-        
-        file_docs = folder_documentation['files']
-        subfolder_docs = {
-            path: data['folder_summary'] 
-            for path, data in folder_documentation['subfolders'].items()
-            if data and data.get('folder_summary')
-        }
-        
-        print(f"Collected documentation:")
-        print(f"- Files: {len(file_docs)}")
-        print(f"- Subfolders with summaries: {len(subfolder_docs)}")
-        
-        if is_project_root:
-            print("\nGenerating project-level documentation...")
-            try:
-                project_summary,proj_prompts,proj_sections = safe_api_call(
-                    generate_project_level_documentation,
-                    folder_path,
-                    project_name,
-                    file_docs,
-                    subfolder_docs,
-                    project_model
-                )
-                folder_documentation['project_summary'] = project_summary
-                doc_id = store_documentation(user_id, f"{folder_path}_project", project_summary, project_name, 'project',root_path)
-                for section_name, section_content in proj_sections.items():
-                    prompt_text = proj_prompts[section_name][0]["content"]  # Get the system prompt
-                    store_section_documentation(doc_id, section_name, section_content, prompt_text)
-                    print(f"Section: {section_name} stored successfully! PROJECT LEVEL")
-                print(f"Successfully generated project-level documentation for {project_name}")
-                
-            except Exception as exc:
-                print(f"ERROR generating project-level documentation: {exc}")
+    for child in node.children:
+        if child.level == 'file':
+            if child.result is not None:
+                documentation['files'][child.path] = child.result
         else:
-            print("\nGenerating folder-level documentation...")
-            try:
-                folder_summary,prompts,sections = safe_api_call(
-                    generate_folder_level_documentation,
-                    folder_path,
-                    file_docs,
-                    subfolder_docs,
-                    folder_model
-                )
-                folder_documentation['folder_summary'] = folder_summary
-                doc_id = store_documentation(user_id, folder_path, folder_summary, project_name, 'folder',root_path)
-                for section_name, section_content in sections.items():
-                    prompt_text = prompts[section_name][0]["content"]  # Get the system prompt
-                    store_section_documentation(doc_id, section_name, section_content, prompt_text)
-                    print(f"Section: {section_name} stored successfully! FOLDER LEVEL")
-                print(f"Successfully generated folder-level documentation for {folder_path}")
-            except Exception as exc:
-                print(f"ERROR generating folder-level documentation: {exc}")
+            documentation['subfolders'][child.path] = collect_documentation(child)
 
-    print(f"\nCompleted processing {'project root' if is_project_root else 'folder'}: {folder_path}")
-    print(f"{'='*50}\n")
-    return folder_documentation
+    if node.level == 'project':
+        documentation['project_summary'] = node.result
+    else:
+        documentation['folder_summary'] = node.result
+    return documentation
 
 
 def generate_documentation(
@@ -261,38 +424,278 @@ def generate_documentation(
     file_model,
     folder_model,
     project_model,
-    max_threads=3
+    max_threads=3,
+    bypass_cache=False,
+    force_regenerate=False,
+    single_call_sections=False,
+    job_id=None,
+    progress_tracker=None,
+    job_control=None,
+    selection=None
 ):
     """
     Main entry point for documentation generation.
-    
+
+    The whole selection is planned first, then a single scheduler runs every file,
+    folder and project node on one bounded pool, starting each folder as soon as its
+    last child finishes. Files whose source is unchanged since their stored
+    documentation was generated are reused, along with any folder that has no
+    changed descendants.
+
     Args:
         root_path: Path to the project root
         project_name: Name of the project
-        selected_items: List of paths selected for documentation
+        selected_items: List of paths selected for documentation (None when ``selection`` is given)
         file_model: Model to use for file-level documentation
         folder_model: Model to use for folder-level documentation
         project_model: Model to use for project-level documentation
         max_threads: Maximum number of concurrent threads
+        bypass_cache: Ignore cached LLM responses and call the provider for every prompt
+        force_regenerate: Regenerate every node even if its content hash is unchanged
+        single_call_sections: Request all folder/project sections in one response per node
+        job_id: Generation job to checkpoint completed nodes against; nodes the job
+            already checkpointed are skipped, so a rerun resumes where it stopped
+        progress_tracker: ProgressTracker receiving node counts, in-flight LLM calls,
+            throughput and ETA as the plan runs
+        job_control: JobControl of the job; pausing it holds new nodes and LLM calls,
+            cancelling it stops scheduling and raises JobCancelled once in-flight
+            nodes finish (their documentation is kept)
+        selection: Compact {"include", "exclude"} selection spec, expanded against
+            the project tree instead of ``selected_items``
     """
     try:
-        # Generate documentation with project root handling
         print(f"In hierarchy manager\n----------------------\nFile model: {file_model}\nFolder Model: {folder_model}\nProject Model: {project_model}")
-        documentation = generate_hierarchical_documentation(
-            user_id,
-            root_path,
-            root_path,
-            project_name,
-            file_model,
-            folder_model,
-            project_model,
-            selected_items,
-            is_project_root=True,
-            max_threads=max_threads
+        filtered = []
+        plan = build_generation_plan(root_path, make_selection(root_path, selected_items, selection), filtered)
+        if plan is None:
+            return None
+
+        compute_content_hashes(plan, generation_fingerprints(file_model, folder_model, project_model))
+        checkpoints = load_checkpoints(job_id) if job_id else {}
+        dirty_count = mark_dirty_nodes(
+            plan, load_stored_documentation(user_id, root_path), force_regenerate, checkpoints
         )
+        if checkpoints:
+            print(f"Resuming job {job_id} from {len(checkpoints)} checkpoint(s)")
+        print(f"Incremental plan: {dirty_count} node(s) need regeneration")
 
-        return documentation
+        progress_tracker = progress_tracker or ProgressTracker(job_id or root_path)
+        set_progress_totals(plan, progress_tracker)
+        if filtered:
+            progress_tracker.set_filtered_files(filtered)
+        # Futures of every row this run queued, checked once the writer is flushed
+        pending_writes = []
+
+        def run_node(node):
+            if not node.dirty:
+                return node.stored_doc
+            check_job_control()
+            if node.level == 'file':
+                progress_tracker.start_node(node.path, node.level)
+                try:
+                    return process_file_node(node, user_id, root_path, project_name, file_model, job_id, pending_writes)
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    progress_tracker.emit("node_failed", path=node.path, level=node.level, error=str(e))
+                    raise
+                finally:
+                    # Failed nodes count as finished too, so progress still reaches the end
+                    progress_tracker.increment_processed_files(node.path, estimate_node_tokens(node))
+            if not node.generate:
+                return None
+            progress_tracker.start_node(node.path, node.level)
+            try:
+                return process_folder_node(
+                    node, user_id, root_path, project_name, folder_model, project_model, single_call_sections, job_id,
+                    pending_writes
+                )
+            except JobCancelled:
+                raise
+            except Exception as e:
+                progress_tracker.emit("node_failed", path=node.path, level=node.level, error=str(e))
+                raise
+            finally:
+                progress_tracker.increment_processed_folders(section_count(node), estimate_node_tokens(node))
+
+        scheduler = DocumentationScheduler(
+            run_node,
+            max_workers=max_threads,
+            should_stop=job_control.cancelled if job_control else None
+        )
+        try:
+            # LLM requests are queued fairly per user and job against every other running job
+            with cache_bypassed(bypass_cache), progress_tracker.activate(), \
+                    request_scope(user_id, job_id or root_path), \
+                    (job_control.activate() if job_control else nullcontext()):
+                scheduler.run(plan)
+        finally:
+            # Make sure every queued row is committed before the job is reported done
+            get_documentation_writer().flush()
+        if job_control is not None and job_control.cancelled():
+            raise JobCancelled(f"Job {job_id} was cancelled")
+        failed_writes = [write.exception() for write in pending_writes if write.exception() is not None]
+        if failed_writes:
+            # A job missing rows must not be reported completed; resuming it rewrites them
+            raise DocumentationWriteError(
+                f"{len(failed_writes)} documentation row(s) could not be stored: {failed_writes[0]}"
+            )
+        return collect_documentation(plan)
 
     except Exception as e:
         print(f"Error generating documentation: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+
+def load_stored_nodes(user_id, root_path):
+    """
+    Fetch the latest stored documentation row per path for a project.
+
+    Returns:
+        dict: {path: {"id", "path", "doc", "level", "project_name", "content_hash"}}
+    """
+    conn = sqlite3.connect('app.db')
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT id, path, doc, level, project_name, content_hash FROM documentation
+    WHERE user_id = ? AND root_path = ?
+    ORDER BY id
+    ''', (user_id, root_path))
+    columns = ('id', 'path', 'doc', 'level', 'project_name', 'content_hash')
+    stored = {row[1]: dict(zip(columns, row)) for row in cursor.fetchall()}
+    conn.close()
+    return stored
+
+
+def get_regeneration_chain(user_id, root_path, path, cascade=False):
+    """
+    Stored nodes to regenerate for ``path``, bottom-up: the node itself and, with
+    ``cascade``, every documented ancestor up to the project. Ancestors that were
+    never documented (folders that were only walked) are skipped.
+
+    Returns:
+        tuple: (chain, stored) where chain lists stored rows and stored is the
+        project's rows by path
+    """
+    stored = load_stored_nodes(user_id, root_path)
+    node = stored.get(path)
+    if node is None:
+        return [], stored
+    chain = [node]
+    if cascade and node['level'] != 'project':
+        folder = os.path.dirname(path)
+        while folder.startswith(root_path):
+            if folder == root_path:
+                project = stored.get(f"{root_path}_project")
+                if project is not None:
+                    chain.append(project)
+                break
+            if folder in stored and stored[folder]['level'] == 'folder':
+                chain.append(stored[folder])
+            folder = os.path.dirname(folder)
+    return chain, stored
+
+
+def load_regeneration_selection(user_id, root_path, stored):
+    """
+    Selection a folder is re-planned with on regeneration: the one of the latest
+    generation job for the project, or every documented path if no job is known.
+    """
+    params = find_latest_job_params(user_id, root_path)
+    if params is not None:
+        return make_selection(root_path, params.get('selected_items'), params.get('selection'))
+    return _documented_selection(stored)
+
+
+def _documented_selection(stored):
+    return SelectionIndex(path for path, row in stored.items() if row['level'] in ('file', 'folder'))
+
+
+def regenerate_stored_node(node, stored, root_path, file_model, folder_model, project_model, single_call_sections=False, selection=None):
+    """
+    Regenerate one stored file, folder or project doc from its source (files) or
+    the stored docs of its direct children (folders and the project), and update
+    it in place. ``stored`` is updated so a following ancestor sees the new doc.
+
+    Folders are re-planned with the selection of the project's latest generation
+    job (or, without one, every documented path below them), so deselected and
+    deleted children are left out and the content hash matches the one that job's
+    next incremental run computes.
+    """
+    if node['level'] == 'file':
+        doc = generate_documentation_for_file(node['path'], file_model)
+        update_file_documentation(node['id'], node['path'], doc, file_model)
+        node.update(doc=doc, content_hash=hash_file(node['path'], level_fingerprint('file', file_model)))
+        return node
+
+    folder_path = root_path if node['level'] == 'project' else node['path']
+    plan = build_generation_plan(folder_path, selection or _documented_selection(stored), root_level=node['level'])
+    if plan is None:
+        raise ValueError(f"Nothing documented under {folder_path} exists any more")
+    compute_content_hashes(plan, generation_fingerprints(file_model, folder_model, project_model))
+    # Walked-only subfolders have no doc of their own, as in a full run
+    file_docs = {child.path: stored[child.path]['doc'] for child in plan.files if child.path in stored}
+    subfolder_docs = {child.path: stored[child.path]['doc'] for child in plan.subfolders if child.path in stored}
+
+    if node['level'] == 'project':
+        summary, prompts, sections = generate_project_level_documentation(
+            folder_path, node['project_name'], file_docs, subfolder_docs, project_model,
+            single_call=single_call_sections
+        )
+    else:
+        summary, prompts, sections = generate_folder_level_documentation(
+            folder_path, file_docs, subfolder_docs, folder_model, single_call=single_call_sections
+        )
+    section_rows = [
+        (section_name, section_content, prompts[section_name][0]["content"])
+        for section_name, section_content in sections.items()
+    ]
+    content_hash = None if has_failed_sections(sections) else plan.content_hash
+    update_node_documentation(node['id'], summary, content_hash, section_rows)
+    node.update(doc=summary, content_hash=content_hash)
+    return node
+
+
+def regenerate_node(
+    user_id,
+    root_path,
+    path,
+    file_model,
+    folder_model,
+    project_model,
+    cascade=False,
+    bypass_cache=False,
+    single_call_sections=False
+):
+    """
+    Regenerate the documentation of one file or folder on demand, outside any
+    generation job.
+
+    Its LLM requests go through the interactive lane of the request gate, ahead of
+    batch nodes queued by bulk jobs that are running at the same time.
+
+    Args:
+        user_id: Owner of the documentation
+        root_path: Path to the project root
+        path: Stored path of the node (``<root>_project`` for the project)
+        cascade: Also regenerate every documented ancestor, bottom-up
+
+    Returns:
+        list: {"documentation_id", "path", "level"} for every regenerated node, or
+        None if ``path`` has no stored documentation
+    """
+    chain, stored = get_regeneration_chain(user_id, root_path, path, cascade)
+    if not chain:
+        return None
+
+    selection = load_regeneration_selection(user_id, root_path, stored)
+    regenerated = []
+    with cache_bypassed(bypass_cache), request_scope(user_id, f"regenerate:{path}", lane=INTERACTIVE_LANE):
+        for node in chain:
+            print(f"Regenerating {node['level']} documentation for {node['path']}")
+            regenerate_stored_node(
+                node, stored, root_path, file_model, folder_model, project_model, single_call_sections, selection
+            )
+            regenerated.append({"documentation_id": node['id'], "path": node['path'], "level": node['level']})
+    return regenerated
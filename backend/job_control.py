@@ -0,0 +1,95 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from job_queue import get_job_status
+
+# Seconds between job status reads; every check in between uses the cached status
+CONTROL_POLL_INTERVAL = 1.0
+
+# Control of the generation job running in the current context (set by JobControl.activate)
+_current_control = contextvars.ContextVar("job_control", default=None)
+
+
+class JobCancelled(Exception):
+    """Raised inside a generation job once it has been cancelled."""
+
+
+class JobControl:
+    """
+    Cancellation and pause state of one generation job, read from the job table so
+    it works for workers in any process. Checks are cheap: the status is re-read at
+    most once per ``poll_interval`` no matter how many threads check it.
+    """
+    def __init__(self, job_id, poll_interval=CONTROL_POLL_INTERVAL, stop_event=None):
+        self.job_id = job_id
+        self.poll_interval = poll_interval
+        # Set when the worker running the job shuts down
+        self._stop_event = stop_event
+        self._status = None
+        self._read_at = 0.0
+        self._lock = threading.Lock()
+        self._lease_lost = threading.Event()
+
+    def status(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._status is None or now - self._read_at >= self.poll_interval:
+                self._status = get_job_status(self.job_id)
+                self._read_at = now
+            return self._status
+
+    def lose_lease(self):
+        """Stop the job in this process: its worker no longer holds the lease."""
+        self._lease_lost.set()
+
+    @property
+    def lease_lost(self):
+        return self._lease_lost.is_set()
+
+    @property
+    def stopping(self):
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    def cancelled(self):
+        if self.lease_lost or self.stopping:
+            return True
+        # A deleted job counts as cancelled
+        return self.status() in ('cancelling', 'cancelled', None)
+
+    def check(self):
+        """
+        Block while the job is paused.
+
+        Raises:
+            JobCancelled: If the job has been cancelled
+        """
+        while True:
+            if self.cancelled():
+                raise JobCancelled(f"Job {self.job_id} was cancelled")
+            if self.status() != 'paused':
+                return
+            time.sleep(self.poll_interval)
+
+    @contextmanager
+    def activate(self):
+        """Make this the control checked by LLM calls in the current context."""
+        token = _current_control.set(self)
+        try:
+            yield self
+        finally:
+            _current_control.reset(token)
+
+
+def check_job_control():
+    """Pause or cancel the current job's work at a safe point, if a job is running."""
+    control = _current_control.get()
+    if control is not None:
+        control.check()
+
+
+def raise_if_job_cancelled():
+    """Like check_job_control, but never blocks on a paused job (for use mid-request)."""
+    control = _current_control.get()
+    if control is not None and control.cancelled():
+        raise JobCancelled(f"Job {control.job_id} was cancelled")
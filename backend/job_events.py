@@ -0,0 +1,72 @@
+import json
+import time
+import sqlite3
+from doc_writer import get_documentation_writer
+
+APP_DB_PATH = 'app.db'
+
+# Events after which a job produces no further events
+TERMINAL_EVENTS = ('job_completed', 'job_failed', 'job_cancelled')
+
+
+def init_event_table(conn):
+    """Create the generation event table on an open app.db connection."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generation_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            payload TEXT,
+            created_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_generation_events_job ON generation_events (job_id, id)")
+
+
+def emit_event(job_id, event_type, payload=None):
+    """
+    Queue an event on the batched documentation writer. Events are committed in
+    order with the documentation rows they describe.
+    """
+    get_documentation_writer().submit_event(job_id, event_type, payload or {})
+
+
+def record_event(job_id, event_type, payload=None):
+    """Write an event immediately, for job lifecycle events that must not wait for a batch."""
+    with sqlite3.connect(APP_DB_PATH, timeout=30) as conn:
+        conn.execute(
+            "INSERT INTO generation_events (job_id, event_type, payload, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, event_type, json.dumps(payload or {}), time.time())
+        )
+
+
+def load_events(job_id, after_id=0, limit=500):
+    """
+    Returns:
+        list: Events of the job with id greater than ``after_id``, oldest first, as
+        {"id", "event", "data"} dicts
+    """
+    conn = sqlite3.connect(APP_DB_PATH, timeout=30)
+    try:
+        rows = conn.execute(
+            """
+            SELECT id, event_type, payload FROM generation_events
+            WHERE job_id = ? AND id > ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (job_id, after_id, limit)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{"id": row[0], "event": row[1], "data": json.loads(row[2]) if row[2] else {}} for row in rows]
+
+
+def format_sse(event_type, data, event_id=None):
+    """Encode one server-sent event."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,482 @@
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from job_events import init_event_table
+
+APP_DB_PATH = 'app.db'
+# A claimed job must be heartbeated within this many seconds or another worker may take it over
+JOB_LEASE_SECONDS = 60
+# Jobs whose lease expired this many times are failed instead of re-claimed
+MAX_JOB_ATTEMPTS = 3
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+# Statuses of a job a worker currently holds
+ACTIVE_STATUSES = ('in_progress', 'paused', 'cancelling')
+
+
+def init_job_table(conn):
+    """Create the generation job table on an open app.db connection."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            project_name TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            current_step TEXT,
+            details TEXT,
+            error TEXT,
+            worker_id TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_expires_at REAL,
+            heartbeat_at REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TEXT,
+            completed_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs (status, created_at)")
+    # One row per node a job has finished and committed, keyed by its storage path
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generation_checkpoints (
+            job_id TEXT NOT NULL,
+            path TEXT NOT NULL,
+            level TEXT NOT NULL,
+            content_hash TEXT,
+            documentation_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (job_id, path)
+        )
+    """)
+
+
+def ensure_job_table():
+    """Create the job and event tables if needed (for workers started without the API)."""
+    with sqlite3.connect(APP_DB_PATH) as conn:
+        init_job_table(conn)
+        init_event_table(conn)
+
+
+@contextmanager
+def get_job_db():
+    # Autocommit mode so claims can take the write lock explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(APP_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['details'] = json.loads(job['details']) if job['details'] else {}
+    return job
+
+
+def enqueue_job(job_id, user_id, project_name, params):
+    """
+    Add a generation job to the queue.
+
+    Args:
+        job_id (str): Job id (the progress key handed to the client)
+        user_id (str): Owner of the job
+        project_name (str): Project being documented
+        params (dict): Arguments for generate_documentation
+    """
+    with get_job_db() as conn:
+        conn.execute(
+            """
+            INSERT INTO generation_jobs (id, user_id, project_name, params, status, current_step)
+            VALUES (?, ?, ?, ?, 'queued', 'Waiting for a worker...')
+            """,
+            (job_id, user_id, project_name, json.dumps(params))
+        )
+
+
+def claim_job(worker_id, lease_seconds=JOB_LEASE_SECONDS):
+    """
+    Atomically claim the oldest queued job, or one whose lease has expired.
+
+    Args:
+        worker_id (str): Id of the claiming worker
+        lease_seconds (int): Lease length; renew it with heartbeat()
+
+    Returns:
+        dict: The claimed job, or None if nothing is runnable
+    """
+    now = time.time()
+    with get_job_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A dead worker can't finish a cancellation or keep a paused job; settle those first
+            conn.execute(
+                """
+                UPDATE generation_jobs
+                SET status = 'cancelled', current_step = 'Generation cancelled', completed_at = ?
+                WHERE status = 'cancelling' AND lease_expires_at < ?
+                """,
+                (datetime.now().isoformat(), now)
+            )
+            conn.execute(
+                """
+                UPDATE generation_jobs SET worker_id = NULL, lease_expires_at = NULL
+                WHERE status = 'paused' AND lease_expires_at < ?
+                """,
+                (now,)
+            )
+            # Jobs abandoned by dead workers too many times are failed rather than retried forever
+            conn.execute(
+                """
+                UPDATE generation_jobs
+                SET status = 'failed', error = 'Worker lease expired too many times',
+                    current_step = 'Generation failed', completed_at = ?
+                WHERE status = 'in_progress' AND lease_expires_at < ? AND attempts >= ?
+                """,
+                (datetime.now().isoformat(), now, MAX_JOB_ATTEMPTS)
+            )
+            row = conn.execute(
+                """
+                SELECT id FROM generation_jobs
+                WHERE status = 'queued' OR (status = 'in_progress' AND lease_expires_at < ?)
+                ORDER BY created_at
+                LIMIT 1
+                """,
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                """
+                UPDATE generation_jobs
+                SET status = 'in_progress', worker_id = ?, attempts = attempts + 1,
+                    lease_expires_at = ?, heartbeat_at = ?,
+                    started_at = COALESCE(started_at, ?), current_step = 'Starting...'
+                WHERE id = ?
+                """,
+                (worker_id, now + lease_seconds, now, datetime.now().isoformat(), row['id'])
+            )
+            job = conn.execute("SELECT * FROM generation_jobs WHERE id = ?", (row['id'],)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return _row_to_job(job)
+
+
+def heartbeat(job_id, worker_id, lease_seconds=JOB_LEASE_SECONDS):
+    """
+    Extend a claimed job's lease.
+
+    Returns:
+        bool: False if the job is no longer owned by ``worker_id``
+    """
+    now = time.time()
+    with get_job_db() as conn:
+        cursor = conn.execute(
+            """
+            UPDATE generation_jobs SET lease_expires_at = ?, heartbeat_at = ?
+            WHERE id = ? AND worker_id = ? AND status IN (?, ?, ?)
+            """,
+            (now + lease_seconds, now, job_id, worker_id, *ACTIVE_STATUSES)
+        )
+        return cursor.rowcount == 1
+
+
+def update_job(job_id, **fields):
+    """Update status columns of a job (details is stored as JSON)."""
+    if not fields:
+        return
+    if 'details' in fields:
+        fields['details'] = json.dumps(fields['details'])
+    assignments = ', '.join(f"{column} = ?" for column in fields)
+    with get_job_db() as conn:
+        conn.execute(
+            f"UPDATE generation_jobs SET {assignments} WHERE id = ?",
+            (*fields.values(), job_id)
+        )
+
+
+def _finish_job(job_id, worker_id, **fields):
+    """
+    Record a job's final status, but only while ``worker_id`` still holds it.
+
+    Returns:
+        bool: False if the lease was lost (another worker may have taken the job over)
+    """
+    assignments = ', '.join(f"{column} = ?" for column in fields)
+    with get_job_db() as conn:
+        cursor = conn.execute(
+            f"""
+            UPDATE generation_jobs SET {assignments}
+            WHERE id = ? AND worker_id = ? AND status IN (?, ?, ?)
+            """,
+            (*fields.values(), job_id, worker_id, *ACTIVE_STATUSES)
+        )
+        return cursor.rowcount == 1
+
+
+def finish_cancelled_job(job_id, worker_id):
+    return _finish_job(
+        job_id,
+        worker_id,
+        status='cancelled',
+        current_step='Generation cancelled',
+        completed_at=datetime.now().isoformat(),
+        lease_expires_at=None
+    )
+
+
+def complete_job(job_id, worker_id):
+    return _finish_job(
+        job_id,
+        worker_id,
+        status='completed',
+        progress=100,
+        current_step='Documentation generated successfully!',
+        completed_at=datetime.now().isoformat(),
+        lease_expires_at=None
+    )
+
+
+def fail_job(job_id, worker_id, error):
+    return _finish_job(
+        job_id,
+        worker_id,
+        status='failed',
+        error=str(error),
+        current_step='Generation failed',
+        completed_at=datetime.now().isoformat(),
+        lease_expires_at=None
+    )
+
+
+def cancel_job(job_id):
+    """
+    Cancel a job. Jobs no worker holds are cancelled at once; running ones are
+    marked 'cancelling' and their worker stops scheduling nodes and marks them
+    'cancelled' when in-flight work has drained.
+
+    Returns:
+        str: The job's new status, or None if it was already finished or missing
+    """
+    with get_job_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT status, worker_id FROM generation_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row['status'] in FINISHED_STATUSES:
+            conn.execute("COMMIT")
+            return None
+        if row['status'] == 'queued' or (row['status'] == 'paused' and row['worker_id'] is None):
+            status = 'cancelled'
+            conn.execute(
+                """
+                UPDATE generation_jobs
+                SET status = 'cancelled', current_step = 'Generation cancelled', completed_at = ?
+                WHERE id = ?
+                """,
+                (datetime.now().isoformat(), job_id)
+            )
+        else:
+            status = 'cancelling'
+            conn.execute(
+                "UPDATE generation_jobs SET status = 'cancelling', current_step = 'Cancelling...' WHERE id = ?",
+                (job_id,)
+            )
+        conn.execute("COMMIT")
+    return status
+
+
+def pause_job(job_id):
+    """
+    Pause a queued or running job. A running job's worker finishes the calls in
+    flight and then waits without sending new requests.
+
+    Returns:
+        bool: False if the job is missing or not queued/running
+    """
+    with get_job_db() as conn:
+        cursor = conn.execute(
+            "UPDATE generation_jobs SET status = 'paused' WHERE id = ? AND status IN ('queued', 'in_progress')",
+            (job_id,)
+        )
+        return cursor.rowcount == 1
+
+
+def unpause_job(job_id):
+    """
+    Resume a paused job: back to running if a worker still holds it, otherwise
+    back on the queue.
+
+    Returns:
+        bool: False if the job is missing or not paused
+    """
+    with get_job_db() as conn:
+        cursor = conn.execute(
+            """
+            UPDATE generation_jobs
+            SET status = CASE WHEN worker_id IS NULL THEN 'queued' ELSE 'in_progress' END
+            WHERE id = ? AND status = 'paused'
+            """,
+            (job_id,)
+        )
+        return cursor.rowcount == 1
+
+
+def release_job(job_id, worker_id):
+    """
+    Hand a job back when its worker shuts down mid-run: a running job goes back on
+    the queue and a paused one stays paused without a worker. The interrupted
+    attempt isn't counted and the next worker resumes from the job's checkpoints.
+
+    Returns:
+        bool: False if ``worker_id`` no longer holds the job or it is being cancelled
+    """
+    with get_job_db() as conn:
+        cursor = conn.execute(
+            """
+            UPDATE generation_jobs
+            SET status = CASE WHEN status = 'paused' THEN 'paused' ELSE 'queued' END,
+                current_step = 'Waiting for a worker...', worker_id = NULL,
+                attempts = MAX(attempts - 1, 0), lease_expires_at = NULL
+            WHERE id = ? AND worker_id = ? AND status IN ('in_progress', 'paused')
+            """,
+            (job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+
+def requeue_job(job_id):
+    """
+    Put a failed or cancelled job back on the queue so a worker resumes it from
+    its checkpoints.
+
+    Returns:
+        bool: False if the job does not exist or is not failed/cancelled
+    """
+    with get_job_db() as conn:
+        cursor = conn.execute(
+            """
+            UPDATE generation_jobs
+            SET status = 'queued', progress = 0, current_step = 'Waiting for a worker...',
+                error = NULL, worker_id = NULL, attempts = 0, lease_expires_at = NULL,
+                completed_at = NULL
+            WHERE id = ? AND status IN ('failed', 'cancelled')
+            """,
+            (job_id,)
+        )
+        return cursor.rowcount == 1
+
+
+def load_checkpoints(job_id):
+    """
+    Fetch the nodes a job has already completed.
+
+    Returns:
+        dict: {storage path: (doc, content_hash)} for checkpoints whose
+        documentation row still exists
+    """
+    with get_job_db() as conn:
+        rows = conn.execute(
+            """
+            SELECT c.path, d.doc, c.content_hash
+            FROM generation_checkpoints c
+            JOIN documentation d ON d.id = c.documentation_id
+            WHERE c.job_id = ?
+            """,
+            (job_id,)
+        ).fetchall()
+    return {row['path']: (row['doc'], row['content_hash']) for row in rows}
+
+
+def count_checkpoints(job_id):
+    with get_job_db() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM generation_checkpoints WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+
+
+def find_latest_job_params(user_id, root_path):
+    """
+    Parameters of the user's most recent generation job for ``root_path`` that a
+    worker has picked up.
+
+    Returns:
+        dict: The job's params, or None if there is none
+    """
+    with get_job_db() as conn:
+        rows = conn.execute(
+            """
+            SELECT params FROM generation_jobs
+            WHERE user_id = ? AND status != 'queued'
+            ORDER BY created_at DESC, rowid DESC
+            """,
+            (str(user_id),)
+        ).fetchall()
+    for row in rows:
+        params = json.loads(row['params'])
+        if params.get('root_path') == root_path:
+            return params
+    return None
+
+
+def get_job_status(job_id):
+    """
+    Returns:
+        str: The job's status, or None if it doesn't exist
+    """
+    with get_job_db() as conn:
+        row = conn.execute("SELECT status FROM generation_jobs WHERE id = ?", (job_id,)).fetchone()
+    return row['status'] if row else None
+
+
+def get_job(job_id):
+    """
+    Returns:
+        dict: The job row with params/details decoded, or None
+    """
+    with get_job_db() as conn:
+        row = conn.execute("SELECT * FROM generation_jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row)
+
+
+def delete_job(job_id):
+    """
+    Delete a finished job with its checkpoints and events. Queued and running jobs are kept.
+
+    Returns:
+        bool: True if the job was deleted
+    """
+    with get_job_db() as conn:
+        cursor = conn.execute(
+            "DELETE FROM generation_jobs WHERE id = ? AND status IN (?, ?, ?)",
+            (job_id, *FINISHED_STATUSES)
+        )
+        if cursor.rowcount != 1:
+            return False
+        conn.execute("DELETE FROM generation_checkpoints WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM generation_events WHERE job_id = ?", (job_id,))
+        return True
+
+
+def job_status_response(job):
+    """Shape a job row like the status payload the frontend polls for."""
+    return {
+        "status": job['status'],
+        "progress": job['progress'],
+        "current_step": job['current_step'],
+        "error": job['error'],
+        "project_name": job['project_name'],
+        "details": job['details'],
+        "start_time": job['started_at'],
+        "completion_time": job['completed_at'] if job['status'] == 'completed' else None,
+        "failure_time": job['completed_at'] if job['status'] == 'failed' else None,
+        "cancel_time": job['completed_at'] if job['status'] == 'cancelled' else None
+    }
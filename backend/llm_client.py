@@ -0,0 +1,212 @@
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import get_budget, backoff_delay, parse_duration, RateLimitExceeded
+from llm_cache import get_response_cache, make_cache_key, is_bypassed
+from token_counter import count_tokens
+from progress_tracker import track_llm_call, report_event
+from job_control import check_job_control, raise_if_job_cancelled
+from fair_queue import get_request_gate, current_flow, MAX_CONCURRENT_REQUESTS
+from llm_providers import get_provider, ProviderRateLimitError, ProviderTransientError
+
+MAX_RETRIES = 6
+
+
+# Completion size assumed when the caller doesn't pass max_tokens
+DEFAULT_COMPLETION_TOKENS = 2048
+
+
+# One fan-out pool per (tenant, job, lane) flow with fan-outs running, and how many are running
+_fan_out_pools = {}
+_fan_out_pools_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Size of ``text`` in model tokens, measured with the local tokenizer."""
+    return count_tokens(text)
+
+
+def estimate_message_tokens(messages):
+    return sum(estimate_tokens(message.get("content")) for message in messages)
+
+
+def _enter_fan_out_pool(flow):
+    with _fan_out_pools_lock:
+        pool = _fan_out_pools.get(flow)
+        if pool is None:
+            executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="llm-fan-out")
+            pool = _fan_out_pools[flow] = [executor, 0]
+        pool[1] += 1
+        return pool[0]
+
+
+def _leave_fan_out_pool(flow):
+    with _fan_out_pools_lock:
+        pool = _fan_out_pools[flow]
+        pool[1] -= 1
+        if pool[1] == 0:
+            del _fan_out_pools[flow]
+            pool[0].shutdown(wait=False)
+
+
+def fan_out(function, items):
+    """
+    Call ``function`` on every item concurrently.
+
+    Each flow (the tenant, job and lane of the current request scope) fans out on
+    its own pool, so a job's tasks never queue behind another job's before they
+    reach the request gate, which alone decides the order between flows.
+    Concurrency is still capped by the gate, so fanning out never exceeds it.
+    ``function`` must not call ``fan_out`` itself.
+
+    Returns:
+        list: Results in the same order as ``items``
+    """
+    flow = current_flow()
+    executor = _enter_fan_out_pool(flow)
+    try:
+        futures = [
+            executor.submit(contextvars.copy_context().run, function, item)
+            for item in items
+        ]
+        return [future.result() for future in futures]
+    finally:
+        _leave_fan_out_pool(flow)
+
+
+def chat_completion(model, messages, max_retries=MAX_RETRIES, use_cache=True, provider=None, **kwargs):
+    """
+    Run a chat completion under the shared per-model rate budget.
+
+    Identical requests (same model, messages and sampling parameters) are answered
+    from the persistent response cache. Otherwise the call waits only as long as the
+    provider's rate-limit headers require, and retries 429s and transient server
+    errors with jittered exponential backoff.
+
+    Args:
+        model (str): Model name
+        messages (list): Chat messages
+        max_retries (int): Retries before giving up
+        use_cache (bool): Set to False to always call the provider
+        provider (LLMProvider, optional): Backend to call instead of the configured one
+        **kwargs: Extra arguments for the completion request
+
+    Returns:
+        str: Content of the first choice
+
+    Raises:
+        RateLimitExceeded: If the call is still rate limited after all retries
+    """
+    provider = provider or get_provider()
+    cache = get_response_cache()
+    cache_key = make_cache_key(model, messages, kwargs)
+    if use_cache and not is_bypassed():
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    budget = get_budget(model)
+    estimated_tokens = estimate_message_tokens(messages) + kwargs.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+
+    for attempt in range(max_retries + 1):
+        # Paused jobs wait here and cancelled ones stop before spending more budget
+        check_job_control()
+        # The model's rate window is waited out before taking a gate slot, so one
+        # throttled model never holds slots other tenants and models could use
+        budget.acquire(estimated_tokens)
+        try:
+            # Then fair admission across users and jobs
+            with get_request_gate().slot(estimated_tokens), track_llm_call() as call:
+                completion = provider.complete(model, messages, **kwargs)
+                call.tokens = completion.total_tokens
+        except ProviderRateLimitError as e:
+            budget.update_from_headers(e.headers)
+            delay = backoff_delay(attempt, parse_duration(e.headers.get("retry-after")))
+            print(f"Rate limit hit for {model}, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            report_event("rate_limit_wait", model=model, delay=round(delay, 1))
+            budget.block_for(delay)
+            continue
+        except ProviderTransientError as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"Transient error from {model}: {e}. Retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        budget.update_from_headers(completion.headers)
+        content = completion.content
+        if content is not None:
+            cache.put(cache_key, model, content)
+        return content
+
+    raise RateLimitExceeded(f"API call to {model} failed after {max_retries} retries.")
+
+
+def stream_chat_completion(model, messages, max_retries=MAX_RETRIES, use_cache=True, provider=None, **kwargs):
+    """
+    Streaming variant of ``chat_completion``: yields content deltas as they arrive.
+
+    Rate-limit and transient errors are retried only before the first token; a
+    cached response is yielded as a single delta. The full text is cached once the
+    stream finishes. The request slot is held until the stream is exhausted or closed.
+
+    Yields:
+        str: Content deltas
+    """
+    provider = provider or get_provider()
+    cache = get_response_cache()
+    cache_key = make_cache_key(model, messages, kwargs)
+    if use_cache and not is_bypassed():
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    budget = get_budget(model)
+    estimated_tokens = estimate_message_tokens(messages) + kwargs.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+
+    for attempt in range(max_retries + 1):
+        check_job_control()
+        parts = []
+        budget.acquire(estimated_tokens)
+        try:
+            with get_request_gate().slot(estimated_tokens), track_llm_call() as call:
+                stream = provider.stream(model, messages, **kwargs)
+                budget.update_from_headers(stream.headers)
+                try:
+                    for delta in stream:
+                        # Closing the stream abandons the request if the job is cancelled mid-response
+                        raise_if_job_cancelled()
+                        if delta.content:
+                            parts.append(delta.content)
+                            yield delta.content
+                        if delta.total_tokens is not None:
+                            call.tokens = delta.total_tokens
+                finally:
+                    stream.close()
+        except ProviderRateLimitError as e:
+            # Tokens already yielded can't be taken back
+            if parts:
+                raise
+            budget.update_from_headers(e.headers)
+            delay = backoff_delay(attempt, parse_duration(e.headers.get("retry-after")))
+            print(f"Rate limit hit for {model}, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            report_event("rate_limit_wait", model=model, delay=round(delay, 1))
+            budget.block_for(delay)
+            continue
+        except ProviderTransientError as e:
+            if parts or attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"Transient error from {model}: {e}. Retrying in {delay:.1f}s")
+            # Backing off outside the slot, so the wait doesn't hold up other requests
+            time.sleep(delay)
+            continue
+
+        if parts:
+            cache.put(cache_key, model, "".join(parts))
+        return
+
+    raise RateLimitExceeded(f"API call to {model} failed after {max_retries} retries.")
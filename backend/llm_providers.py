@@ -0,0 +1,297 @@
+import os
+import math
+import time
+import random
+import hashlib
+import threading
+from collections import deque
+
+# Backend used for every documentation and evaluation call: 'groq' or 'fake'
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+
+
+class ProviderRateLimitError(Exception):
+    """The provider rejected the request with a 429."""
+    def __init__(self, message, headers=None):
+        super().__init__(message)
+        self.headers = headers or {}
+
+
+class ProviderTransientError(Exception):
+    """Connection failure or server error that is worth retrying."""
+
+
+class Completion:
+    """A finished chat completion."""
+    def __init__(self, content, total_tokens=0, headers=None):
+        self.content = content
+        self.total_tokens = total_tokens
+        self.headers = headers or {}
+
+
+class StreamDelta:
+    """One piece of a streamed completion; ``total_tokens`` is set on the last one."""
+    def __init__(self, content=None, total_tokens=None):
+        self.content = content
+        self.total_tokens = total_tokens
+
+
+class CompletionStream:
+    """
+    A streamed completion: iterate for StreamDelta objects and close it when done.
+    ``headers`` are available before the first delta.
+    """
+    def __init__(self, deltas, headers=None, close=None):
+        self._deltas = deltas
+        self.headers = headers or {}
+        self._close = close
+
+    def __iter__(self):
+        return iter(self._deltas)
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+
+
+class LLMProvider:
+    """
+    Chat completion backend used by llm_client. Providers make exactly one attempt
+    per call; retries, rate budgets, caching and fair admission stay in llm_client.
+    """
+    name = None
+
+    def complete(self, model, messages, **kwargs):
+        """
+        Returns:
+            Completion
+
+        Raises:
+            ProviderRateLimitError: On a 429
+            ProviderTransientError: On connection failures and 5xx responses
+        """
+        raise NotImplementedError
+
+    def stream(self, model, messages, **kwargs):
+        """
+        Returns:
+            CompletionStream
+
+        Raises:
+            ProviderRateLimitError: On a 429 before the stream starts
+            ProviderTransientError: On connection failures and 5xx responses
+        """
+        raise NotImplementedError
+
+
+class GroqProvider(LLMProvider):
+    """The hosted Groq API. The client is created on first use."""
+    name = "groq"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from groq import Groq
+                    # Retries are handled by llm_client under the shared rate budget
+                    self._client = Groq(api_key=self.api_key or os.getenv("GROQ_API_KEY"), max_retries=0)
+        return self._client
+
+    def _create(self, model, messages, **kwargs):
+        from groq import RateLimitError, APIConnectionError, InternalServerError
+        try:
+            return self.client.chat.completions.with_raw_response.create(model=model, messages=messages, **kwargs)
+        except RateLimitError as e:
+            raise ProviderRateLimitError(str(e), e.response.headers) from e
+        except (APIConnectionError, InternalServerError) as e:
+            raise ProviderTransientError(str(e)) from e
+
+    def complete(self, model, messages, **kwargs):
+        raw_response = self._create(model, messages, **kwargs)
+        response = raw_response.parse()
+        usage = getattr(response, "usage", None)
+        return Completion(
+            response.choices[0].message.content,
+            getattr(usage, "total_tokens", 0) or 0,
+            raw_response.headers
+        )
+
+    def stream(self, model, messages, **kwargs):
+        raw_response = self._create(model, messages, stream=True, **kwargs)
+        stream = raw_response.parse()
+
+        def deltas():
+            for chunk in stream:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                # Usage arrives on the final chunk
+                usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                total_tokens = (getattr(usage, "total_tokens", 0) or 0) if usage is not None else None
+                yield StreamDelta(content, total_tokens)
+
+        return CompletionStream(deltas(), raw_response.headers, stream.close)
+
+
+class FakeProvider(LLMProvider):
+    """
+    Local stand-in for a hosted model, for load testing without network access.
+
+    Responses are deterministic for a given model and prompt. Latency is sampled
+    from a fixed, uniform or lognormal distribution around ``latency`` seconds, plus
+    ``seconds_per_token`` per completion token. Per-model requests-per-minute and
+    tokens-per-minute windows are enforced like the real API: requests over the
+    limit get a 429 with Retry-After, and successful responses carry x-ratelimit-*
+    headers. ``error_rate`` adds random 429s on top.
+    """
+    name = "fake"
+
+    def __init__(self, latency=0.5, distribution="lognormal", seconds_per_token=0.0, requests_per_minute=None,
+                 tokens_per_minute=None, error_rate=0.0, output_tokens=400, seed=0):
+        """
+        Args:
+            latency (float): Typical seconds before the response (the median for lognormal)
+            distribution (str): 'fixed', 'uniform' (0 to 2x latency) or 'lognormal'
+            seconds_per_token (float): Extra generation time per completion token
+            requests_per_minute (int, optional): Requests allowed per model per minute
+            tokens_per_minute (int, optional): Prompt + completion tokens allowed per model per minute
+            error_rate (float): Share of requests that fail with a 429 regardless of limits
+            output_tokens (int): Completion size, capped by the request's max_tokens
+            seed (int): Seed for latencies and injected errors
+        """
+        self.latency = latency
+        self.distribution = distribution
+        self.seconds_per_token = seconds_per_token
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.error_rate = error_rate
+        self.output_tokens = output_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.requests = 0
+        self.rate_limited = 0
+
+    @classmethod
+    def from_env(cls):
+        def optional_int(name):
+            value = os.getenv(name)
+            return int(value) if value else None
+
+        return cls(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")),
+            distribution=os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "lognormal"),
+            seconds_per_token=float(os.getenv("FAKE_LLM_SECONDS_PER_TOKEN", "0")),
+            requests_per_minute=optional_int("FAKE_LLM_REQUESTS_PER_MINUTE"),
+            tokens_per_minute=optional_int("FAKE_LLM_TOKENS_PER_MINUTE"),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            output_tokens=int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "400")),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0"))
+        )
+
+    def _sample_latency(self):
+        if self.distribution == "fixed":
+            return self.latency
+        if self.distribution == "uniform":
+            return self._random.uniform(0, 2 * self.latency)
+        return self.latency * math.exp(self._random.gauss(0, 0.5))
+
+    def _admit(self, model, tokens):
+        """Charge the request to the model's one-minute window, returning its rate-limit headers."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            window = self._windows.setdefault(model, deque())
+            while window and now - window[0][0] >= 60:
+                window.popleft()
+            used_requests = len(window)
+            used_tokens = sum(entry[1] for entry in window)
+            reset = 60 - (now - window[0][0]) if window else 0.0
+
+            over_requests = self.requests_per_minute is not None and used_requests + 1 > self.requests_per_minute
+            over_tokens = self.tokens_per_minute is not None and used_tokens + tokens > self.tokens_per_minute
+            injected = self.error_rate > 0 and self._random.random() < self.error_rate
+            if over_requests or over_tokens or injected:
+                self.rate_limited += 1
+                retry_after = max(reset, 0.1) if (over_requests or over_tokens) else 1.0
+                raise ProviderRateLimitError(
+                    f"Rate limit reached for model {model} (simulated)",
+                    {"retry-after": f"{retry_after:.2f}"}
+                )
+            window.append((now, tokens))
+            # The window frees up once its oldest request is a minute old
+            reset = 60 - (now - window[0][0])
+            headers = {}
+            if self.requests_per_minute is not None:
+                headers["x-ratelimit-remaining-requests"] = str(self.requests_per_minute - used_requests - 1)
+                headers["x-ratelimit-reset-requests"] = f"{reset:.2f}s"
+            if self.tokens_per_minute is not None:
+                headers["x-ratelimit-limit-tokens"] = str(self.tokens_per_minute)
+                headers["x-ratelimit-remaining-tokens"] = str(self.tokens_per_minute - used_tokens - tokens)
+                headers["x-ratelimit-reset-tokens"] = f"{reset:.2f}s"
+            return headers, self._sample_latency()
+
+    def _respond(self, model, messages, kwargs):
+        prompt = "".join(str(message.get("content") or "") for message in messages)
+        prompt_tokens = (len(prompt) + 3) // 4
+        completion_tokens = min(self.output_tokens, kwargs.get("max_tokens") or self.output_tokens)
+        headers, latency = self._admit(model, prompt_tokens + completion_tokens)
+        digest = hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+        # About four characters per token, like the local estimate
+        filler = " ".join(f"token{digest[i % 64]}" for i in range(max(0, completion_tokens - 20) // 2))
+        content = f"# Overview\n\nSimulated response {digest[:16]} from {model}.\n\n## Details\n\n{filler}\n"
+        return content, prompt_tokens + completion_tokens, headers, latency + completion_tokens * self.seconds_per_token
+
+    def complete(self, model, messages, **kwargs):
+        content, total_tokens, headers, latency = self._respond(model, messages, kwargs)
+        time.sleep(latency)
+        return Completion(content, total_tokens, headers)
+
+    def stream(self, model, messages, **kwargs):
+        content, total_tokens, headers, latency = self._respond(model, messages, kwargs)
+        pieces = [content[i:i + 64] for i in range(0, len(content), 64)]
+        closed = threading.Event()
+
+        def deltas():
+            for index, piece in enumerate(pieces):
+                if closed.is_set():
+                    return
+                time.sleep(latency / len(pieces))
+                yield StreamDelta(piece, total_tokens if index == len(pieces) - 1 else None)
+
+        return CompletionStream(deltas(), headers, closed.set)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def create_provider(name):
+    """Build the provider called ``name`` ('groq' or 'fake', configured from the environment)."""
+    if name == "groq":
+        return GroqProvider()
+    if name == "fake":
+        return FakeProvider.from_env()
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+def get_provider():
+    """Return the process-wide provider selected by LLM_PROVIDER."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider(LLM_PROVIDER)
+                print(f"Using LLM provider: {_provider.name}")
+    return _provider
+
+
+def set_provider(provider):
+    """Replace the process-wide provider (for load tests and benchmarks)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
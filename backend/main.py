@@ -1,8 +1,8 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks, Depends,Query
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends,Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List, Optional, Dict
+from typing import List, Optional
 import os
 import shutil
 import asyncio
@@ -24,8 +24,21 @@ import traceback
 import json
 import pickle
 # Import existing modules
-from hierarchy_manager import generate_documentation
+from hierarchy_manager import update_file_documentation, regenerate_node
+from file_level_documentation import stream_documentation_for_file
+from generation_estimator import estimate_generation
+from selection_index import make_selection
+from fair_queue import iterate_in_scope, get_request_gate, INTERACTIVE_LANE
 from documentation_evaluator import DocumentationEvaluator
+from llm_cache import get_response_cache
+from prompt_settings import invalidate_prompt_settings
+from doc_writer import get_documentation_writer, init_documentation_tables
+from job_queue import (
+    init_job_table, enqueue_job, requeue_job, cancel_job, pause_job, unpause_job, get_job, delete_job,
+    count_checkpoints, job_status_response, find_latest_job_params, FINISHED_STATUSES
+)
+from generation_worker import start_inline_workers, stop_inline_workers
+from job_events import init_event_table, load_events, record_event, format_sse, TERMINAL_EVENTS
 from chat_routes import router as chat_router
 from typing import Literal
 
@@ -79,33 +92,8 @@ def init_db():
             )
         """)
         
-        # Create documentation table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS documentation (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                path TEXT NOT NULL,
-                doc TEXT NOT NULL,
-                project_name TEXT NOT NULL,
-                level TEXT NOT NULL,
-                root_path TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'completed',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Added updated_at
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-
-        conn.execute("""CREATE TABLE IF NOT EXISTS documentation_sections (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    documentation_id INTEGER NOT NULL,
-                    section_name TEXT NOT NULL,
-                    section_content TEXT NOT NULL,
-                    prompt_used TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Added updated_at
-                    FOREIGN KEY (documentation_id) REFERENCES documentation(id)
-                );""")
+        # Create documentation and section tables
+        init_documentation_tables(conn)
         
         # Create chat tables
         conn.execute("""
@@ -151,8 +139,31 @@ def init_db():
             )
         """)
 
+        # Create generation job queue and event tables
+        init_job_table(conn)
+        init_event_table(conn)
+
 init_db()
 
+# Worker threads run inside the API process unless generation is moved to
+# separate worker processes (python generation_worker.py --processes N)
+GENERATION_INLINE_WORKERS = int(os.getenv("GENERATION_INLINE_WORKERS", "1"))
+inline_workers = None
+
+@app.on_event("startup")
+def start_generation_workers():
+    global inline_workers
+    if GENERATION_INLINE_WORKERS > 0:
+        inline_workers = start_inline_workers(GENERATION_INLINE_WORKERS)
+
+@app.on_event("shutdown")
+def flush_documentation_writer():
+    # Workers hand their jobs back first, so nothing is submitted to a closed writer
+    if inline_workers is not None:
+        stop_inline_workers(*inline_workers)
+    # Commit any generated documentation still queued in the batched writer
+    get_documentation_writer().close()
+
 @contextmanager
 def get_app_db():
     conn = sqlite3.connect("app.db")
@@ -884,9 +895,6 @@ def get_db():
     conn.row_factory = sqlite3.Row
     return conn
 
-# Global state for tracking generation progress
-generation_status: Dict[str, dict] = {}
-
 UPLOAD_DIRECTORY = "./uploaded_projects"
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
@@ -894,126 +902,360 @@ os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 def get_progress_key(project_name: str) -> str:
     # Remove any path components from the project name
     clean_project_name = os.path.basename(project_name)
-    return f"{clean_project_name}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    # Short random suffix keeps keys unique when one project is submitted twice in a second
+    return f"{clean_project_name}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
 
-# Modified status tracking
-generation_status: Dict[str, dict] = {}
-
-async def generate_docs_background(
-    user_id:str,
-    progress_key: str,
-    root_path: str,
-    project_name: str,
-    selected_items: List[str],
-    file_model: str,
-    folder_model: str,
-    project_model: str
-):
+def validate_selection(body: dict):
+    """
+    Check the selection of a generation request: either ``selected_items`` (every
+    selected path) or ``selection``, a compact spec expanded on the server:
+    {"include": [folders, paths or globs; everything if empty], "exclude": [globs or paths]}.
+    """
     try:
-        # Initialize status with more detailed information
-        generation_status[progress_key] = {
-            "status": "in_progress",
-            "progress": 0,
-            "current_step": "Initializing documentation process...",
-            "error": None,
-            "project_name": project_name,
-            "start_time": datetime.now().isoformat()
-        }
-        # Project Analysis
-        generation_status[progress_key].update({
-            "progress": 20,
-            "current_step": "Analyzing project structure..."
-        })
-        
-        await asyncio.sleep(2)
-        # Documentation Generation
-        generation_status[progress_key].update({
-            "progress": 40,
-            "current_step": "Generating documentation..."
-        })
-        print("Starting documentation generation")
-        await asyncio.sleep(1) 
-        # Actual documentation generation
-        try:
-            documentation = generate_documentation(
-                user_id=user_id,
-                root_path=root_path,
-                project_name=project_name,
-                selected_items=selected_items,
-                file_model=file_model,
-                folder_model=folder_model,
-                project_model=project_model
-            )
-            print("finished documentation generation, documentation:",documentation)
-        except Exception as e:
-            print(f"Error in generate_documentation: {str(e)}")
-            raise
-
-        # Completion
-        generation_status[progress_key].update({
-            "status": "completed",
-            "progress": 100,
-            "current_step": "Documentation generated successfully!",
-            "completion_time": datetime.now().isoformat()
-        })
-
-    except Exception as e:
-        generation_status[progress_key].update({
-            "status": "failed",
-            "error": str(e),
-            "current_step": "Generation failed",
-            "failure_time": datetime.now().isoformat()
-        })
-        raise
+        make_selection(body['root_path'], body.get('selected_items'), body.get('selection'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/generate")
-async def generate_docs(
-    body: dict,
-    background_tasks: BackgroundTasks
-):
+async def generate_docs(body: dict):
     # Validate required fields
-    required_fields = ['user_id','project_name', 'root_path', 'selected_items', 'file_model', 'folder_model', 'project_model']
+    required_fields = ['user_id','project_name', 'root_path', 'file_model', 'folder_model', 'project_model']
     for field in required_fields:
         if field not in body:
             raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
-    
+    validate_selection(body)
+
     progress_key = get_progress_key(body['project_name'])
     
-    background_tasks.add_task(
-        generate_docs_background,
+    # Queued in app.db and picked up by whichever generation worker claims it first
+    enqueue_job(
+        progress_key,
         user_id=body['user_id'],
-        progress_key=progress_key,
-        root_path=body['root_path'],
         project_name=body['project_name'],
-        selected_items=body['selected_items'],
-        file_model=body['file_model'],
-        folder_model=body['folder_model'],
-        project_model=body['project_model']
+        params={
+            "user_id": body['user_id'],
+            "root_path": body['root_path'],
+            "project_name": body['project_name'],
+            "selected_items": body.get('selected_items'),
+            "selection": body.get('selection'),
+            "file_model": body['file_model'],
+            "folder_model": body['folder_model'],
+            "project_model": body['project_model'],
+            "bypass_cache": bool(body.get('bypass_cache', False)),
+            "force_regenerate": bool(body.get('force_regenerate', False)),
+            "single_call_sections": bool(body.get('single_call_sections', False))
+        }
     )
     
     return {"progress_key": progress_key}
 
+@app.post("/api/generate/estimate")
+def estimate_generation_cost(body: dict):
+    """
+    Predict the LLM requests, input/output tokens and wall-clock time of a
+    generation request before submitting it. Takes the same body as /api/generate.
+    """
+    required_fields = ['user_id', 'root_path', 'file_model', 'folder_model', 'project_model']
+    for field in required_fields:
+        if field not in body:
+            raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
+    validate_selection(body)
+
+    estimate = estimate_generation(
+        body['user_id'],
+        body['root_path'],
+        body.get('selected_items'),
+        body['file_model'],
+        body['folder_model'],
+        body['project_model'],
+        force_regenerate=bool(body.get('force_regenerate', False)),
+        single_call_sections=bool(body.get('single_call_sections', False)),
+        selection=body.get('selection')
+    )
+    if estimate is None:
+        raise HTTPException(status_code=400, detail="Nothing under root_path is selected")
+    return estimate
+
 @app.get("/api/generate/status/{progress_key}")
 async def get_generation_status(progress_key: str):
-    if progress_key not in generation_status:
+    job = get_job(progress_key)
+    if job is None:
         raise HTTPException(
             status_code=404, 
             detail={
                 "message": "Generation task not found",
-                "progress_key": progress_key,
-                "available_keys": list(generation_status.keys())
+                "progress_key": progress_key
             }
         )
     
-    return generation_status[progress_key]
+    return job_status_response(job)
+
+# Seconds between checks for new events, and between keep-alive comments on idle streams
+EVENT_POLL_INTERVAL = 0.5
+EVENT_KEEPALIVE_INTERVAL = 15
+
+@app.get("/api/generate/{progress_key}/events")
+async def stream_generation_events(progress_key: str, request: Request, after: int = 0):
+    """
+    Server-sent event stream of a generation job: a ``status`` snapshot first, then
+    job_started, node_started, node_completed (with documentation_id), node_failed,
+    rate_limit_wait, progress, and finally job_completed or job_failed.
+    Reconnecting clients resume after the Last-Event-ID they received.
+    """
+    job = get_job(progress_key)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation task not found")
+
+    last_event_id = request.headers.get("last-event-id")
+    after_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else after
+
+    async def event_stream():
+        nonlocal after_id
+        yield format_sse("status", job_status_response(job))
+        idle_since = asyncio.get_event_loop().time()
+        while not await request.is_disconnected():
+            events = await asyncio.to_thread(load_events, progress_key, after_id)
+            for event in events:
+                after_id = event["id"]
+                yield format_sse(event["event"], event["data"], event["id"])
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+            if events:
+                idle_since = asyncio.get_event_loop().time()
+                continue
+
+            # A job finished without a terminal event (e.g. failed after lease expiry) or was deleted
+            current = await asyncio.to_thread(get_job, progress_key)
+            if current is None or current['status'] in FINISHED_STATUSES:
+                for event in await asyncio.to_thread(load_events, progress_key, after_id):
+                    yield format_sse(event["event"], event["data"], event["id"])
+                if current is not None:
+                    yield format_sse("status", job_status_response(current))
+                return
+
+            if asyncio.get_event_loop().time() - idle_since >= EVENT_KEEPALIVE_INTERVAL:
+                idle_since = asyncio.get_event_loop().time()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/generate/{progress_key}/resume")
+async def resume_generation(progress_key: str, current_user: dict = Depends(get_current_user)):
+    """
+    Requeue a failed or cancelled generation job. The worker rebuilds the plan from the job's
+    selected_items and skips every node the job already checkpointed.
+    """
+    job = get_job(progress_key)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation task not found")
+    if not current_user['is_admin'] and job['user_id'] != current_user['id']:
+        raise HTTPException(status_code=403, detail="Not authorized to resume this job")
+    if job['status'] not in ('failed', 'cancelled'):
+        raise HTTPException(status_code=409, detail=f"Only failed or cancelled jobs can be resumed (job is {job['status']})")
+    if not requeue_job(progress_key):
+        raise HTTPException(status_code=409, detail="Job was resumed or changed by another request")
+
+    return {"progress_key": progress_key, "checkpoints": count_checkpoints(progress_key)}
+
+# Models used to regenerate docs of a project no generation job has run for
+DEFAULT_FILE_MODEL = os.getenv("DEFAULT_FILE_MODEL", "llama-3.1-8b-instant")
+DEFAULT_FOLDER_MODEL = os.getenv("DEFAULT_FOLDER_MODEL", "llama-3.3-70b-versatile")
+DEFAULT_PROJECT_MODEL = os.getenv("DEFAULT_PROJECT_MODEL", "llama-3.3-70b-versatile")
+
+def resolve_regeneration_models(user_id, root_path, file_model=None, folder_model=None, project_model=None):
+    """
+    Models a regeneration uses: the ones the request names, else those of the
+    project's latest generation job, so content hashes match its next incremental
+    run, else the defaults.
+
+    Returns:
+        tuple: (file_model, folder_model, project_model)
+    """
+    params = find_latest_job_params(user_id, root_path) or {}
+    return (
+        file_model or params.get('file_model') or DEFAULT_FILE_MODEL,
+        folder_model or params.get('folder_model') or DEFAULT_FOLDER_MODEL,
+        project_model or params.get('project_model') or DEFAULT_PROJECT_MODEL
+    )
+
+@app.post("/api/documentation/file/stream")
+async def stream_file_documentation(body: dict, current_user: dict = Depends(get_current_user)):
+    """
+    Regenerate one file's documentation, streaming tokens as server-sent ``token``
+    events. The stored doc and its sections are replaced once the stream ends and
+    a ``done`` event carries the documentation id; failures end with ``error``.
+    The file model defaults to that of the project's latest generation job.
+    """
+    # The viewer passes the id of the row it shows; otherwise the latest doc for the path is used
+    with get_app_db() as conn:
+        if body.get('documentation_id'):
+            doc = conn.execute(
+                "SELECT id, path, root_path FROM documentation WHERE id = ? AND user_id = ? AND level = 'file'",
+                (body['documentation_id'], current_user['id'])
+            ).fetchone()
+        elif body.get('path'):
+            doc = conn.execute(
+                """
+                SELECT id, path, root_path FROM documentation
+                WHERE path = ? AND user_id = ? AND level = 'file'
+                ORDER BY id DESC LIMIT 1
+                """,
+                (body['path'], current_user['id'])
+            ).fetchone()
+        else:
+            raise HTTPException(status_code=400, detail="Missing required field: documentation_id or path")
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documentation not found")
+    path = doc['path']
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Source file no longer exists")
+    documentation_id = doc['id']
+    model, _, _ = resolve_regeneration_models(current_user['id'], doc['root_path'], body.get('model'))
+
+    def event_stream():
+        parts = []
+        try:
+            deltas = iterate_in_scope(
+                lambda: stream_documentation_for_file(path, model), current_user['id'], f"stream:{documentation_id}",
+                lane=INTERACTIVE_LANE
+            )
+            for delta in deltas:
+                parts.append(delta)
+                yield format_sse("token", {"text": delta})
+            sections = update_file_documentation(documentation_id, path, "".join(parts), model)
+        except Exception as e:
+            print(f"Error streaming documentation for {path}: {str(e)}")
+            yield format_sse("error", {"error": str(e)})
+            return
+        yield format_sse("done", {"documentation_id": documentation_id, "sections": sections})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/documentation/regenerate")
+def regenerate_documentation(body: dict, current_user: dict = Depends(get_current_user)):
+    """
+    Regenerate one stored file or folder doc right away, optionally cascading to
+    every documented ancestor. Its LLM requests are admitted ahead of queued batch
+    work from running generation jobs.
+
+    Body: documentation_id, cascade (default false), file_model, folder_model,
+    project_model, bypass_cache. Models not named default to those of the project's
+    latest generation job.
+    """
+    if not body.get('documentation_id'):
+        raise HTTPException(status_code=400, detail="Missing required field: documentation_id")
+    with get_app_db() as conn:
+        doc = conn.execute(
+            "SELECT path, root_path, level FROM documentation WHERE id = ? AND user_id = ?",
+            (body['documentation_id'], current_user['id'])
+        ).fetchone()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documentation not found")
+    if doc['level'] == 'file' and not os.path.isfile(doc['path']):
+        raise HTTPException(status_code=404, detail="Source file no longer exists")
+
+    file_model, folder_model, project_model = resolve_regeneration_models(
+        current_user['id'], doc['root_path'],
+        body.get('file_model'), body.get('folder_model'), body.get('project_model')
+    )
+    try:
+        regenerated = regenerate_node(
+            current_user['id'],
+            doc['root_path'],
+            doc['path'],
+            file_model,
+            folder_model,
+            project_model,
+            cascade=bool(body.get('cascade')),
+            bypass_cache=bool(body.get('bypass_cache'))
+        )
+    except Exception as e:
+        print(f"Error regenerating documentation for {doc['path']}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if regenerated is None:
+        raise HTTPException(status_code=404, detail="Documentation not found")
+    return {"regenerated": regenerated}
+
+@app.post("/api/generate/{progress_key}/cancel")
+async def cancel_generation(progress_key: str, current_user: dict = Depends(get_current_user)):
+    """
+    Cancel a generation job. No new nodes or LLM calls start; documentation already
+    generated is kept and the job can later be resumed from its checkpoints.
+    """
+    job = get_job(progress_key)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation task not found")
+    if not current_user['is_admin'] and job['user_id'] != current_user['id']:
+        raise HTTPException(status_code=403, detail="Not authorized to cancel this job")
+
+    status = cancel_job(progress_key)
+    if status is None:
+        raise HTTPException(status_code=409, detail=f"Job already finished ({job['status']})")
+    if status == 'cancelled':
+        # No worker holds the job, so nobody else will emit its final event
+        record_event(progress_key, 'job_cancelled', {})
+    return {"progress_key": progress_key, "status": status}
+
+@app.post("/api/admin/generate/{progress_key}/pause")
+async def pause_generation(progress_key: str, current_user: dict = Depends(get_current_user)):
+    """
+    Admin endpoint pausing a queued or running job so interactive work goes first.
+    Calls already in flight finish; nothing new is sent until the job is resumed.
+    """
+    if not current_user.get('is_admin'):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not pause_job(progress_key):
+        raise HTTPException(status_code=409, detail="Only queued or running jobs can be paused")
+    record_event(progress_key, 'job_paused', {})
+    return {"progress_key": progress_key, "status": "paused"}
+
+@app.post("/api/admin/generate/{progress_key}/resume")
+async def unpause_generation(progress_key: str, current_user: dict = Depends(get_current_user)):
+    """
+    Admin endpoint resuming a paused job
+    """
+    if not current_user.get('is_admin'):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not unpause_job(progress_key):
+        raise HTTPException(status_code=409, detail="Job is not paused")
+    record_event(progress_key, 'job_resumed', {})
+    return {"progress_key": progress_key, "status": get_job(progress_key)['status']}
+
+@app.get("/api/admin/llm-cache/stats")
+async def get_llm_cache_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Admin endpoint reporting LLM response cache hits, misses and size
+    """
+    if not current_user.get('is_admin'):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {**get_response_cache().stats(), "request_gate": get_request_gate().stats()}
 
 # Add a cleanup route for completed generations
 @app.delete("/api/generate/status/{progress_key}")
-async def cleanup_generation_status(progress_key: str):
-    if progress_key in generation_status:
-        del generation_status[progress_key]
-        return {"message": "Status cleared successfully"}
-    raise HTTPException(status_code=404, detail="Generation task not found")
+async def cleanup_generation_status(progress_key: str, current_user: dict = Depends(get_current_user)):
+    """
+    Delete a finished job with its checkpoints and events. Jobs still queued or running
+    have to be cancelled first.
+    """
+    job = get_job(progress_key)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation task not found")
+    if not current_user['is_admin'] and job['user_id'] != current_user['id']:
+        raise HTTPException(status_code=403, detail="Not authorized to clear this job")
+
+    if not delete_job(progress_key):
+        raise HTTPException(status_code=409, detail=f"Job is still {job['status']}; cancel it first")
+    return {"message": "Status cleared successfully"}
+
 # Temporary upload directory
 UPLOAD_DIRECTORY = "./uploaded_projects"
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
@@ -1365,6 +1607,7 @@ async def create_setting(setting: Setting):
                 (setting.key, setting.value, setting.category, setting.description)
             )
             conn.commit()
+            invalidate_prompt_settings()
             
             # Get the created setting
             created = conn.execute(
@@ -1396,6 +1639,7 @@ async def update_setting(setting_id: int, setting: Setting):
             if cursor.rowcount == 0:
                 raise HTTPException(status_code=404, detail="Setting not found")
             conn.commit()
+            invalidate_prompt_settings()
             
             # Get the updated setting
             updated = conn.execute(
@@ -1416,6 +1660,7 @@ async def delete_setting(setting_id: int):
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Setting not found")
         conn.commit()
+        invalidate_prompt_settings()
         return {"message": "Setting deleted successfully"}
     
 
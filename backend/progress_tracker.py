@@ -1,13 +1,86 @@
-from typing import Dict, Optional
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
 from datetime import datetime
 
+# Filtered files listed in a job's details; the rest are only counted
+MAX_REPORTED_FILTERED_FILES = 50
+
+# Tracker of the generation job running in the current context (set by ProgressTracker.activate)
+_current_tracker = contextvars.ContextVar("progress_tracker", default=None)
+
+
+class _LLMCall:
+    def __init__(self):
+        self.tokens = 0
+
+
+@contextmanager
+def track_llm_call():
+    """
+    Count an LLM request as in flight for the current job's tracker, if any.
+    Set ``tokens`` on the yielded object to the request's total token usage.
+    """
+    tracker = _current_tracker.get()
+    call = _LLMCall()
+    if tracker is not None:
+        tracker.llm_call_started()
+    try:
+        yield call
+    finally:
+        if tracker is not None:
+            tracker.llm_call_finished(call.tokens)
+
+
+def report_event(event_type: str, **payload):
+    """Send an event to the current job's tracker, if any."""
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.emit(event_type, **payload)
+
+
 class ProgressTracker:
-    def __init__(self, progress_key: str):
+    """
+    Thread-safe progress for one generation job.
+
+    Progress and ETA are measured in estimated token volume rather than node
+    counts, so a folder of large files weighs more than a folder of small ones.
+    The ETA divides the remaining volume by the volume finished per second since
+    the first node started, which self-calibrates against the real provider speed.
+    Reused (unchanged) nodes count as done from the start and are left out of the
+    throughput figures.
+    """
+    def __init__(self, progress_key: str, on_update: Optional[Callable[[dict], None]] = None, update_interval: float = 1.0,
+                 on_event: Optional[Callable[[str, dict], None]] = None):
+        """
+        Args:
+            progress_key: Job id being tracked
+            on_update: Called with a copy of the status whenever it changes,
+                at most once per ``update_interval`` seconds
+            update_interval: Minimum seconds between ``on_update`` calls
+            on_event: Called with (event type, payload) for node and rate-limit events
+        """
         self.progress_key = progress_key
+        self.on_update = on_update
+        self.on_event = on_event
+        self.update_interval = update_interval
         self.total_files = 0
         self.processed_files = 0
         self.total_folders = 0
         self.processed_folders = 0
+        self.total_sections = 0
+        self.processed_sections = 0
+        self.total_tokens = 0
+        self.processed_tokens = 0
+        self.reused_tokens = 0
+        self.reused_nodes = 0
+        self.llm_tokens = 0
+        self.in_flight_calls = 0
+        self._work_started_at = None
+        self._last_update = 0.0
+        self._lock = threading.Lock()
         self._status: Dict[str, any] = {
             "status": "in_progress",
             "progress": 0,
@@ -21,62 +94,169 @@ class ProgressTracker:
             }
         }
 
-    def set_total_items(self, files: int, folders: int):
-        self.total_files = files
-        self.total_folders = folders
-        self._update_progress()
+    @contextmanager
+    def activate(self):
+        """Make this the tracker for LLM calls made in the current context."""
+        token = _current_tracker.set(self)
+        try:
+            yield self
+        finally:
+            _current_tracker.reset(token)
 
-    def increment_processed_files(self, current_file: Optional[str] = None):
-        self.processed_files += 1
-        self._status["details"]["files_processed"] = self.processed_files
-        self._status["details"]["current_file"] = current_file
-        self._update_progress()
+    def set_total_items(self, files: int, folders: int, sections: int = 0, tokens: int = 0,
+                        reused_files: int = 0, reused_folders: int = 0, reused_sections: int = 0, reused_tokens: int = 0):
+        """
+        Args:
+            files, folders, sections: Totals for the whole plan, including reused nodes
+            tokens: Estimated token volume of the whole plan
+            reused_*: The share of each total already satisfied by stored documentation
+        """
+        with self._lock:
+            self.total_files = files
+            self.total_folders = folders
+            self.total_sections = sections
+            self.total_tokens = tokens
+            self.processed_files = reused_files
+            self.processed_folders = reused_folders
+            self.processed_sections = reused_sections
+            self.reused_tokens = reused_tokens
+            self.reused_nodes = reused_files + reused_folders
+            self.processed_tokens = reused_tokens
+            self._update_progress()
+        self._publish(force=True)
 
-    def increment_processed_folders(self):
-        self.processed_folders += 1
-        self._status["details"]["folders_processed"] = self.processed_folders
-        self._update_progress()
+    def set_filtered_files(self, filtered: list):
+        """
+        Report selected files kept from the model by the pre-filter.
 
-    def _update_progress(self):
-        if self.total_files + self.total_folders == 0:
-            return
+        Args:
+            filtered: {"path", "action", "reason", "size"} dicts
+        """
+        with self._lock:
+            self._status["details"]["filtered_files"] = filtered[:MAX_REPORTED_FILTERED_FILES]
+            self._status["details"]["filtered_files_total"] = len(filtered)
+        self._publish(force=True)
+
+    def emit(self, event_type: str, **payload):
+        if self.on_event is not None:
+            self.on_event(event_type, payload)
+
+    def start_node(self, path: str, level: Optional[str] = None):
+        with self._lock:
+            if self._work_started_at is None:
+                self._work_started_at = time.monotonic()
+            self._status["details"]["current_file"] = path
+        self.emit("node_started", path=path, level=level)
+        self._publish()
 
-        # Calculate progress percentage
-        total_items = self.total_files + self.total_folders
-        processed_items = self.processed_files + self.processed_folders
-        progress = (processed_items / total_items) * 100
+    def increment_processed_files(self, current_file: Optional[str] = None, tokens: int = 0):
+        with self._lock:
+            self.processed_files += 1
+            self.processed_tokens += tokens
+            self._status["details"]["current_file"] = current_file
+            self._update_progress()
+        self._publish()
+
+    def increment_processed_folders(self, sections: int = 0, tokens: int = 0):
+        with self._lock:
+            self.processed_folders += 1
+            self.processed_sections += sections
+            self.processed_tokens += tokens
+            self._update_progress()
+        self._publish()
+
+    def llm_call_started(self):
+        with self._lock:
+            self.in_flight_calls += 1
+            self._update_details()
+        self._publish()
+
+    def llm_call_finished(self, tokens: int = 0):
+        with self._lock:
+            self.in_flight_calls -= 1
+            self.llm_tokens += tokens
+            self._update_details()
+        self._publish()
+
+    def _update_progress(self):
+        if self.total_tokens > 0:
+            progress = self.processed_tokens / self.total_tokens * 100
+        elif self.total_files + self.total_folders > 0:
+            total_items = self.total_files + self.total_folders
+            progress = (self.processed_files + self.processed_folders) / total_items * 100
+        else:
+            progress = 0
 
-        # Update status
         self._status["progress"] = min(round(progress, 1), 99)  # Cap at 99% until complete
         self._update_step_message()
+        self._update_details()
 
     def _update_step_message(self):
-        progress = self._status["progress"]
-        if progress < 20:
-            self._status["current_step"] = "Analyzing project structure..."
-        elif progress < 40:
+        if self.processed_files < self.total_files:
             self._status["current_step"] = f"Processing files ({self.processed_files}/{self.total_files})"
-        elif progress < 80:
+        elif self.processed_folders < self.total_folders:
             self._status["current_step"] = f"Generating folder documentation ({self.processed_folders}/{self.total_folders})"
         else:
             self._status["current_step"] = "Finalizing documentation..."
 
-    def complete(self):
-        self._status.update({
-            "status": "completed",
-            "progress": 100,
-            "current_step": "Documentation generated successfully!",
-            "completion_time": datetime.now().isoformat()
+    def _update_details(self):
+        elapsed = time.monotonic() - self._work_started_at if self._work_started_at is not None else 0
+        generated_tokens = self.processed_tokens - self.reused_tokens
+        generated_nodes = self.processed_files + self.processed_folders - self.reused_nodes
+        nodes_per_minute = generated_nodes / elapsed * 60 if elapsed > 0 else None
+        tokens_per_minute = self.llm_tokens / elapsed * 60 if elapsed > 0 else None
+
+        eta_seconds = None
+        if elapsed > 0 and generated_tokens > 0:
+            eta_seconds = round((self.total_tokens - self.processed_tokens) / (generated_tokens / elapsed))
+
+        self._status["details"].update({
+            "files_processed": self.processed_files,
+            "files_total": self.total_files,
+            "folders_processed": self.processed_folders,
+            "folders_total": self.total_folders,
+            "sections_processed": self.processed_sections,
+            "sections_total": self.total_sections,
+            "in_flight_calls": self.in_flight_calls,
+            "nodes_per_minute": round(nodes_per_minute, 1) if nodes_per_minute is not None else None,
+            "tokens_per_minute": round(tokens_per_minute) if tokens_per_minute is not None else None,
+            "eta_seconds": eta_seconds
         })
 
+    def _publish(self, force: bool = False):
+        if self.on_update is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_update < self.update_interval:
+                return
+            self._last_update = now
+        self.on_update(self.status)
+
+    def complete(self):
+        with self._lock:
+            self._status.update({
+                "status": "completed",
+                "progress": 100,
+                "current_step": "Documentation generated successfully!",
+                "completion_time": datetime.now().isoformat()
+            })
+            self._status["details"]["eta_seconds"] = 0
+        self._publish(force=True)
+
     def fail(self, error: str):
-        self._status.update({
-            "status": "failed",
-            "error": str(error),
-            "current_step": "Generation failed",
-            "failure_time": datetime.now().isoformat()
-        })
+        with self._lock:
+            self._status.update({
+                "status": "failed",
+                "error": str(error),
+                "current_step": "Generation failed",
+                "failure_time": datetime.now().isoformat()
+            })
+        self._publish(force=True)
 
     @property
     def status(self) -> dict:
-        return self._status.copy()
\ No newline at end of file
+        with self._lock:
+            status = dict(self._status)
+            status["details"] = dict(self._status["details"])
+            return status
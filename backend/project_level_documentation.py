@@ -1,18 +1,12 @@
-import os
-import sqlite3
-from groq import Groq
+from prompt_settings import get_prompt_snapshot, register_renderer
+from llm_client import chat_completion, fan_out
+from job_control import JobCancelled
 from dotenv import load_dotenv
-from sections_extractor import extract_all_sections_for_files
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from sections_extractor import extract_all_sections_for_files, split_combined_sections, format_child_context, SECTION_MARKER, SECTION_ERROR_PREFIX
+from context_builder import fit_documents_to_budget, describe_omissions, SECTION_CONTEXT_TOKEN_BUDGET, COMBINED_CONTEXT_TOKEN_BUDGET
 
 load_dotenv()
 
-client = Groq(
-    api_key=os.getenv("GROQ_API_KEY"),
-)
-
-# Path to your DB file (update as needed)
-DB_PATH = "settings.db"
 # Default prompt templates (fallback if no DB prompt is found)
 default_section_formats = {
     "project_overview": """### 1. Project Overview
@@ -89,20 +83,17 @@ sections_mappings = {"project_overview": "Project Overview",
                      "project_dependencies": "Dependencies and Requirements"}
 
 def get_prompts_from_db():
-    """Fetch all prompts from the database with keys matching those in default_section_formats."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Fetch prompts for keys that match the default_section_formats keys
-    cursor.execute("SELECT key, value FROM settings WHERE key IN ({})".format(
-        ', '.join(['?'] * len(default_section_formats))
-    ), list(default_section_formats.keys()))
-    
-    rows = cursor.fetchall()
-    prompts = {row['key']: row['value'] for row in rows}
-    conn.close()
-    return prompts
+    """Fetch all prompts with keys matching those in default_section_formats from the cached settings snapshot."""
+    return get_prompt_snapshot().with_keys(default_section_formats.keys())
+
+def _render_section_formats(settings):
+    """Section formats from the settings table, falling back to the defaults."""
+    return {
+        section: settings.get(section, default_prompt)
+        for section, default_prompt in default_section_formats.items()
+    }
+
+register_renderer('project_section_formats', _render_section_formats)
 
 def combine_documentation(docs):
     """
@@ -119,14 +110,17 @@ def combine_documentation(docs):
         combined_doc += f"\n{content}\n\n"
     return combined_doc
 
-def format_documentation_summary(documentation_dict, section_name, doc_type="File"):
+def format_documentation_summary(documentation_dict, section_name, doc_type="File", token_budget=SECTION_CONTEXT_TOKEN_BUDGET):
     """
     Format documentation summary with improved validation and error handling.
+    Children are ranked and shortened to fit ``token_budget``; any that were cut
+    are listed in a note at the end.
     
     Args:
         documentation_dict (dict): Dictionary containing documentation sections
         section_name (str): Name of the section to format
         doc_type (str): Type of documentation (File or Folder)
+        token_budget (int): Maximum tokens of child documentation
     
     Returns:
         str: Formatted documentation summary
@@ -149,10 +143,16 @@ def format_documentation_summary(documentation_dict, section_name, doc_type="Fil
         return f"No content available for {section_name} in {doc_type.lower()} documentation."
     
     # Format the documentation
-    formatted_docs = []
-    for path, content in section_content.items():
-        if content and content.strip():  # Check if content exists and is not just whitespace
-            formatted_docs.append(f"{doc_type}: {path}\n{content.strip()}")
+    valid_content = {
+        path: content.strip()
+        for path, content in section_content.items()
+        if content and content.strip()  # Check if content exists and is not just whitespace
+    }
+    kept, omitted = fit_documents_to_budget(valid_content, token_budget)
+    formatted_docs = [f"{doc_type}: {path}\n{content}" for path, content in kept]
+    note = describe_omissions(omitted, doc_type)
+    if note:
+        formatted_docs.append(note)
     
     # Return formatted content or no content message
     if formatted_docs:
@@ -202,6 +202,27 @@ def map_extracted_to_formal_sections(extracted_documentation):
     
     return mapped_documentation
 
+# Instructions shared by the per-section and single-call project prompts
+PROJECT_PROMPT_REQUIREMENTS = """You are a technical documentation expert creating comprehensive project-level documentation. Your task is to synthesize information from root-level files and immediate child folders into cohesive, accurate project documentation.
+
+Key Requirements:
+- Create high-level project documentation that provides a clear overview of the entire system
+- Synthesize information from both files and folders documentations to create a complete picture
+- Maintain consistent terminology and technical accuracy
+- Focus on project-wide patterns, architectures, and relationships
+- Include only information that is explicitly present in the source documentation
+- If no source documentation is available for a section, clearly state that the information is not available"""
+
+PROJECT_PROMPT_GUIDELINES = """Guidelines:
+1. Focus on project-wide concerns and architectural decisions
+2. Highlight relationships between major components
+3. Maintain technical accuracy while providing high-level overview
+4. Use consistent terminology throughout
+5. Include relevant cross-references between components
+6. Emphasize project-wide patterns and standards
+7. Consider both immediate implementation details and long-term maintenance
+8. If no documentation is available for certain aspects, explicitly state this rather than making assumptions"""
+
 def create_project_prompt(project_path, project_name, section_name, section_format, files_summary, folders_summary):
     """
     Create project prompt with improved validation and clarity.
@@ -230,15 +251,7 @@ def create_project_prompt(project_path, project_name, section_name, section_form
         else f"Folder Documentation:\n{folders_summary}"
     )
     
-    return f"""You are a technical documentation expert creating comprehensive project-level documentation. Your task is to synthesize information from root-level files and immediate child folders into cohesive, accurate project documentation.
-
-Key Requirements:
-- Create high-level project documentation that provides a clear overview of the entire system
-- Synthesize information from both files and folders documentations to create a complete picture
-- Maintain consistent terminology and technical accuracy
-- Focus on project-wide patterns, architectures, and relationships
-- Include only information that is explicitly present in the source documentation
-- If no source documentation is available for a section, clearly state that the information is not available
+    return f"""{PROJECT_PROMPT_REQUIREMENTS}
 
 Context:
 Project Name: {project_name}
@@ -253,17 +266,48 @@ Available Documentation:
 Output Format:
 {section_format}
 
-Guidelines:
-1. Focus on project-wide concerns and architectural decisions
-2. Highlight relationships between major components
-3. Maintain technical accuracy while providing high-level overview
-4. Use consistent terminology throughout
-5. Include relevant cross-references between components
-6. Emphasize project-wide patterns and standards
-7. Consider both immediate implementation details and long-term maintenance
-8. If no documentation is available for certain aspects, explicitly state this rather than making assumptions"""
+{PROJECT_PROMPT_GUIDELINES}"""
+
+def create_combined_project_prompt(project_path, project_name, section_formats, files_context, folders_context):
+    """
+    Create a single prompt that asks for every project section in one response.
+    
+    Args:
+        project_path (str): Path to the project
+        project_name (str): Name of the project
+        section_formats (dict): Format template per section key
+        files_context (str): Documentation of root files, sent once
+        folders_context (str): Documentation of root folders, sent once
+    
+    Returns:
+        str: Formatted prompt; each section in the answer starts with its SECTION_MARKER line
+    """
+    section_instructions = "\n\n".join(
+        f"{SECTION_MARKER.format(section_key)}\n{section_format}"
+        for section_key, section_format in section_formats.items()
+    )
+    
+    return f"""{PROJECT_PROMPT_REQUIREMENTS}
+
+Context:
+Project Name: {project_name}
+Project Path: {project_path}
+
+Available Documentation:
+File Documentation:
+{files_context}
+
+Folder Documentation:
+{folders_context}
+
+Output Format:
+Write every section below, in order. Start each section with its marker line exactly as shown (for example {SECTION_MARKER.format(next(iter(section_formats)))}) and then follow that section's format.
+
+{section_instructions}
+
+{PROJECT_PROMPT_GUIDELINES}"""
 
-def generate_project_level_documentation(project_path, project_name, root_files_documentation, root_folders_documentation, project_level_model):
+def generate_project_level_documentation(project_path, project_name, root_files_documentation, root_folders_documentation, project_level_model, single_call=False):
     """
     Generate comprehensive project-level documentation by synthesizing information from root-level files
     and immediate child folders.
@@ -274,6 +318,8 @@ def generate_project_level_documentation(project_path, project_name, root_files_
         root_files_documentation (dict): Documentation extracted from files in the root directory
         root_folders_documentation (dict): Documentation from immediate child folders
         project_level_model (str): The model to use for documentation generation
+        single_call (bool): Request every section in one response, falling back to
+            per-section calls for sections that can't be parsed from it
     
     Returns:
         tuple: Contains the combined documentation string, prompts dictionary, and responses dictionary
@@ -299,21 +345,18 @@ def generate_project_level_documentation(project_path, project_name, root_files_
         root_folders_documentation = map_extracted_to_formal_sections(root_folders_documentation)
         print(f"Mapped sections from folders: {root_folders_documentation.keys() if root_folders_documentation else 'None'}")
 
-    # Fetch prompts from the DB
-    db_prompts = get_prompts_from_db()
-
-    # Build the final section formats by checking if a prompt exists in the DB
-    section_formats = {}
-    for section, default_prompt in default_section_formats.items():
-        section_formats[section] = db_prompts.get(section, default_prompt)
+    # Section formats (DB prompts over defaults) are rendered once per settings snapshot
+    section_formats = get_prompt_snapshot().rendered('project_section_formats')
 
     try:
         # Generate prompts for each section
         prompts = {}
+        # Files and folders share each prompt's context budget
+        context_budget = SECTION_CONTEXT_TOKEN_BUDGET // (2 if root_folders_documentation else 1)
         for section_key, section_format in section_formats.items():
             section_name = sections_mappings[section_key]
-            files_summary = format_documentation_summary(root_files_documentation, section_key)
-            folders_summary = format_documentation_summary(root_folders_documentation, section_key, "Folder") if root_folders_documentation else ""
+            files_summary = format_documentation_summary(root_files_documentation, section_key, token_budget=context_budget)
+            folders_summary = format_documentation_summary(root_folders_documentation, section_key, "Folder", token_budget=context_budget) if root_folders_documentation else ""
             
             base_prompt = create_project_prompt(
                 project_path=project_path,
@@ -329,35 +372,68 @@ def generate_project_level_documentation(project_path, project_name, root_files_
                 {"role": "user", "content": f"Generate the {section_name} section for project {project_name}, focusing on providing a comprehensive project-level perspective. Include only information that is explicitly present in the source documentation."}
             ]
 
-        # Generate documentation for each section
-        responses = {}
-        for section_key in section_formats.keys():
+        # Generate all sections concurrently; a failing section doesn't affect the others
+        def generate_section(section_key):
             section_name = sections_mappings[section_key]
             try:
                 print(f"Generating documentation for section: {section_name}")
-                response = client.chat.completions.create(
+                response = chat_completion(
                     model=project_level_model,
                     messages=prompts[section_key]
                 )
-                responses[section_key] = response
                 print(f"Successfully generated documentation for section: {section_name}")
+                return response
+            except JobCancelled:
+                raise
             except Exception as e:
                 print(f"Error generating documentation for section {section_name}: {str(e)}")
-                responses[section_key] = None
+                return None
+
+        section_keys = list(section_formats.keys())
+        responses = {}
+        if single_call:
+            combined_prompt = [
+                {"role": "system", "content": create_combined_project_prompt(
+                    project_path=project_path,
+                    project_name=project_name,
+                    section_formats=section_formats,
+                    files_context=format_child_context(root_files_documentation, "File", sections_mappings, COMBINED_CONTEXT_TOKEN_BUDGET // 2),
+                    folders_context=format_child_context(root_folders_documentation, "Folder", sections_mappings, COMBINED_CONTEXT_TOKEN_BUDGET // 2)
+                )},
+                {"role": "user", "content": f"Generate all sections for project {project_name}, each starting with its marker line, focusing on providing a comprehensive project-level perspective. Include only information that is explicitly present in the source documentation."}
+            ]
+            try:
+                print(f"Generating all sections in one request for project: {project_name}")
+                combined_response = chat_completion(model=project_level_model, messages=combined_prompt)
+                responses = split_combined_sections(combined_response, section_keys)
+            except JobCancelled:
+                raise
+            except Exception as e:
+                print(f"Error generating combined documentation for project {project_name}: {str(e)}")
+            for section_key in responses:
+                prompts[section_key] = combined_prompt
+
+        missing_sections = [section_key for section_key in section_keys if section_key not in responses]
+        if single_call and missing_sections:
+            print(f"Falling back to per-section generation for project {project_name}: {missing_sections}")
+        responses.update(zip(missing_sections, fan_out(generate_section, missing_sections)))
 
         # Compile responses
         project_documentation = {}
-        for section_key, response in responses.items():
+        for section_key in section_keys:
+            response = responses.get(section_key)
             if response is not None:
-                project_documentation[section_key] = response.choices[0].message.content
+                project_documentation[section_key] = response
             else:
-                project_documentation[section_key] = f"Error generating documentation for {sections_mappings[section_key]}"
+                project_documentation[section_key] = f"{SECTION_ERROR_PREFIX}{sections_mappings[section_key]}"
 
         # Combine documentation
         final_documentation = combine_documentation(project_documentation)
         print("Documentation generation completed successfully")
         return final_documentation, prompts, project_documentation
 
+    except JobCancelled:
+        raise
     except Exception as e:
         error_message = f"Error processing project {project_path}: {str(e)}"
         print(error_message)
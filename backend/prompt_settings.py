@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+
+SETTINGS_DB_PATH = "settings.db"
+
+# name -> function(settings dict) building a derived template once per snapshot
+_renderers = {}
+
+
+def register_renderer(name, render):
+    """
+    Register a template renderer evaluated once per settings snapshot.
+
+    Args:
+        name (str): Name used with PromptSettingsSnapshot.rendered
+        render (callable): Called with the {key: value} settings dict
+    """
+    _renderers[name] = render
+
+
+class PromptSettingsSnapshot:
+    """Immutable view of the settings table at one version."""
+    def __init__(self, version, settings):
+        self.version = version
+        self.settings = settings
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        return self.settings.get(key, default)
+
+    def with_prefix(self, prefix):
+        return {key: value for key, value in self.settings.items() if key.startswith(prefix)}
+
+    def with_keys(self, keys):
+        return {key: self.settings[key] for key in keys if key in self.settings}
+
+    def rendered(self, name):
+        """Return the output of renderer ``name`` for this snapshot, rendering it on first use."""
+        with self._lock:
+            if name not in self._rendered:
+                self._rendered[name] = _renderers[name](self.settings)
+            return self._rendered[name]
+
+
+class PromptSettingsCache:
+    """
+    In-process cache of settings.db.
+
+    The snapshot is reloaded when ``invalidate`` is called (the /api/settings write
+    handlers do this) or when ``PRAGMA data_version`` on the cache's long-lived
+    connection shows that another connection - possibly in another worker process -
+    has committed a change.
+    """
+    def __init__(self, db_path=SETTINGS_DB_PATH):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._data_version = None
+        self._version = 0
+        self._stale = True
+
+    def _load(self):
+        rows = self._conn.execute("SELECT key, value FROM settings").fetchall()
+        self._version += 1
+        self._snapshot = PromptSettingsSnapshot(self._version, {key: value for key, value in rows})
+        self._stale = False
+
+    def snapshot(self):
+        """
+        Returns:
+            PromptSettingsSnapshot: Current settings, reloaded only if they changed
+        """
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._stale or self._snapshot is None or data_version != self._data_version:
+                self._data_version = data_version
+                self._load()
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+
+_cache = PromptSettingsCache()
+
+
+def get_prompt_snapshot():
+    """Return the current process-wide settings snapshot."""
+    return _cache.snapshot()
+
+
+def invalidate_prompt_settings():
+    """Force the next snapshot to be reloaded from settings.db."""
+    _cache.invalidate()
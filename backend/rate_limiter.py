@@ -0,0 +1,171 @@
+import re
+import time
+import random
+import threading
+
+# Backoff settings for retried calls (seconds)
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call is still rate limited after all retries."""
+
+
+def parse_duration(value):
+    """
+    Parse a rate-limit reset value such as "7.66s", "2m59.56s" or "120ms".
+
+    Args:
+        value (str): Header value
+
+    Returns:
+        float: Duration in seconds, or None if the value can't be parsed
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _parse_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Jittered exponential backoff, never shorter than the server's Retry-After.
+
+    Args:
+        attempt (int): Zero-based retry attempt
+        retry_after (float, optional): Delay requested by the provider
+
+    Returns:
+        float: Seconds to wait before the next attempt
+    """
+    delay = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt)) * random.uniform(0.5, 1.0)
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, 0.25))
+    return delay
+
+
+class ModelBudget:
+    """
+    Shared request/token budget for one model, fed by the provider's rate-limit headers.
+
+    Every thread calling the model goes through the same budget, so a 429 or an
+    exhausted token window pauses all callers until the reported reset time instead
+    of each thread discovering the limit on its own.
+    """
+    def __init__(self, model):
+        self.model = model
+        self._condition = threading.Condition()
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.blocked_until = 0.0
+        # Per-minute token limit reported by the provider, once a response has been seen
+        self.limit_tokens = None
+
+    def _required_wait(self, estimated_tokens, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        if now >= self.requests_reset_at:
+            self.remaining_requests = None
+        if now >= self.tokens_reset_at:
+            self.remaining_tokens = None
+
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            return self.requests_reset_at - now
+        if self.remaining_tokens is not None and self.remaining_tokens < estimated_tokens:
+            return self.tokens_reset_at - now
+        return 0
+
+    def acquire(self, estimated_tokens=0):
+        """
+        Block until the budget allows one more request of ``estimated_tokens``.
+
+        Args:
+            estimated_tokens (int): Expected prompt + completion tokens for the call
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        with self._condition:
+            while True:
+                wait = self._required_wait(estimated_tokens, time.monotonic())
+                if wait <= 0:
+                    break
+                self._condition.wait(timeout=wait)
+                waited += wait
+
+            if self.remaining_requests is not None:
+                self.remaining_requests -= 1
+            if self.remaining_tokens is not None:
+                self.remaining_tokens -= estimated_tokens
+        return waited
+
+    def update_from_headers(self, headers):
+        """
+        Refresh the budget from x-ratelimit-* and Retry-After response headers.
+
+        Args:
+            headers (Mapping): Response headers (case-insensitive mapping)
+        """
+        if headers is None:
+            return
+        now = time.monotonic()
+        remaining_requests = _parse_int(headers.get("x-ratelimit-remaining-requests"))
+        remaining_tokens = _parse_int(headers.get("x-ratelimit-remaining-tokens"))
+        limit_tokens = _parse_int(headers.get("x-ratelimit-limit-tokens"))
+        reset_requests = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        reset_tokens = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        retry_after = parse_duration(headers.get("retry-after"))
+
+        with self._condition:
+            if remaining_requests is not None:
+                self.remaining_requests = remaining_requests
+                self.requests_reset_at = now + (reset_requests or 0)
+            if remaining_tokens is not None:
+                self.remaining_tokens = remaining_tokens
+                self.tokens_reset_at = now + (reset_tokens or 0)
+            if limit_tokens is not None:
+                self.limit_tokens = limit_tokens
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            self._condition.notify_all()
+
+    def block_for(self, seconds):
+        """Pause every caller of this model for ``seconds``."""
+        with self._condition:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+
+_budgets = {}
+_budgets_lock = threading.Lock()
+
+
+def get_budget(model):
+    """Return the process-wide budget for ``model``, creating it on first use."""
+    with _budgets_lock:
+        budget = _budgets.get(model)
+        if budget is None:
+            budget = _budgets[model] = ModelBudget(model)
+        return budget
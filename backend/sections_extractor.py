@@ -1,4 +1,12 @@
 import re
+from context_builder import fit_documents_to_budget, describe_omissions
+
+# Stored in place of a folder or project section whose generation failed
+SECTION_ERROR_PREFIX = "Error generating documentation for "
+
+def has_failed_sections(sections):
+    """Whether any of the generated ``{section: content}`` is a failure placeholder."""
+    return any(content.startswith(SECTION_ERROR_PREFIX) for content in sections.values())
 
 # Function to clean up unwanted trailing content (e.g., "---", section numbers)
 def clean_extracted_content(content):
@@ -62,4 +70,49 @@ def extract_all_sections_for_files(file_docs):
         else:
             print(f"Warning: Skipping {file_path} because the documentation is not a string.")
 
-    return section_dicts
\ No newline at end of file
+    return section_dicts
+
+# Marker placed before every section when several sections are requested in one response
+SECTION_MARKER = "<<<SECTION: {}>>>"
+SECTION_MARKER_PATTERN = re.compile(r"^\s*<<<SECTION:\s*([\w-]+)\s*>>>\s*$", re.MULTILINE)
+
+# Function to split a single multi-section response back into per-section documentation
+def split_combined_sections(response_text, section_keys):
+    sections = {}
+    if not response_text:
+        return sections
+
+    matches = list(SECTION_MARKER_PATTERN.finditer(response_text))
+    for index, match in enumerate(matches):
+        section_key = match.group(1)
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(response_text)
+        content = response_text[match.end():end].strip()
+        if section_key in section_keys and content:
+            sections[section_key] = content
+
+    return sections
+
+# Function to format every child's extracted sections once, grouped by child path
+def format_child_context(documentation_dict, doc_type="File", section_titles=None, token_budget=None):
+    if not documentation_dict:
+        return f"No {doc_type.lower()} documentation available."
+
+    by_path = {}
+    for section, docs in documentation_dict.items():
+        title = section_titles.get(section, section) if section_titles else section
+        for path, content in (docs or {}).items():
+            if content and content.strip():
+                by_path.setdefault(path, []).append(f"{title}:\n{content.strip()}")
+
+    if not by_path:
+        return f"No {doc_type.lower()} documentation available."
+
+    child_docs = {path: "\n\n".join(parts) for path, parts in by_path.items()}
+    omitted = []
+    if token_budget is not None:
+        kept, omitted = fit_documents_to_budget(child_docs, token_budget)
+        child_docs = dict(kept)
+
+    context = "\n\n".join(f"{doc_type}: {path}\n{content}" for path, content in child_docs.items())
+    note = describe_omissions(omitted, doc_type)
+    return f"{context}\n\n{note}" if note else context
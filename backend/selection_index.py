@@ -0,0 +1,276 @@
+import os
+import re
+import stat
+
+
+def _strip_separator(path):
+    stripped = path.rstrip(os.sep)
+    return stripped or path
+
+
+class SelectionIndex:
+    """
+    The selected paths of a generation request, indexed once so planning never
+    rescans the whole selection.
+
+    Every selected path is filed under its parent directory, and every directory
+    above a selected path is recorded, so "is anything under X selected" is a set
+    lookup and "selected children of X" returns exactly those children. Each path
+    is stat'ed at most once.
+    """
+    def __init__(self, selected_items):
+        """
+        Args:
+            selected_items (iterable): Paths selected for documentation
+        """
+        self._selected = set()
+        self._children = {}
+        self._ancestors = set()
+        self._kinds = {}
+        for item in selected_items:
+            item = _strip_separator(item)
+            if item in self._selected:
+                continue
+            self._selected.add(item)
+            parent = os.path.dirname(item)
+            self._children.setdefault(parent, []).append(item)
+            # Stop at the first ancestor already recorded; everything above it is too
+            while parent not in self._ancestors:
+                self._ancestors.add(parent)
+                grandparent = os.path.dirname(parent)
+                if grandparent == parent:
+                    break
+                parent = grandparent
+
+    def __len__(self):
+        return len(self._selected)
+
+    def __contains__(self, path):
+        return _strip_separator(path) in self._selected
+
+    def has_selected(self, path):
+        """Whether ``path`` or anything below it is selected."""
+        path = _strip_separator(path)
+        return path in self._selected or path in self._ancestors
+
+    def kind(self, path):
+        """
+        Returns:
+            str: 'file', 'dir' or None (missing or other), from a cached stat
+        """
+        if path not in self._kinds:
+            try:
+                mode = os.stat(path).st_mode
+            except OSError:
+                mode = 0
+            self._kinds[path] = 'file' if stat.S_ISREG(mode) else 'dir' if stat.S_ISDIR(mode) else None
+        return self._kinds[path]
+
+    def selected_children(self, folder_path):
+        """
+        Directly selected files and subfolders of ``folder_path``, in selection order.
+
+        Returns:
+            tuple: (files, subfolders)
+        """
+        files = []
+        subfolders = []
+        for item in self._children.get(_strip_separator(folder_path), ()):
+            kind = self.kind(item)
+            if kind == 'file':
+                files.append(item)
+            elif kind == 'dir':
+                subfolders.append(item)
+        return files, subfolders
+
+
+_GLOB_CHARS = set('*?[')
+
+
+def _compile_glob(pattern):
+    """
+    Compile a glob over '/'-separated relative paths: ``*`` and ``?`` stay within
+    one path component, ``**`` spans any number of them, and a pattern without a
+    '/' matches the last component anywhere in the tree.
+    """
+    if '/' not in pattern:
+        pattern = '**/' + pattern
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(f'^{regex}$')
+
+
+class SelectionSpec:
+    """
+    A compact selection - folder includes, glob includes and glob excludes - that
+    is expanded lazily against the project tree while the plan is walked.
+
+    Answers the same questions as SelectionIndex, so a request's size and planning
+    cost depend on the folders it touches rather than on how many files it selects.
+    Folders that contain at least one selected file are documented themselves.
+    Symbolic links are not followed.
+    """
+    def __init__(self, root_path, include=None, exclude=None):
+        """
+        Args:
+            root_path (str): Project root the patterns are relative to
+            include (list, optional): Folder or file paths (relative to the root, or
+                absolute under it) and glob patterns; everything when empty
+            exclude (list, optional): Glob patterns or paths; an excluded folder
+                excludes everything below it
+
+        Raises:
+            ValueError: If a path points outside the project
+        """
+        self.root_path = root_path
+        entries = [self._normalize(entry) for entry in include or []]
+        self._include_everything = not entries or '' in entries
+        self._include_paths = []
+        self._include_globs = []
+        if not self._include_everything:
+            for entry in entries:
+                if _GLOB_CHARS & set(entry):
+                    self._include_globs.append(_compile_glob(entry))
+                else:
+                    self._include_paths.append(entry)
+        self._exclude_globs = [_compile_glob(self._normalize(entry)) for entry in exclude or [] if self._normalize(entry)]
+        self._listings = {}
+        self._has_selected = {}
+        self._kinds = {}
+
+    def _normalize(self, entry):
+        entry = str(entry)
+        if os.path.isabs(entry) or entry == self.root_path or entry.startswith(self.root_path.rstrip('/\\') + os.sep):
+            entry = os.path.relpath(entry, self.root_path)
+        entry = entry.replace(os.sep, '/').replace('\\', '/').strip('/')
+        if entry in ('.', '**'):
+            return ''
+        if entry == '..' or entry.startswith('../'):
+            raise ValueError(f"Selection entry outside the project: {entry}")
+        return entry
+
+    def _relative(self, path):
+        relative = os.path.relpath(path, self.root_path).replace(os.sep, '/')
+        return '' if relative == '.' else relative
+
+    def _excluded(self, relative):
+        return any(pattern.match(relative) for pattern in self._exclude_globs)
+
+    def _included(self, relative):
+        if self._include_everything:
+            return True
+        if any(relative == entry or relative.startswith(entry + '/') for entry in self._include_paths):
+            return True
+        return any(pattern.match(relative) for pattern in self._include_globs)
+
+    def _may_include_below(self, relative):
+        """Whether anything under the folder ``relative`` can be included at all."""
+        if self._include_everything or self._include_globs or relative == '':
+            return True
+        return any(
+            entry == relative or entry.startswith(relative + '/') or relative.startswith(entry + '/')
+            for entry in self._include_paths
+        )
+
+    def _listing(self, folder_path):
+        if folder_path not in self._listings:
+            entries = []
+            try:
+                with os.scandir(folder_path) as scanner:
+                    for entry in scanner:
+                        # Symlinks are not followed: a link back up the tree would repeat it forever
+                        kind = (
+                            'file' if entry.is_file(follow_symlinks=False)
+                            else 'dir' if entry.is_dir(follow_symlinks=False)
+                            else None
+                        )
+                        self._kinds[entry.path] = kind
+                        if kind is not None:
+                            entries.append((entry.path, kind))
+            except OSError as e:
+                print(f"Could not list {folder_path}: {e}")
+            entries.sort()
+            self._listings[folder_path] = entries
+        return self._listings[folder_path]
+
+    def __contains__(self, path):
+        if self.kind(path) == 'dir':
+            return self.has_selected(path)
+        relative = self._relative(path)
+        return self.has_selected(os.path.dirname(path)) and self._included(relative) and not self._excluded(relative)
+
+    def has_selected(self, path):
+        """Whether any file under the folder ``path`` is selected (scanned once per folder)."""
+        if path in self._has_selected:
+            return self._has_selected[path]
+        relative = self._relative(path)
+        if relative == '..' or relative.startswith('../') or (relative and self._excluded(relative)) or not self._may_include_below(relative):
+            found = False
+        else:
+            files, subfolders = self.selected_children(path)
+            found = bool(files) or any(self.has_selected(subfolder) for subfolder in subfolders)
+        self._has_selected[path] = found
+        return found
+
+    def kind(self, path):
+        if path not in self._kinds:
+            try:
+                mode = os.lstat(path).st_mode
+            except OSError:
+                mode = 0
+            self._kinds[path] = 'file' if stat.S_ISREG(mode) else 'dir' if stat.S_ISDIR(mode) else None
+        return self._kinds[path]
+
+    def selected_children(self, folder_path):
+        """
+        Selected files and the not excluded subfolders directly inside ``folder_path``.
+
+        Returns:
+            tuple: (files, subfolders)
+        """
+        files = []
+        subfolders = []
+        for path, kind in self._listing(folder_path):
+            relative = self._relative(path)
+            if self._excluded(relative):
+                continue
+            if kind == 'file':
+                if self._included(relative):
+                    files.append(path)
+            elif self._may_include_below(relative):
+                subfolders.append(path)
+        return files, subfolders
+
+
+def make_selection(root_path, selected_items=None, selection=None):
+    """
+    Build the selection of a generation request from either its explicit
+    ``selected_items`` list or its compact ``selection`` spec
+    ({"include": [...], "exclude": [...]}).
+
+    Raises:
+        ValueError: If neither is given or the spec points outside the project
+    """
+    if selection is not None:
+        if not isinstance(selection, dict):
+            raise ValueError("selection must be an object with include/exclude lists")
+        return SelectionSpec(root_path, selection.get('include'), selection.get('exclude'))
+    if selected_items is None:
+        raise ValueError("Either selected_items or selection is required")
+    return SelectionIndex(selected_items)
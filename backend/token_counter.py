@@ -0,0 +1,48 @@
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency, fall back to a character heuristic
+    tiktoken = None
+
+# Encoding used as a local stand-in for the hosted models' tokenizers
+ENCODING_NAME = "cl100k_base"
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if tiktoken is None or _encoding_failed:
+        return None
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    _encoding = tiktoken.get_encoding(ENCODING_NAME)
+                except Exception as e:
+                    print(f"Could not load tokenizer {ENCODING_NAME}, estimating tokens from length: {e}")
+                    _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    Count model tokens in ``text`` with a local tokenizer.
+
+    Uses tiktoken when it is installed, otherwise approximates four characters per token.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Number of tokens
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
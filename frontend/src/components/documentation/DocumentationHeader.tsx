@@ -1,4 +1,4 @@
-import { Pencil, ClipboardCheck, MessageSquare, Download, Sidebar } from 'lucide-react';
+import { Pencil, ClipboardCheck, MessageSquare, Download, Sidebar, RefreshCw } from 'lucide-react';
 
 interface DocumentationHeaderProps {
   editMode: boolean;
@@ -8,6 +8,8 @@ interface DocumentationHeaderProps {
   onDownloadPDF: () => void;
   onTreeToggle?: () => void; // Optional prop for toggling tree
   isTreeVisible?: boolean;  // Optional prop to track tree visibility
+  onRegenerate?: () => void; // Only passed for file-level documentation
+  isRegenerating?: boolean;
 }
 
 export default function DocumentationHeader({ 
@@ -17,7 +19,9 @@ export default function DocumentationHeader({
   onChatToggle,
   onDownloadPDF,
   onTreeToggle,
-  isTreeVisible
+  isTreeVisible,
+  onRegenerate,
+  isRegenerating
 }: DocumentationHeaderProps) {
   return (
     <div className="p-2 bg-gray-800 border-b border-gray-700 flex justify-between items-center">
@@ -57,6 +61,16 @@ export default function DocumentationHeader({
         >
           <Download className="h-5 w-5" />
         </button>
+        {onRegenerate && (
+          <button
+            onClick={onRegenerate}
+            disabled={isRegenerating}
+            className="p-2 bg-gray-700 text-white rounded-md hover:bg-gray-600 transition-colors disabled:opacity-50"
+            title="Regenerate Documentation"
+          >
+            <RefreshCw className={`h-5 w-5 ${isRegenerating ? 'animate-spin' : ''}`} />
+          </button>
+        )}
       </div>
     </div>
   );
@@ -64,6 +64,7 @@ export default function DocumentationViewer({
   const [isSaving, setIsSaving] = useState(false);
   const [toastMessage, setToastMessage] = useState<string | null>(null);
   const [toastType, setToastType] = useState<'success' | 'error'>('success');
+  const [isRegenerating, setIsRegenerating] = useState(false);
   // const [editingSectionId, setEditingSectionId] = useState<number | null>(null); // No longer needed for multi-section editing
 
   useEffect(() => {
@@ -270,6 +271,85 @@ export default function DocumentationViewer({
     }
   };
 
+  // Streams a fresh file doc into the viewer token by token; the backend stores it when the stream ends
+  const handleRegenerate = async () => {
+    const headers = getAuthHeader();
+    if (!headers || !documentationId) return;
+    setIsRegenerating(true);
+    setEditMode(false);
+    let streamed = '';
+    try {
+      const response = await fetch('http://localhost:8000/api/documentation/file/stream', {
+        method: 'POST',
+        headers: { ...headers, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ documentation_id: documentationId }),
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`Regeneration failed: ${response.statusText}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop() ?? '';
+        for (const rawEvent of events) {
+          const eventType = rawEvent.match(/^event: (.*)$/m)?.[1];
+          const data = rawEvent.match(/^data: (.*)$/m)?.[1];
+          if (!eventType || data === undefined) continue;
+          const payload = JSON.parse(data);
+          if (eventType === 'token') {
+            streamed += payload.text;
+            setContent(processDocumentation(streamed));
+          } else if (eventType === 'done') {
+            fetchSections();
+            setToastMessage('Documentation regenerated successfully!');
+            setToastType('success');
+          } else if (eventType === 'error') {
+            throw new Error(payload.error);
+          }
+        }
+      }
+    } catch (error) {
+      console.error('Error regenerating documentation:', error);
+      setToastMessage(`Failed to regenerate: ${error instanceof Error ? error.message : 'Unknown error'}`);
+      setToastType('error');
+      if (documentation) setContent(processDocumentation(documentation));
+    } finally {
+      setIsRegenerating(false);
+    }
+  };
+
+  // Folder and project docs are rebuilt from their children's stored docs, along with every documented ancestor
+  const handleRegenerateNode = async () => {
+    const headers = getAuthHeader();
+    if (!headers || !documentationId) return;
+    setIsRegenerating(true);
+    setEditMode(false);
+    try {
+      const response = await fetch('http://localhost:8000/api/documentation/regenerate', {
+        method: 'POST',
+        headers: { ...headers, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ documentation_id: documentationId, cascade: true }),
+      });
+      if (!response.ok) {
+        throw new Error(`Regeneration failed: ${response.statusText}`);
+      }
+      fetchSections();
+      setToastMessage('Documentation regenerated successfully!');
+      setToastType('success');
+    } catch (error) {
+      console.error('Error regenerating documentation:', error);
+      setToastMessage(`Failed to regenerate: ${error instanceof Error ? error.message : 'Unknown error'}`);
+      setToastType('error');
+    } finally {
+      setIsRegenerating(false);
+    }
+  };
+
   const handleDownloadPDF = () => {
     if (!contentRef.current) return;
 
@@ -320,6 +400,8 @@ export default function DocumentationViewer({
         onDownloadPDF={handleDownloadPDF}
         onTreeToggle={onTreeToggle}
         isTreeVisible={isTreeVisible}
+        onRegenerate={docLevel === 'file' ? handleRegenerate : docLevel ? handleRegenerateNode : undefined}
+        isRegenerating={isRegenerating}
       />
 
       <div className={`flex-1 ${editMode ? 'grid grid-cols-2' : ''} overflow-hidden`}>
@@ -1,8 +1,9 @@
 import { useEffect, useState } from 'react';
-import { Loader, CheckCircle, AlertCircle } from 'lucide-react';
+import { Loader, CheckCircle, AlertCircle, XCircle } from 'lucide-react';
+import { getAuthHeader } from '../../lib/auth';
 
 interface GenerationStatus {
-  status: 'in_progress' | 'completed' | 'failed';
+  status: 'queued' | 'in_progress' | 'paused' | 'cancelling' | 'completed' | 'failed' | 'cancelled';
   progress: number;
   current_step: string;
   error: string | null;
@@ -10,8 +11,36 @@ interface GenerationStatus {
   start_time?: string;
   completion_time?: string;
   failure_time?: string;
+  details?: {
+    files_processed?: number;
+    files_total?: number;
+    folders_processed?: number;
+    folders_total?: number;
+    sections_processed?: number;
+    sections_total?: number;
+    in_flight_calls?: number;
+    nodes_per_minute?: number | null;
+    tokens_per_minute?: number | null;
+    eta_seconds?: number | null;
+    filtered_files_total?: number;
+  };
 }
 
+function formatEta(seconds: number): string {
+  if (seconds < 60) return `${seconds}s`;
+  const minutes = Math.floor(seconds / 60);
+  return minutes < 60 ? `${minutes}m ${seconds % 60}s` : `${Math.floor(minutes / 60)}h ${minutes % 60}m`;
+}
+
+interface CompletedNode {
+  path: string;
+  level: string;
+  documentation_id: number;
+}
+
+// Number of recently stored docs listed while generation runs
+const MAX_COMPLETED_NODES = 8;
+
 interface GeneratingDocumentationProps {
   progressKey: string;
   onComplete: () => void;
@@ -24,84 +53,130 @@ export default function GeneratingDocumentation({ progressKey, onComplete }: Gen
     current_step: 'Initializing...',
     error: null
   });
-  const [retryCount, setRetryCount] = useState(0);
-  const MAX_RETRIES = 3;
+  const [completedNodes, setCompletedNodes] = useState<CompletedNode[]>([]);
+  const [rateLimitWait, setRateLimitWait] = useState<number | null>(null);
 
   useEffect(() => {
-    let timeoutId: number;
-    let mounted = true;
+    // Job events are pushed by the server; EventSource reconnects on its own
+    // and resumes after the last event id it received
+    const source = new EventSource(`http://localhost:8000/api/generate/${progressKey}/events`);
+    let finished = false;
 
-    const checkStatus = async () => {
-      try {
-        const response = await fetch(`http://localhost:8000/api/generate/status/${progressKey}`);
-        
-        if (!mounted) return;
-
-        if (!response.ok) {
-          if (response.status === 404 && retryCount < MAX_RETRIES) {
-            // Handle potential race condition with slight delay
-            setRetryCount(prev => prev + 1);
-            timeoutId = setTimeout(checkStatus, 1000);
-            return;
-          }
-          throw new Error(`Status check failed: ${response.statusText}`);
-        }
-        
-        const data = await response.json();
+    const finish = (data: Partial<GenerationStatus>) => {
+      finished = true;
+      source.close();
+      setStatus(prev => ({ ...prev, ...data }));
+    };
+
+    source.addEventListener('status', (e) => {
+      const data: GenerationStatus = JSON.parse((e as MessageEvent).data);
+      if (data.status === 'completed' || data.status === 'failed' || data.status === 'cancelled') {
+        finish(data);
+        if (data.status !== 'failed') setTimeout(onComplete, 1500);
+      } else {
         setStatus(data);
-        setRetryCount(0); // Reset retry count on successful request
-
-        if (data.status === 'completed') {
-          // Clean up status after completion
-          fetch(`http://localhost:8000/api/generate/status/${progressKey}`, {
-            method: 'DELETE'
-          }).catch(console.error);
-          
-          setTimeout(onComplete, 1500);
-        } else if (data.status === 'in_progress') {
-          timeoutId = setTimeout(checkStatus, 1000);
-        }
-      } catch (error) {
-        console.error('Error checking status:', error);
-        if (mounted) {
-          setStatus(prev => ({
-            ...prev,
-            status: 'failed',
-            error: 'Failed to fetch generation status'
-          }));
-        }
+      }
+    });
+    source.addEventListener('progress', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      setRateLimitWait(null);
+      setStatus(prev => ({ ...prev, ...data }));
+    });
+    source.addEventListener('job_started', () => {
+      setStatus(prev => ({ ...prev, status: 'in_progress' }));
+    });
+    source.addEventListener('job_paused', () => {
+      setStatus(prev => ({ ...prev, status: 'paused' }));
+    });
+    source.addEventListener('job_resumed', () => {
+      setStatus(prev => ({ ...prev, status: 'in_progress' }));
+    });
+    source.addEventListener('node_completed', (e) => {
+      const node: CompletedNode = JSON.parse((e as MessageEvent).data);
+      setCompletedNodes(prev => [node, ...prev].slice(0, MAX_COMPLETED_NODES));
+    });
+    source.addEventListener('rate_limit_wait', (e) => {
+      setRateLimitWait(JSON.parse((e as MessageEvent).data).delay);
+    });
+    source.addEventListener('job_completed', () => {
+      finish({ status: 'completed', progress: 100, current_step: 'Documentation generated successfully!' });
+      // Clean up status after completion
+      fetch(`http://localhost:8000/api/generate/status/${progressKey}`, {
+        method: 'DELETE'
+      }).catch(console.error);
+      setTimeout(onComplete, 1500);
+    });
+    source.addEventListener('job_cancelled', () => {
+      // Documentation generated before the cancellation is kept, so show it
+      finish({ status: 'cancelled', current_step: 'Generation cancelled' });
+      setTimeout(onComplete, 1500);
+    });
+    source.addEventListener('job_failed', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      finish({ status: 'failed', error: data.error || 'Generation failed' });
+    });
+    source.onerror = () => {
+      if (!finished && source.readyState === EventSource.CLOSED) {
+        setStatus(prev => ({
+          ...prev,
+          status: 'failed',
+          error: 'Failed to fetch generation status'
+        }));
       }
     };
 
-    checkStatus();
-
     return () => {
-      mounted = false;
-      if (timeoutId) clearTimeout(timeoutId);
+      source.close();
     };
-  }, [progressKey, onComplete, retryCount]);
+  }, [progressKey, onComplete]);
+
+  const handleCancel = async () => {
+    const headers = getAuthHeader();
+    if (!headers) return;
+    try {
+      const response = await fetch(`http://localhost:8000/api/generate/${progressKey}/cancel`, {
+        method: 'POST',
+        headers
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setStatus(prev => ({ ...prev, status: data.status, current_step: 'Cancelling...' }));
+      }
+    } catch (error) {
+      console.error('Error cancelling generation:', error);
+    }
+  };
+
+  const canCancel = ['queued', 'in_progress', 'paused'].includes(status.status);
 
+  const details = status.details ?? {};
+  const planned = details.files_total !== undefined;
+  const filesDone = planned && (details.files_processed ?? 0) >= (details.files_total ?? 0);
   const steps = [
     {
       id: 1,
       title: 'Step 1',
       description: 'Fetching files from the codebase',
-      status: status.progress >= 20 ? 'completed' : 
-             status.progress > 0 ? 'in-progress' : 'pending'
+      status: planned ? 'completed' : 
+             status.status === 'in_progress' ? 'in-progress' : 'pending'
     },
     {
       id: 2,
       title: 'Step 2',
-      description: 'Analyzing the code',
-      status: status.progress >= 40 ? 'completed' :
-             status.progress >= 20 ? 'in-progress' : 'pending'
+      description: planned
+        ? `Analyzing the code (${details.files_processed ?? 0}/${details.files_total} files)`
+        : 'Analyzing the code',
+      status: filesDone ? 'completed' :
+             planned ? 'in-progress' : 'pending'
     },
     {
       id: 3,
       title: 'Step 3',
-      description: 'Generating the document',
+      description: planned
+        ? `Generating the document (${details.folders_processed ?? 0}/${details.folders_total ?? 0} folders)`
+        : 'Generating the document',
       status: status.progress >= 100 ? 'completed' :
-             status.progress >= 40 ? 'in-progress' : 'pending'
+             filesDone ? 'in-progress' : 'pending'
     }
   ];
 
@@ -135,8 +210,31 @@ export default function GeneratingDocumentation({ progressKey, onComplete }: Gen
               style={{ width: `${status.progress}%` }}
             />
           </div>
-          <p className="text-gray-400 mt-2">{status.current_step}</p>
-          <p className="text-sm text-gray-500">This process may take a few minutes.</p>
+          <p className="text-gray-400 mt-2">
+            {status.status === 'paused' ? 'Paused by an administrator' : status.current_step}
+          </p>
+          {rateLimitWait !== null && (
+            <p className="text-sm text-yellow-400">Waiting {rateLimitWait}s for the model's rate limit...</p>
+          )}
+          <p className="text-sm text-gray-500">
+            {details.eta_seconds != null
+              ? `About ${formatEta(details.eta_seconds)} remaining`
+              : 'This process may take a few minutes.'}
+          </p>
+          {(details.filtered_files_total ?? 0) > 0 && (
+            <p className="text-sm text-gray-500">
+              {details.filtered_files_total} binary, generated or oversized file(s) won't be sent to the model
+            </p>
+          )}
+          {canCancel && (
+            <button
+              onClick={handleCancel}
+              className="mt-4 inline-flex items-center gap-2 px-4 py-2 bg-gray-700 text-white rounded-md hover:bg-gray-600 transition-colors"
+            >
+              <XCircle className="h-4 w-4" />
+              Cancel generation
+            </button>
+          )}
         </div>
 
         <div className="space-y-4">
@@ -166,6 +264,19 @@ export default function GeneratingDocumentation({ progressKey, onComplete }: Gen
             </div>
           ))}
         </div>
+
+        {completedNodes.length > 0 && (
+          <div className="mt-8">
+            <h2 className="text-xl font-semibold text-white mb-4">Recently documented</h2>
+            <ul className="space-y-1">
+              {completedNodes.map(node => (
+                <li key={node.documentation_id} className="text-sm text-gray-400 truncate">
+                  <span className="text-gray-500">{node.level}</span> {node.path}
+                </li>
+              ))}
+            </ul>
+          </div>
+        )}
       </div>
     </div>
   );